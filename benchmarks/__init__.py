@@ -0,0 +1,5 @@
+"""
+Offline benchmarks for dandi-notebook-gen
+
+Run with `python -m benchmarks.run`. See benchmarks/README.md.
+"""
@@ -0,0 +1,440 @@
+"""
+Offline benchmark suite
+
+Starts a local stand-in for the neurosift tools API (benchmarks.standin) and
+measures:
+
+- tool_latency: latency of single dandiset_info / dandiset_assets calls,
+  cold (cache disabled) and warm (served from the on-disk cache)
+- listing_throughput: iter_dandiset_assets over a multi-thousand-asset
+  listing at several levels of page concurrency
+- concurrent_clients: dandiset_info requests per second with many threads
+- cli_cold_start: a fresh dandi-notebook-gen-tools process per call
+- range_reads: reading a file over HTTP range requests, plus nwb_file_info
+  on a local NWB file when one is given and get_nwbfile_info is installed
+- generate_notebook: end to end, with a scripted stand-in for perform_task
+  that makes the agent's usual tool calls
+
+Results are written as JSON. With --baseline, timings are compared to an
+earlier results file and the run fails if any got slower than the tolerance.
+
+Usage:
+
+    python -m benchmarks.run --output results.json
+    python -m benchmarks.run --quick --baseline results.json
+"""
+
+from typing import Any, Callable, Dict, List, Optional
+import json
+import os
+import platform
+import shutil
+import stat
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import click
+
+from .standin import StandInServer
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+DANDISET_ID = "000001"
+
+# sizes used by a full run and by --quick
+FULL_CONFIG = {"num_assets": 5000, "iterations": 20, "cli_iterations": 5, "generate_iterations": 3,
+               "listing_workers": [1, 4, 8, 16], "clients": [1, 8, 32], "requests_per_client": 10,
+               "range_file_bytes": 32 * 1024 * 1024, "range_chunk_bytes": 1024 * 1024}
+QUICK_CONFIG = {"num_assets": 500, "iterations": 3, "cli_iterations": 1, "generate_iterations": 1,
+                "listing_workers": [1, 4], "clients": [1, 4], "requests_per_client": 3,
+                "range_file_bytes": 2 * 1024 * 1024, "range_chunk_bytes": 256 * 1024}
+
+
+def _percentile(values: List[float], q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q * (len(values) - 1))))]
+
+
+def timing_stats(timings: List[float]) -> Dict[str, Any]:
+    return {
+        "n": len(timings),
+        "mean_seconds": sum(timings) / len(timings),
+        "p50_seconds": _percentile(timings, 0.5),
+        "p95_seconds": _percentile(timings, 0.95),
+        "min_seconds": min(timings),
+        "max_seconds": max(timings),
+    }
+
+
+def time_calls(func: Callable[[], Any], n: int) -> Dict[str, Any]:
+    timings = []
+    for _ in range(n):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return timing_stats(timings)
+
+
+def bench_tool_latency(server: StandInServer, config: Dict[str, Any]) -> Dict[str, Any]:
+    from dandi_notebook_gen import tools
+    n = config["iterations"]
+    calls = {
+        "dandiset_info": lambda use_cache: tools.dandiset_info(DANDISET_ID, use_cache=use_cache),
+        "dandiset_assets": lambda use_cache: tools.dandiset_assets(DANDISET_ID, use_cache=use_cache),
+    }
+    results = {}
+    for name, call in calls.items():
+        call(True)  # fill the cache for the warm measurement
+        results[name] = {
+            "cold": time_calls(lambda: call(False), n),
+            "warm": time_calls(lambda: call(True), n),
+        }
+    return results
+
+
+def bench_listing_throughput(server: StandInServer, config: Dict[str, Any]) -> Dict[str, Any]:
+    from dandi_notebook_gen import tools
+    results = {}
+    for max_workers in config["listing_workers"]:
+        start = time.perf_counter()
+        num_assets = sum(1 for _ in tools.iter_dandiset_assets(DANDISET_ID, max_workers=max_workers, use_cache=False))
+        elapsed = time.perf_counter() - start
+        assert num_assets == len(server.assets), f"listed {num_assets} of {len(server.assets)} assets"
+        results[f"workers_{max_workers}"] = {
+            "num_assets": num_assets,
+            "seconds": elapsed,
+            "assets_per_second": num_assets / elapsed,
+        }
+    return results
+
+
+def bench_concurrent_clients(server: StandInServer, config: Dict[str, Any]) -> Dict[str, Any]:
+    from dandi_notebook_gen import tools
+
+    def client(_):
+        timings = []
+        for _ in range(config["requests_per_client"]):
+            start = time.perf_counter()
+            tools.dandiset_info(DANDISET_ID, use_cache=False)
+            timings.append(time.perf_counter() - start)
+        return timings
+
+    results = {}
+    for num_clients in config["clients"]:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=num_clients) as executor:
+            timings = [t for ts in executor.map(client, range(num_clients)) for t in ts]
+        elapsed = time.perf_counter() - start
+        results[f"clients_{num_clients}"] = {
+            "seconds": elapsed,
+            "requests_per_second": len(timings) / elapsed,
+            "latency": timing_stats(timings),
+        }
+    return results
+
+
+def _tools_cli(args: List[str]) -> subprocess.CompletedProcess:
+    proc = subprocess.run([sys.executable, "-m", "dandi_notebook_gen.cli", *args], capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"dandi-notebook-gen-tools {' '.join(args)} failed: {proc.stderr}")
+    return proc
+
+
+def bench_cli_cold_start(server: StandInServer, config: Dict[str, Any]) -> Dict[str, Any]:
+    n = config["cli_iterations"]
+    return {
+        "help": time_calls(lambda: _tools_cli(["dandiset-info", "--help"]), n),
+        "dandiset_info": time_calls(lambda: _tools_cli(["dandiset-info", DANDISET_ID, "--no-cache"]), n),
+        "dandiset_assets": time_calls(lambda: _tools_cli(["dandiset-assets", DANDISET_ID, "--no-cache"]), n),
+    }
+
+
+def bench_range_reads(server: StandInServer, config: Dict[str, Any], nwb_file: Optional[str]) -> Dict[str, Any]:
+    from dandi_notebook_gen import tools
+    from dandi_notebook_gen.transport import request
+
+    chunk = config["range_chunk_bytes"]
+    size = os.path.getsize(server.files["blob.bin"])
+    url = server.file_url("blob.bin")
+    start = time.perf_counter()
+    num_bytes = 0
+    for offset in range(0, size, chunk):
+        response = request("GET", url, headers={"Range": f"bytes={offset}-{offset + chunk - 1}"})
+        assert response.status_code == 206, response.status_code
+        num_bytes += len(response.content)
+    elapsed = time.perf_counter() - start
+    results: Dict[str, Any] = {
+        "sequential_chunks": {
+            "num_bytes": num_bytes,
+            "chunk_bytes": chunk,
+            "seconds": elapsed,
+            "megabytes_per_second": num_bytes / elapsed / 1e6,
+        }
+    }
+
+    if nwb_file is None:
+        results["nwb_file_info"] = {"skipped": "no --nwb-file given"}
+        return results
+    try:
+        import get_nwbfile_info  # noqa: F401
+    except ImportError:
+        results["nwb_file_info"] = {"skipped": "get_nwbfile_info is not installed"}
+        return results
+    nwb_url = server.file_url("file.nwb")
+    requests_before = server.stats["range_requests"]
+    bytes_before = server.stats["bytes_served"]
+    start = time.perf_counter()
+    tools.nwb_file_info(DANDISET_ID, nwb_url, use_cache=False)
+    results["nwb_file_info"] = {
+        "seconds": time.perf_counter() - start,
+        "range_requests": server.stats["range_requests"] - requests_before,
+        "bytes_read": server.stats["bytes_served"] - bytes_before,
+        "file_bytes": os.path.getsize(nwb_file),
+    }
+    return results
+
+
+def _host_execute_tool(tool_name, params, cwd, **kwargs):
+    """Stand-in for minicline's execute_tool that runs commands on the host."""
+    proc = subprocess.run(params["command"], shell=True, cwd=cwd, capture_output=True, text=True)
+    if proc.returncode == 0:
+        text = f"Command executed successfully\n{proc.stdout}"
+    else:
+        text = f"Command failed with exit code {proc.returncode}:\n{proc.stdout}{proc.stderr}"
+    return f"execute_command {params['command']}", text, None, True, 0, 0
+
+
+def _make_scripted_perform_task(model_latency: float, nwb_file_url: Optional[str]):
+    """Return a stand-in for perform_task that replays the agent's usual steps."""
+    import minicline.core
+
+    def run_completion(messages, *, model, **kwargs):
+        time.sleep(model_latency)
+        return "", messages, 5000, 500
+
+    def perform_task(instructions, *, cwd, model, **kwargs):
+        commands = [
+            f"dandi-notebook-gen-tools dandiset-info {DANDISET_ID}",
+            f"dandi-notebook-gen-tools dandiset-assets {DANDISET_ID}",
+            f"dandi-notebook-gen-tools dandiset-assets {DANDISET_ID} --page 2",
+        ]
+        if nwb_file_url:
+            commands.append(f"dandi-notebook-gen-tools nwb-file-info {DANDISET_ID} {nwb_file_url}")
+        num_turns = 0
+        for command in commands:
+            minicline.core.run_completion([], model=model)
+            minicline.core.execute_tool("execute_command", {"command": command, "requires_approval": "false"}, cwd)
+            num_turns += 1
+        with open(os.path.join(cwd, "notebook.ipynb"), "w") as f:
+            json.dump({"cells": [], "metadata": {}, "nbformat": 4, "nbformat_minor": 5}, f)
+        return SimpleNamespace(
+            total_prompt_tokens=5000 * num_turns,
+            total_completion_tokens=500 * num_turns,
+            total_vision_prompt_tokens=0,
+            total_vision_completion_tokens=0,
+        )
+
+    return perform_task, run_completion
+
+
+def _tools_shim_dir(parent: str) -> str:
+    """Directory with a dandi-notebook-gen-tools executable for the current interpreter."""
+    bin_dir = os.path.join(parent, "bin")
+    os.makedirs(bin_dir, exist_ok=True)
+    script = os.path.join(bin_dir, "dandi-notebook-gen-tools")
+    with open(script, "w") as f:
+        f.write(f"#!/bin/sh\nexec {sys.executable} -m dandi_notebook_gen.cli \"$@\"\n")
+    os.chmod(script, os.stat(script).st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+    return bin_dir
+
+
+def bench_generate_notebook(server: StandInServer, config: Dict[str, Any], tmp_dir: str, model_latency: float, nwb_file: Optional[str]) -> Dict[str, Any]:
+    import minicline.core
+    from dandi_notebook_gen import generator
+
+    nwb_file_url = server.file_url("file.nwb") if nwb_file else None
+    perform_task, run_completion = _make_scripted_perform_task(model_latency, nwb_file_url)
+    variants = {
+        "default": {},
+        "prefetch_inline": {"prefetch": "inline"},
+        "daemon": {"use_daemon": True},
+    }
+    results = {}
+    with patch.object(generator, "perform_task", perform_task), \
+            patch.object(minicline.core, "run_completion", run_completion), \
+            patch.object(minicline.core, "execute_tool", _host_execute_tool):
+        for name, options in variants.items():
+            timings = []
+            phases = None
+            for i in range(config["generate_iterations"]):
+                working_dir = os.path.join(tmp_dir, "generate", f"{name}-{i}")
+                start = time.perf_counter()
+                generator.generate_notebook(DANDISET_ID, os.path.join(working_dir, "out.ipynb"), working_dir=working_dir, **options)
+                timings.append(time.perf_counter() - start)
+                with open(os.path.join(working_dir, "metadata.json")) as f:
+                    phases = json.load(f).get("phases")
+            results[name] = {**timing_stats(timings), "phases": phases}
+    return results
+
+
+def _flatten_timings(results: Dict[str, Any], prefix: str = "") -> Dict[str, float]:
+    """Map "a.b.p50_seconds"-style paths to the timings used for regression checks."""
+    flat = {}
+    for key, value in results.items():
+        path = f"{prefix}{key}"
+        if isinstance(value, dict):
+            if key == "phases":
+                continue
+            flat.update(_flatten_timings(value, prefix=f"{path}."))
+        elif key in ("p50_seconds", "seconds") and isinstance(value, (int, float)):
+            flat[path] = float(value)
+    return flat
+
+
+def compare_to_baseline(results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[Dict[str, Any]]:
+    """
+    Return the timings that are slower than in the baseline by more than tolerance.
+
+    Only medians (p50_seconds) and single measurements (seconds) are compared.
+    """
+    current = _flatten_timings(results["results"])
+    previous = _flatten_timings(baseline["results"])
+    regressions = []
+    for path, seconds in sorted(current.items()):
+        before = previous.get(path)
+        if before and seconds > before * (1 + tolerance):
+            regressions.append({"benchmark": path, "baseline_seconds": before, "seconds": seconds, "ratio": seconds / before})
+    return regressions
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        proc = subprocess.run(["git", "rev-parse", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True)
+    except OSError:
+        return None
+    return proc.stdout.strip() or None
+
+
+BENCHMARKS = ["tool_latency", "listing_throughput", "concurrent_clients", "cli_cold_start", "range_reads", "generate_notebook"]
+
+
+def run_benchmarks(
+    *,
+    quick: bool = False,
+    only: Optional[List[str]] = None,
+    latency: float = 0.0,
+    model_latency: float = 0.0,
+    nwb_file: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Run the benchmarks against a fresh stand-in server and return the results.
+
+    The process environment is pointed at the stand-in and at a temporary
+    cache directory while the benchmarks run, and restored afterwards.
+
+    Parameters
+    ----------
+    quick : bool, optional
+        Use small sizes and few iterations (for smoke tests).
+    only : List[str], optional
+        Names of the benchmarks to run (default: all).
+    latency : float, optional
+        Artificial delay in seconds added by the stand-in to every API request.
+    model_latency : float, optional
+        Delay in seconds of each scripted model call in generate_notebook.
+    nwb_file : str, optional
+        Local NWB file to serve for nwb_file_info and the scripted agent.
+    """
+    from dandi_notebook_gen import tools
+
+    config = dict(QUICK_CONFIG if quick else FULL_CONFIG)
+    names = only or BENCHMARKS
+    unknown = set(names) - set(BENCHMARKS)
+    if unknown:
+        raise ValueError(f"Unknown benchmarks: {', '.join(sorted(unknown))}")
+
+    tmp_dir = tempfile.mkdtemp(prefix="dandi-notebook-gen-bench-")
+    blob_path = os.path.join(tmp_dir, "blob.bin")
+    with open(blob_path, "wb") as f:
+        f.write(os.urandom(config["range_file_bytes"]))
+    files = {"blob.bin": blob_path}
+    if nwb_file:
+        files["file.nwb"] = nwb_file
+
+    saved_environ = dict(os.environ)
+    saved_api_url = tools.API_BASE_URL
+    results: Dict[str, Any] = {}
+    try:
+        with StandInServer(config["num_assets"], latency=latency, files=files) as server:
+            os.environ.update({
+                "DANDI_NOTEBOOK_GEN_API_URL": server.api_url,
+                "DANDI_NOTEBOOK_GEN_CACHE_DIR": os.path.join(tmp_dir, "cache"),
+                "PATH": _tools_shim_dir(tmp_dir) + os.pathsep + os.environ.get("PATH", ""),
+                "PYTHONPATH": os.pathsep.join(p for p in [str(REPO_ROOT), os.environ.get("PYTHONPATH")] if p),
+            })
+            os.environ.pop("DANDI_NOTEBOOK_GEN_NO_CACHE", None)
+            tools.API_BASE_URL = server.api_url
+            runners = {
+                "tool_latency": lambda: bench_tool_latency(server, config),
+                "listing_throughput": lambda: bench_listing_throughput(server, config),
+                "concurrent_clients": lambda: bench_concurrent_clients(server, config),
+                "cli_cold_start": lambda: bench_cli_cold_start(server, config),
+                "range_reads": lambda: bench_range_reads(server, config, nwb_file),
+                "generate_notebook": lambda: bench_generate_notebook(server, config, tmp_dir, model_latency, nwb_file),
+            }
+            for name in names:
+                results[name] = runners[name]()
+            server_stats = dict(server.stats)
+    finally:
+        tools.API_BASE_URL = saved_api_url
+        os.environ.clear()
+        os.environ.update(saved_environ)
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    return {
+        "timestamp": time.strftime('%Y-%m-%d %H:%M:%S'),
+        "git_commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {**config, "quick": quick, "latency": latency, "model_latency": model_latency, "nwb_file": nwb_file},
+        "server": server_stats,
+        "results": results,
+    }
+
+
+@click.command(name="benchmarks")
+@click.option("--output", "-o", default=None, help="Output file path for the results (default: print to stdout)")
+@click.option("--quick", is_flag=True, help="Use small sizes and few iterations")
+@click.option("--only", multiple=True, type=click.Choice(BENCHMARKS), help="Run only this benchmark (may be repeated)")
+@click.option("--latency", type=float, default=0.0, help="Artificial delay in seconds added to every API request")
+@click.option("--model-latency", type=float, default=0.0, help="Delay in seconds of each scripted model call")
+@click.option("--nwb-file", default=None, type=click.Path(exists=True, dir_okay=False), help="Local NWB file served for nwb_file_info")
+@click.option("--baseline", default=None, type=click.Path(exists=True, dir_okay=False), help="Earlier results file to compare against")
+@click.option("--tolerance", type=float, default=0.25, help="Allowed slowdown relative to the baseline (0.25 = 25%)")
+def main(output, quick, only, latency, model_latency, nwb_file, baseline, tolerance):
+    """Run the offline benchmark suite and write the results as JSON."""
+    results = run_benchmarks(quick=quick, only=list(only) or None, latency=latency, model_latency=model_latency, nwb_file=nwb_file)
+    regressions = []
+    if baseline:
+        with open(baseline, "r") as f:
+            regressions = compare_to_baseline(results, json.load(f), tolerance)
+        results["regressions"] = regressions
+    if output:
+        with open(output, "w") as f:
+            json.dump(results, f, indent=2)
+        click.echo(f"Results saved to {output}", err=True)
+    else:
+        click.echo(json.dumps(results, indent=2))
+    for r in regressions:
+        click.echo(f"REGRESSION {r['benchmark']}: {r['baseline_seconds']:.4f}s -> {r['seconds']:.4f}s ({r['ratio']:.2f}x)", err=True)
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
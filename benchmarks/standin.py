@@ -0,0 +1,195 @@
+"""
+Local stand-in for the neurosift tools API
+
+Serves recorded dandiset_info and dandiset_assets responses, and files over
+HTTP range requests, so the tools can be benchmarked without network access.
+Large listings are built by repeating the recorded asset template with
+distinct subjects, paths and IDs, so their shape matches the real API.
+"""
+
+from typing import Any, Dict, List, Optional
+import fnmatch
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+RECORDINGS_DIR = Path(__file__).parent / "recordings"
+
+
+def load_recording(name: str) -> Any:
+    with open(RECORDINGS_DIR / name, "r") as f:
+        return json.load(f)
+
+
+def make_asset_listing(num_assets: int) -> List[Dict[str, Any]]:
+    """
+    Build a listing of num_assets assets from the recorded template.
+
+    Every block of template assets becomes a new subject, e.g.
+    sub-002/sub-002_ses-001_ecephys.nwb. The result is deterministic.
+    """
+    template = load_recording("dandiset_assets_template.json")["results"]
+    assets = []
+    for i in range(num_assets):
+        base = template[i % len(template)]
+        subject = f"sub-{i // len(template) + 1:03d}"
+        asset_id = hashlib.sha1(f"{base['asset_id']}:{i}".encode()).hexdigest()
+        assets.append({
+            "asset_id": f"{asset_id[:8]}-{asset_id[8:12]}-{asset_id[12:16]}-{asset_id[16:20]}-{asset_id[20:32]}",
+            "path": base["path"].replace("sub-001", subject),
+            "size": base["size"] + i,
+        })
+    return assets
+
+
+class _StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # answer in one round trip; otherwise Nagle plus delayed ACKs add ~40 ms per request
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+        pass
+
+    def _send_json(self, status: int, obj: Any) -> None:
+        body = json.dumps(obj).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        server: "StandInServer" = self.server.standin  # type: ignore[attr-defined]
+        payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        num_requests = server._count("api_requests")
+        if server.latency:
+            time.sleep(server.latency)
+        if num_requests <= server.failures:
+            self._send_json(503, {"error": "Service unavailable"})
+        elif self.path.endswith("/dandiset_info"):
+            info = dict(server.dandiset_info)
+            info["version"] = payload.get("version", "draft")
+            info["id"] = f"DANDI:{payload.get('dandiset_id', '000001')}/{info['version']}"
+            self._send_json(200, info)
+        elif self.path.endswith("/dandiset_assets"):
+            assets = server.assets
+            if payload.get("glob"):
+                assets = [a for a in assets if fnmatch.fnmatch(a["path"], payload["glob"])]
+            page = int(payload.get("page", 1))
+            page_size = int(payload.get("page_size", 20))
+            start = (page - 1) * page_size
+            self._send_json(200, {"count": len(assets), "results": assets[start:start + page_size]})
+        else:
+            self._send_json(404, {"error": f"Unknown endpoint {self.path}"})
+
+    def do_HEAD(self):
+        self._serve_file(head=True)
+
+    def do_GET(self):
+        self._serve_file(head=False)
+
+    def _serve_file(self, head: bool) -> None:
+        server: "StandInServer" = self.server.standin  # type: ignore[attr-defined]
+        name = self.path.split("?")[0].rsplit("/", 1)[-1]
+        path = server.files.get(name)
+        if path is None:
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        size = os.path.getsize(path)
+        start, end = 0, size - 1
+        status = 200
+        m = re.match(r"bytes=(\d*)-(\d*)$", self.headers.get("Range", ""))
+        if m:
+            if m.group(1):
+                start = int(m.group(1))
+                end = min(int(m.group(2)), size - 1) if m.group(2) else size - 1
+            else:
+                start = max(0, size - int(m.group(2)))
+            status = 206
+        length = max(0, end - start + 1)
+        self.send_response(status)
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("Content-Length", str(length))
+        if status == 206:
+            self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+        self.end_headers()
+        if head:
+            return
+        server._count("range_requests", bytes_served=length)
+        with open(path, "rb") as f:
+            f.seek(start)
+            self.wfile.write(f.read(length))
+
+
+class StandInServer:
+    """
+    Threaded HTTP server standing in for the neurosift tools API.
+
+    Parameters
+    ----------
+    num_assets : int, optional
+        Number of assets in the listing.
+    latency : float, optional
+        Artificial delay in seconds added to every API request.
+    files : Dict[str, str], optional
+        Files served under /files/NAME, by name.
+    failures : int, optional
+        Number of API requests answered with 503 before the first success.
+
+    Use as a context manager; api_url is the value for
+    DANDI_NOTEBOOK_GEN_API_URL.
+    """
+
+    def __init__(self, num_assets: int = 5000, *, latency: float = 0.0, files: Optional[Dict[str, str]] = None, failures: int = 0):
+        self.dandiset_info = load_recording("dandiset_info_000001.json")
+        self.assets = make_asset_listing(num_assets)
+        self.latency = latency
+        self.files = dict(files or {})
+        self.failures = failures
+        self.stats = {"api_requests": 0, "range_requests": 0, "bytes_served": 0}
+        self._lock = threading.Lock()
+        self._httpd: Optional[ThreadingHTTPServer] = None
+
+    def _count(self, name: str, bytes_served: int = 0) -> int:
+        with self._lock:
+            self.stats[name] += 1
+            self.stats["bytes_served"] += bytes_served
+            return self.stats[name]
+
+    def start(self) -> "StandInServer":
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), _StandInHandler)
+        self._httpd.daemon_threads = True
+        self._httpd.standin = self  # type: ignore[attr-defined]
+        threading.Thread(target=self._httpd.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
+
+    def __enter__(self) -> "StandInServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    @property
+    def base_url(self) -> str:
+        assert self._httpd is not None, "server is not running"
+        return f"http://127.0.0.1:{self._httpd.server_address[1]}"
+
+    @property
+    def api_url(self) -> str:
+        return f"{self.base_url}/api"
+
+    def file_url(self, name: str) -> str:
+        return f"{self.base_url}/files/{name}"
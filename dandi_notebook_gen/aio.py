@@ -0,0 +1,266 @@
+"""
+Asyncio counterparts of the DANDI tools
+
+The coroutines here mirror dandi_notebook_gen.tools: they take the same
+arguments, return the same shapes, carry the same `spec` attributes and share
+the same on-disk caches. HTTP requests go through one httpx.AsyncClient per
+event loop, with the same timeouts and retry policy as the sync transport, so
+metadata for many dandisets can be gathered concurrently from one loop.
+
+Requires httpx (pip install "dandi-notebook-gen[aio]").
+"""
+
+from typing import Any, AsyncIterator, Dict, List, Optional, Union
+import asyncio
+import weakref
+
+from . import tools
+from .asset_filter import AssetFilter, sort_assets
+from .cache import cache_enabled, get_nwb_info_cache, get_response_cache, ttl_for_version
+from .range_proxy import rewrite_urls
+from .snapshot import get_snapshot_path
+from .transport import RETRY_STATUS_CODES, _backoff_delay, _count, get_max_retries, get_timeout
+
+try:
+    import httpx
+except ImportError:  # pragma: no cover - depends on the environment
+    httpx = None
+
+_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Any]" = weakref.WeakKeyDictionary()
+
+
+def get_client() -> "httpx.AsyncClient":
+    """Return the shared client for the running event loop, creating it on first use."""
+    if httpx is None:
+        raise ImportError("The asyncio API requires httpx: pip install \"dandi-notebook-gen[aio]\"")
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None or client.is_closed:
+        connect_timeout, read_timeout = get_timeout()
+        client = httpx.AsyncClient(
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+        )
+        _clients[loop] = client
+    return client
+
+
+async def aclose() -> None:
+    """Close the shared client of the running event loop."""
+    client = _clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+
+
+async def _post_json(url: str, payload: Dict[str, Any]) -> "httpx.Response":
+    """POST with the same retry policy as transport.request."""
+    client = get_client()
+    max_retries = get_max_retries()
+    attempt = 0
+    while True:
+        response = None
+        try:
+            response = await client.post(url, json=payload)
+        except (httpx.TransportError, httpx.TimeoutException):
+            _count(requests=1)
+            if attempt >= max_retries:
+                _count(failures=1)
+                raise
+        else:
+            _count(
+                requests=1,
+                bytes_sent=len(response.request.content or b""),
+                bytes_received=len(response.content),
+            )
+            if response.status_code not in RETRY_STATUS_CODES:
+                return response
+            if attempt >= max_retries:
+                _count(failures=1)
+                return response
+        _count(retries=1)
+        await asyncio.sleep(_backoff_delay(attempt, response))
+        attempt += 1
+
+
+async def _with_timeout(coro, timeout: Optional[float]):
+    if timeout is None:
+        return await coro
+    return await asyncio.wait_for(coro, timeout)
+
+
+async def _dandiset_assets_page(
+    dandiset_id: str, version: str, page: int, page_size: int, use_cache: bool, timeout: Optional[float]
+) -> Dict[str, Any]:
+    """One unfiltered page of the listing, as requested from the server."""
+    url = f"{tools.API_BASE_URL}/dandiset_assets"
+    use_cache = use_cache and cache_enabled()
+    # same key as tools.dandiset_assets, so both APIs share the cache
+    cache_key = ["dandiset_assets", url, dandiset_id, version, page, page_size, None]
+    if use_cache:
+        cached = get_response_cache().get(cache_key, ttl=ttl_for_version(version))
+        if cached is not None:
+            return cached
+    payload: Dict[str, Any] = {
+        "dandiset_id": dandiset_id,
+        "version": version,
+        "page": page,
+        "page_size": page_size,
+    }
+    response = await _with_timeout(_post_json(url, payload), timeout)
+    if response.status_code != 200:
+        raise RuntimeError(f"Failed to fetch dandiset assets: {response.text}")
+    result = response.json()
+    if use_cache:
+        get_response_cache().set(cache_key, result)
+    return result
+
+
+async def _iter_pages(
+    dandiset_id: str, version: str, page_size: int, max_concurrency: int, use_cache: bool
+) -> AsyncIterator[Dict[str, Any]]:
+    first = await _dandiset_assets_page(dandiset_id, version, 1, page_size, use_cache, None)
+    for asset in first["results"]:
+        yield asset
+    num_pages = -(-first["count"] // page_size)
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def fetch(page: int) -> Dict[str, Any]:
+        async with semaphore:
+            return await _dandiset_assets_page(dandiset_id, version, page, page_size, use_cache, None)
+
+    tasks = [asyncio.ensure_future(fetch(page)) for page in range(2, num_pages + 1)]
+    try:
+        for task in tasks:
+            for asset in (await task)["results"]:
+                yield asset
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def all_dandiset_assets(
+    dandiset_id: str, version: str = "draft", use_cache: bool = True, timeout: Optional[float] = None
+) -> List[Dict[str, Any]]:
+    """Async version of tools.all_dandiset_assets.
+
+    timeout bounds the whole call, including retries, in seconds.
+    """
+    if get_snapshot_path():
+        return tools.all_dandiset_assets(dandiset_id, version, use_cache=use_cache)
+    use_cache = use_cache and cache_enabled()
+    # same key as tools.all_dandiset_assets, so both APIs share the cache
+    cache_key = ["all_dandiset_assets", tools.API_BASE_URL, dandiset_id, version]
+    if use_cache:
+        cached = get_response_cache().get(cache_key, ttl=ttl_for_version(version))
+        if cached is not None:
+            return cached
+
+    async def collect() -> List[Dict[str, Any]]:
+        # only the full listing is cached, as in tools.all_dandiset_assets
+        return [a async for a in _iter_pages(dandiset_id, version, 100, 8, False)]
+
+    assets = await _with_timeout(collect(), timeout)
+    if use_cache:
+        get_response_cache().set(cache_key, assets)
+    return assets
+
+
+async def dandiset_assets(
+    dandiset_id: str,
+    version: str = "draft",
+    page: int = 1,
+    page_size: int = 20,
+    glob: Union[str, List[str], None] = None,
+    use_cache: bool = True,
+    regex: Union[str, List[str], None] = None,
+    min_size: Union[int, str, None] = None,
+    max_size: Union[int, str, None] = None,
+    sort: Optional[str] = None,
+    timeout: Optional[float] = None,
+) -> Dict[str, Any]:
+    """Async version of tools.dandiset_assets.
+
+    As there, filters and sorting are applied locally to the full listing
+    (see all_dandiset_assets). timeout bounds the whole call, including
+    retries, in seconds.
+    """
+    asset_filter = AssetFilter(glob, regex, min_size, max_size)
+    if asset_filter.active or sort or get_snapshot_path():
+        assets = await all_dandiset_assets(dandiset_id, version, use_cache=use_cache, timeout=timeout)
+        matches = sort_assets([a for a in assets if asset_filter(a)], sort)
+        start = (page - 1) * page_size
+        return {"count": len(matches), "results": matches[start:start + page_size]}
+    return await _dandiset_assets_page(dandiset_id, version, page, page_size, use_cache, timeout)
+
+
+async def iter_dandiset_assets(
+    dandiset_id: str,
+    version: str = "draft",
+    glob: Union[str, List[str], None] = None,
+    page_size: int = 100,
+    max_concurrency: int = 8,
+    use_cache: bool = True,
+) -> AsyncIterator[Dict[str, Any]]:
+    """Async version of tools.iter_dandiset_assets.
+
+    After the first page, up to max_concurrency pages are requested at once;
+    assets are yielded in listing order. glob is applied locally to the full
+    listing, as in the sync version.
+    """
+    if glob:
+        asset_filter = AssetFilter(glob)
+        for asset in await all_dandiset_assets(dandiset_id, version, use_cache=use_cache):
+            if asset_filter(asset):
+                yield asset
+        return
+    async for asset in _iter_pages(dandiset_id, version, page_size, max_concurrency, use_cache):
+        yield asset
+
+
+async def nwb_file_info(dandiset_id: str, nwb_file_url: str, use_cache: bool = True, timeout: Optional[float] = None) -> str:
+    """Async version of tools.nwb_file_info.
+
+    get_nwbfile_info is a blocking library, so a cache miss runs it in the
+    loop's default executor. Cancelling the coroutine (or hitting timeout)
+    returns control immediately, but the extraction thread runs to
+    completion in the background.
+    """
+    if get_snapshot_path():
+        return tools.nwb_file_info(dandiset_id, nwb_file_url, use_cache=use_cache)
+    if use_cache and cache_enabled():
+        cached = get_nwb_info_cache().get(["nwb_file_info", nwb_file_url, tools._get_nwbfile_info_version()])
+        if cached is not None:
+            return rewrite_urls(cached)
+    loop = asyncio.get_running_loop()
+    future = loop.run_in_executor(None, lambda: tools.nwb_file_info(dandiset_id, nwb_file_url, use_cache=use_cache))
+    return await _with_timeout(future, timeout)
+
+
+async def dandiset_info(dandiset_id: str, version: str = "draft", use_cache: bool = True, timeout: Optional[float] = None) -> Dict[str, Any]:
+    """Async version of tools.dandiset_info.
+
+    timeout bounds the whole call, including retries, in seconds.
+    """
+    if get_snapshot_path():
+        return tools.dandiset_info(dandiset_id, version=version, use_cache=use_cache)
+    url = f"{tools.API_BASE_URL}/dandiset_info"
+    use_cache = use_cache and cache_enabled()
+    # same key as tools.dandiset_info, so both APIs share the cache
+    cache_key = ["dandiset_info", url, dandiset_id, version]
+    if use_cache:
+        cached = get_response_cache().get(cache_key, ttl=ttl_for_version(version))
+        if cached is not None:
+            return cached
+    payload = {"dandiset_id": dandiset_id, "version": version}
+    response = await _with_timeout(_post_json(url, payload), timeout)
+    if response.status_code != 200:
+        raise RuntimeError(f"Failed to fetch dandiset info: {response.text}")
+    result = response.json()
+    if use_cache:
+        get_response_cache().set(cache_key, result)
+    return result
+
+
+setattr(dandiset_info, "spec", tools.dandiset_info_spec)
+setattr(dandiset_assets, "spec", tools.dandiset_assets_spec)
+setattr(nwb_file_info, "spec", tools.nwb_file_info_spec)
@@ -0,0 +1,161 @@
+"""
+Local filtering, sorting and summaries of Dandiset asset listings
+
+Every different --glob the agent tries used to be another request to the
+server. tools.all_dandiset_assets fetches the full listing of a Dandiset
+version once and keeps it in the response cache; the filters here then run
+locally:
+
+- globs: fnmatch patterns matched against the whole path (`*` also matches
+  `/`, so `*.nwb` matches files in subdirectories). An asset matches if it
+  matches any of them.
+- regexes: regular expressions searched for in the path. An asset matches
+  if any of them is found.
+- min_size / max_size: inclusive size range in bytes (see parse_size for
+  values such as "10MiB").
+
+Each kind of filter that is given must match. All patterns are compiled
+once into a single regular expression per kind.
+
+summarize_assets counts files and bytes per subject, session and extension,
+taken from BIDS-style paths (sub-XXX/sub-XXX_ses-YYY_....nwb), and lists the
+smallest file of each extension, so that the agent can pick a small
+representative file without paging through the listing.
+"""
+
+from typing import Any, Callable, Dict, Iterable, List, Optional, Union
+import fnmatch
+import re
+
+SORT_KEYS = ("path", "size", "-path", "-size")
+
+_SIZE = re.compile(r"^\s*(\d+(?:\.\d+)?)\s*((?:[kmgtp]i?)?b?)\s*$", re.IGNORECASE)
+_SIZE_UNITS = {"": 1, "b": 1, "k": 1000, "m": 1000 ** 2, "g": 1000 ** 3, "t": 1000 ** 4, "p": 1000 ** 5}
+_SUBJECT = re.compile(r"(?:^|[/_])sub-([^/_.]+)")
+_SESSION = re.compile(r"(?:^|[/_])ses-([^/_.]+)")
+
+
+def parse_size(value: Union[str, int, None]) -> Optional[int]:
+    """Parse a size such as 1024, "500MB" or "1.5GiB" into bytes."""
+    if value is None or isinstance(value, int):
+        return value
+    m = _SIZE.match(value)
+    if not m:
+        raise ValueError(f"Invalid size: {value} (expected e.g. 1024, 500MB or 1.5GiB)")
+    number, unit = float(m.group(1)), m.group(2).lower()
+    prefix = unit[:1] if unit[:1] != "b" else ""
+    factor = _SIZE_UNITS[prefix]
+    if "i" in unit:
+        factor = 1024 ** (" kmgtp".index(prefix))
+    return int(number * factor)
+
+
+def _as_list(patterns: Union[str, Iterable[str], None]) -> List[str]:
+    if patterns is None:
+        return []
+    if isinstance(patterns, str):
+        return [patterns]
+    return [p for p in patterns if p]
+
+
+class AssetFilter:
+    """
+    Precompiled matcher for assets ({"asset_id", "path", "size", ...}).
+
+    Parameters
+    ----------
+    globs : str or List[str], optional
+        fnmatch patterns for the path; any may match.
+    regexes : str or List[str], optional
+        Regular expressions searched for in the path; any may match.
+    min_size, max_size : int or str, optional
+        Inclusive size range, in bytes or as accepted by parse_size.
+    """
+
+    def __init__(
+        self,
+        globs: Union[str, Iterable[str], None] = None,
+        regexes: Union[str, Iterable[str], None] = None,
+        min_size: Union[int, str, None] = None,
+        max_size: Union[int, str, None] = None,
+    ):
+        globs, regexes = _as_list(globs), _as_list(regexes)
+        self._glob = re.compile("|".join(fnmatch.translate(g) for g in globs)) if globs else None
+        try:
+            self._regex = re.compile("|".join(f"(?:{r})" for r in regexes)) if regexes else None
+        except re.error as e:
+            raise ValueError(f"Invalid regular expression: {e}") from e
+        self.min_size = parse_size(min_size)
+        self.max_size = parse_size(max_size)
+
+    @property
+    def active(self) -> bool:
+        return any(x is not None for x in (self._glob, self._regex, self.min_size, self.max_size))
+
+    def __call__(self, asset: Dict[str, Any]) -> bool:
+        path = asset.get("path", "")
+        if self._glob is not None and not self._glob.match(path):
+            return False
+        if self._regex is not None and not self._regex.search(path):
+            return False
+        size = asset.get("size") or 0
+        if self.min_size is not None and size < self.min_size:
+            return False
+        if self.max_size is not None and size > self.max_size:
+            return False
+        return True
+
+
+def sort_assets(assets: List[Dict[str, Any]], sort: Optional[str]) -> List[Dict[str, Any]]:
+    """Sort assets by one of SORT_KEYS (a leading - reverses the order); None keeps the listing order."""
+    if sort is None:
+        return assets
+    if sort not in SORT_KEYS:
+        raise ValueError(f"Unknown sort key: {sort} (expected one of {', '.join(SORT_KEYS)})")
+    key: Callable[[Dict[str, Any]], Any]
+    if sort.lstrip("-") == "size":
+        key = lambda a: (a.get("size") or 0, a.get("path", ""))
+    else:
+        key = lambda a: a.get("path", "")
+    return sorted(assets, key=key, reverse=sort.startswith("-"))
+
+
+def extension(path: str) -> str:
+    """Everything from the first dot of the file name, e.g. ".nwb" or ".nwb.lindi.json"."""
+    name = path.rsplit("/", 1)[-1]
+    return name[name.index("."):] if "." in name.lstrip(".") else ""
+
+
+def _group(key: Optional[str], size: int, groups: Dict[str, Dict[str, int]]) -> None:
+    entry = groups.setdefault(key if key is not None else "(none)", {"count": 0, "bytes": 0})
+    entry["count"] += 1
+    entry["bytes"] += size
+
+
+def summarize_assets(assets: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Count files and bytes per subject, session and extension.
+
+    Returns
+    -------
+    Dict[str, Any]
+        count and bytes overall; by_subject, by_session and by_extension,
+        each mapping a value to its count and bytes (files without a
+        subject or session are counted under "(none)"); and
+        smallest_by_extension, the smallest asset of each extension.
+    """
+    summary: Dict[str, Any] = {"count": 0, "bytes": 0, "by_subject": {}, "by_session": {}, "by_extension": {}}
+    smallest: Dict[str, Dict[str, Any]] = {}
+    for asset in assets:
+        path, size = asset.get("path", ""), asset.get("size") or 0
+        summary["count"] += 1
+        summary["bytes"] += size
+        subject, session = _SUBJECT.search(path), _SESSION.search(path)
+        _group(subject.group(1) if subject else None, size, summary["by_subject"])
+        _group(session.group(1) if session else None, size, summary["by_session"])
+        ext = extension(path)
+        _group(ext or "(none)", size, summary["by_extension"])
+        if ext not in smallest or size < (smallest[ext].get("size") or 0):
+            smallest[ext] = asset
+    summary["smallest_by_extension"] = {ext or "(none)": a for ext, a in sorted(smallest.items())}
+    return summary
@@ -0,0 +1,207 @@
+"""
+Memory-compact, columnar asset listings
+
+A listing of a few hundred thousand assets as Python dicts takes hundreds
+of bytes per asset. AssetTable stores the same listing in a handful of
+flat buffers:
+
+- directories of the paths are interned: each distinct directory is stored
+  once and every asset keeps an int32 index into them
+- file names and asset IDs are stored as UTF-8 bytes, concatenated, with
+  int64 offsets (the layout of Arrow string arrays)
+- sizes are an int64 array
+
+Tables are built by streaming records (e.g. from tools.iter_dandiset_assets),
+so the dicts of only one page exist at a time. Rows are read back as
+AssetRecord views, or exported to NumPy, Arrow or Parquet.
+"""
+
+from array import array
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Union
+import sys
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow
+    except ImportError:
+        raise ImportError("Arrow and Parquet export require pyarrow: pip install \"dandi-notebook-gen[arrow]\"")
+    return pyarrow
+
+
+class _StringColumn:
+    """Strings stored as one UTF-8 buffer plus offsets."""
+
+    __slots__ = ("data", "offsets")
+
+    def __init__(self):
+        self.data = bytearray()
+        self.offsets = array("q", [0])
+
+    def append(self, value: str) -> None:
+        self.data += value.encode("utf-8")
+        self.offsets.append(len(self.data))
+
+    def __getitem__(self, i: int) -> str:
+        return self.data[self.offsets[i]:self.offsets[i + 1]].decode("utf-8")
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def nbytes(self) -> int:
+        return len(self.data) + self.offsets.itemsize * len(self.offsets)
+
+
+class AssetRecord:
+    """One row of an AssetTable."""
+
+    __slots__ = ("asset_id", "path", "size")
+
+    def __init__(self, asset_id: str, path: str, size: int):
+        self.asset_id = asset_id
+        self.path = path
+        self.size = size
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"asset_id": self.asset_id, "path": self.path, "size": self.size}
+
+    def __repr__(self) -> str:
+        return f"AssetRecord(asset_id={self.asset_id!r}, path={self.path!r}, size={self.size})"
+
+    def __eq__(self, other: Any) -> bool:
+        return isinstance(other, AssetRecord) and (self.asset_id, self.path, self.size) == (other.asset_id, other.path, other.size)
+
+
+class AssetTable:
+    """
+    Columnar listing of assets (asset_id, path, size).
+
+    Build it with AssetTable.from_records or append; read rows by index or
+    by iterating, which yields AssetRecord views.
+    """
+
+    __slots__ = ("_dirs", "_dir_lookup", "_dir_index", "_names", "_ids", "_sizes")
+
+    def __init__(self):
+        self._dirs: List[str] = []
+        self._dir_lookup: Dict[str, int] = {}
+        self._dir_index = array("i")
+        self._names = _StringColumn()
+        self._ids = _StringColumn()
+        self._sizes = array("q")
+
+    @classmethod
+    def from_records(cls, records: Iterable[Union[Dict[str, Any], AssetRecord]]) -> "AssetTable":
+        """Build a table from asset dicts (or records), consuming them one at a time."""
+        table = cls()
+        for record in records:
+            if isinstance(record, AssetRecord):
+                table.append(record.asset_id, record.path, record.size)
+            else:
+                table.append(record.get("asset_id", ""), record.get("path", ""), record.get("size") or 0)
+        return table
+
+    def append(self, asset_id: str, path: str, size: int) -> None:
+        directory, _, name = path.rpartition("/")
+        index = self._dir_lookup.get(directory)
+        if index is None:
+            index = len(self._dirs)
+            self._dirs.append(sys.intern(directory))
+            self._dir_lookup[self._dirs[-1]] = index
+        self._dir_index.append(index)
+        self._names.append(name)
+        self._ids.append(asset_id)
+        self._sizes.append(size)
+
+    def __len__(self) -> int:
+        return len(self._sizes)
+
+    def path(self, i: int) -> str:
+        directory = self._dirs[self._dir_index[i]]
+        return f"{directory}/{self._names[i]}" if directory else self._names[i]
+
+    def asset_id(self, i: int) -> str:
+        return self._ids[i]
+
+    def size(self, i: int) -> int:
+        return self._sizes[i]
+
+    def __getitem__(self, i: int) -> AssetRecord:
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("asset index out of range")
+        return AssetRecord(self._ids[i], self.path(i), self._sizes[i])
+
+    def __iter__(self) -> Iterator[AssetRecord]:
+        for i in range(len(self)):
+            yield AssetRecord(self._ids[i], self.path(i), self._sizes[i])
+
+    def records(self) -> Iterator[Dict[str, Any]]:
+        """Yield the rows as dicts, e.g. for formatting.format_records."""
+        for record in self:
+            yield record.to_dict()
+
+    def filter(self, predicate: Callable[[Dict[str, Any]], bool]) -> "AssetTable":
+        """Return a new table with the rows for which predicate (e.g. an AssetFilter) is true."""
+        return AssetTable.from_records(r for r in self.records() if predicate(r))
+
+    @property
+    def sizes(self) -> array:
+        """The sizes as an int64 array (not a copy)."""
+        return self._sizes
+
+    @property
+    def directories(self) -> List[str]:
+        """The distinct directories of the paths."""
+        return list(self._dirs)
+
+    def total_size(self) -> int:
+        return sum(self._sizes)
+
+    def nbytes(self) -> int:
+        """Approximate memory used by the columns."""
+        return (
+            sum(sys.getsizeof(d) for d in self._dirs)
+            + self._dir_index.itemsize * len(self._dir_index)
+            + self._names.nbytes()
+            + self._ids.nbytes()
+            + self._sizes.itemsize * len(self._sizes)
+        )
+
+    def to_numpy(self) -> Dict[str, Any]:
+        """
+        Export the columns as NumPy arrays.
+
+        Returns
+        -------
+        Dict[str, numpy.ndarray]
+            asset_id and path as unicode arrays, size as int64 (sharing
+            memory with the table, which must then not be appended to).
+        """
+        import numpy as np
+        return {
+            "asset_id": np.array([self._ids[i] for i in range(len(self))], dtype=str),
+            "path": np.array([self.path(i) for i in range(len(self))], dtype=str),
+            "size": np.frombuffer(self._sizes, dtype=np.int64) if len(self) else np.zeros(0, dtype=np.int64),
+        }
+
+    def to_arrow(self):
+        """
+        Export the table as a pyarrow.Table (requires pyarrow).
+
+        The asset_id column is built on the table's buffers without copying
+        them, so the table must not be appended to while it is in use.
+        """
+        pa = _require_pyarrow()
+        n = len(self)
+        ids = pa.LargeStringArray.from_buffers(n, pa.py_buffer(self._ids.offsets), pa.py_buffer(self._ids.data))
+        paths = pa.array([self.path(i) for i in range(n)], type=pa.large_string())
+        sizes = pa.array(self._sizes, type=pa.int64())
+        return pa.table({"asset_id": ids, "path": paths, "size": sizes})
+
+    def write_parquet(self, path: str) -> None:
+        """Write the table to a Parquet file (requires pyarrow)."""
+        _require_pyarrow()
+        import pyarrow.parquet as pq
+        pq.write_table(self.to_arrow(), path)
@@ -0,0 +1,247 @@
+"""
+Batch notebook generation across many Dandisets
+
+Each Dandiset is generated in its own worker process and working directory:
+
+    OUTPUT_DIR/
+        summary.json
+        DANDISET_ID/
+            notebook.ipynb   (the generated notebook)
+            output.log       (stdout/stderr of the worker)
+            work/            (working directory, including metadata.json)
+"""
+
+from typing import Any, Dict, Iterable, List, Optional, Union
+import json
+import os
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import nullcontext
+
+from .daemon import running_daemon
+from .manifest import get_manifest_path, read_manifest
+
+TOKEN_KEYS = [
+    "total_prompt_tokens",
+    "total_completion_tokens",
+    "total_vision_prompt_tokens",
+    "total_vision_completion_tokens",
+]
+
+
+def read_dandiset_ids(path: str) -> List[str]:
+    """
+    Read Dandiset IDs from a text file, one per line.
+
+    Blank lines and lines starting with '#' are ignored.
+    """
+    ids = []
+    with open(path, "r") as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith("#"):
+                ids.append(line)
+    return ids
+
+
+def _paths(output_dir: str, dandiset_id: str) -> Dict[str, str]:
+    run_dir = os.path.join(output_dir, dandiset_id)
+    return {
+        "run_dir": run_dir,
+        "notebook": os.path.join(run_dir, "notebook.ipynb"),
+        "log": os.path.join(run_dir, "output.log"),
+        "working_dir": os.path.join(run_dir, "work"),
+        "metadata": os.path.join(run_dir, "work", "metadata.json"),
+    }
+
+
+def _read_metadata(path: str) -> Dict[str, Any]:
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _record(dandiset_id: str, status: str, paths: Dict[str, str], elapsed: Optional[float], error: Optional[str] = None) -> Dict[str, Any]:
+    metadata = _read_metadata(paths["metadata"])
+    record: Dict[str, Any] = {
+        "dandiset_id": dandiset_id,
+        "status": status,
+        "notebook_path": paths["notebook"] if status != "failed" else None,
+        "elapsed_time_seconds": elapsed if elapsed is not None else metadata.get("elapsed_time_seconds"),
+    }
+    for key in TOKEN_KEYS:
+        record[key] = metadata.get(key)
+    if error:
+        record["error"] = error
+    return record
+
+
+def is_complete(output_dir: str, dandiset_id: str) -> bool:
+    """Whether a previous batch run already produced a notebook for this Dandiset that the budget did not cut short."""
+    paths = _paths(output_dir, dandiset_id)
+    if not (os.path.exists(paths["notebook"]) and os.path.exists(paths["metadata"])):
+        return False
+    return not _read_metadata(paths["metadata"]).get("partial")
+
+
+def _generate_one(dandiset_id: str, output_dir: str, options: Dict[str, Any]) -> Dict[str, Any]:
+    """Worker: generate one notebook, sending all output to the run's log file."""
+    from .generator import generate_notebook
+
+    paths = _paths(output_dir, dandiset_id)
+    os.makedirs(paths["working_dir"], exist_ok=True)
+    manifest_path = get_manifest_path(paths["notebook"])
+    previous_entry = read_manifest(manifest_path).get(dandiset_id)
+    start_time = time.time()
+    with open(paths["log"], "w") as log:
+        original_stdout, original_stderr = sys.stdout, sys.stderr
+        sys.stdout = sys.stderr = log
+        try:
+            generate_notebook(
+                dandiset_id,
+                output_path=paths["notebook"],
+                working_dir=paths["working_dir"],
+                auto=True,
+                **options,
+            )
+            status, error = "success", None
+            if options.get("if_changed") and previous_entry is not None and read_manifest(manifest_path).get(dandiset_id) == previous_entry:
+                # generate_notebook kept the existing notebook
+                status = "unchanged"
+        except Exception as e:
+            traceback.print_exc()
+            status, error = "failed", f"{type(e).__name__}: {e}"
+        finally:
+            sys.stdout, sys.stderr = original_stdout, original_stderr
+    return _record(dandiset_id, status, paths, time.time() - start_time, error)
+
+
+def _write_summary(summary_path: str, records: Dict[str, Dict[str, Any]], start_time: float) -> Dict[str, Any]:
+    runs = list(records.values())
+    summary = {
+        "timestamp": time.strftime('%Y-%m-%d %H:%M:%S'),
+        "elapsed_time_seconds": time.time() - start_time,
+        "num_success": sum(1 for r in runs if r["status"] == "success"),
+        "num_skipped": sum(1 for r in runs if r["status"] == "skipped"),
+        "num_unchanged": sum(1 for r in runs if r["status"] == "unchanged"),
+        "num_failed": sum(1 for r in runs if r["status"] == "failed"),
+        "num_pending": sum(1 for r in runs if r["status"] == "pending"),
+        "runs": runs,
+    }
+    for key in TOKEN_KEYS:
+        summary[key] = sum(r.get(key) or 0 for r in runs)
+    tmp_path = summary_path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(summary, f, indent=2)
+    os.replace(tmp_path, summary_path)
+    return summary
+
+
+def generate_notebooks(
+    dandiset_ids: Iterable[str],
+    output_dir: str,
+    *,
+    max_workers: int = 4,
+    model: str = "google/gemini-2.0-flash-001",
+    vision_model: Union[str, None] = None,
+    approve_all_commands: bool = False,
+    experimental_mode: bool = True,
+    use_daemon: bool = False,
+    resume: bool = True,
+    if_changed: bool = False,
+    no_container: bool = False,
+    on_complete=None,
+) -> Dict[str, Any]:
+    """
+    Generate notebooks for many Dandisets in parallel worker processes.
+
+    Every generation runs in auto mode in its own working directory under
+    output_dir. The summary (output_dir/summary.json) is rewritten after each
+    run finishes, so an interrupted batch can be resumed.
+
+    Parameters
+    ----------
+    dandiset_ids : Iterable[str]
+        The IDs of the Dandisets to generate notebooks for.
+    output_dir : str
+        Directory for the notebooks, logs, working directories and summary.
+    max_workers : int, optional
+        Maximum number of generations running at once.
+    model : str, optional
+        The AI model to use for generating the notebook content.
+    vision_model : str, optional
+        The AI model to use for analyzing images. If None, the model parameter will be used.
+    approve_all_commands : bool, optional
+        Whether to run minicline in approve_all_commands mode.
+    experimental_mode : bool, optional
+        Whether to use the experimental instructions.
+    use_daemon : bool, optional
+        Whether to start one resident tool daemon shared by all workers.
+    resume : bool, optional
+        Whether to skip Dandisets that already have a successful output, and to resume
+        interrupted runs from their last checkpoint (see generate_notebook).
+    if_changed : bool, optional
+        Check every Dandiset, including completed ones, and regenerate only those whose
+        version, instructions, models or package version changed (see
+        generate_notebook). Takes precedence over resume.
+    no_container : bool, optional
+        Run the agents' commands on the host instead of in Docker containers (see
+        generate_notebook).
+    on_complete : callable, optional
+        Called with each run's record as soon as it finishes.
+
+    Returns
+    -------
+    Dict[str, Any]
+        The summary, with per-Dandiset status, elapsed time and token counts.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    summary_path = os.path.join(output_dir, "summary.json")
+    start_time = time.time()
+
+    # keep the input order but drop duplicates
+    ids = list(dict.fromkeys(dandiset_ids))
+    records: Dict[str, Dict[str, Any]] = {}
+    to_run = []
+    for dandiset_id in ids:
+        if resume and not if_changed and is_complete(output_dir, dandiset_id):
+            records[dandiset_id] = _record(dandiset_id, "skipped", _paths(output_dir, dandiset_id), None)
+        else:
+            records[dandiset_id] = {"dandiset_id": dandiset_id, "status": "pending"}
+            to_run.append(dandiset_id)
+    summary = _write_summary(summary_path, records, start_time)
+
+    options = {
+        "model": model,
+        "vision_model": vision_model,
+        "approve_all_commands": approve_all_commands,
+        "experimental_mode": experimental_mode,
+        "if_changed": if_changed,
+        # interrupted runs continue from their checkpoints
+        "resume": resume,
+        "no_container": no_container,
+    }
+    if not to_run:
+        return summary
+    with running_daemon() if use_daemon else nullcontext():
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                executor.submit(_generate_one, dandiset_id, output_dir, options): dandiset_id
+                for dandiset_id in to_run
+            }
+            for future in as_completed(futures):
+                dandiset_id = futures[future]
+                try:
+                    record = future.result()
+                except Exception as e:
+                    # the worker process itself died
+                    record = _record(dandiset_id, "failed", _paths(output_dir, dandiset_id), None, f"{type(e).__name__}: {e}")
+                records[dandiset_id] = record
+                summary = _write_summary(summary_path, records, start_time)
+                if on_complete is not None:
+                    on_complete(record)
+    return summary
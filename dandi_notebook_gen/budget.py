@@ -0,0 +1,76 @@
+"""
+Wall-clock, token and cost limits of a generation run
+
+A Budget is checked by minicline_hooks before every model call and every
+tool call of the agent. When a limit is reached, BudgetExceeded is raised
+out of minicline's loop and generate_notebook ends the run, keeping the
+notebook produced so far and marking it partial in metadata.json.
+
+A tool call that is already running (e.g. the execution of the notebook)
+is not interrupted, so a run can end a little after max_seconds.
+"""
+
+from typing import Any, Dict, Optional
+import time
+
+
+class BudgetExceeded(RuntimeError):
+    """Raised when a run reaches one of the limits of its Budget."""
+
+    def __init__(self, limit: str, message: str):
+        super().__init__(message)
+        self.limit = limit
+
+
+class Budget:
+    """
+    Limits of a run and what it has spent so far.
+
+    Parameters
+    ----------
+    max_seconds : float, optional
+        Wall-clock limit, counted from start_time.
+    max_prompt_tokens : int, optional
+        Limit on prompt tokens, including the prompt tokens of image analysis.
+    max_cost : float, optional
+        Limit on the cost in USD, as reported by OpenRouter (requires prompt
+        caching, which requests usage accounting).
+    start_time : float, optional
+        When the run started; defaults to now.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_seconds: Optional[float] = None,
+        max_prompt_tokens: Optional[int] = None,
+        max_cost: Optional[float] = None,
+        start_time: Optional[float] = None,
+    ):
+        self.max_seconds = max_seconds
+        self.max_prompt_tokens = max_prompt_tokens
+        self.max_cost = max_cost
+        self.start_time = start_time if start_time is not None else time.time()
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.vision_prompt_tokens = 0
+        self.vision_completion_tokens = 0
+        self.cost = 0.0
+
+    @property
+    def limited(self) -> bool:
+        return any(v is not None for v in (self.max_seconds, self.max_prompt_tokens, self.max_cost))
+
+    def check(self) -> None:
+        """Raise BudgetExceeded if a limit has been reached."""
+        elapsed = time.time() - self.start_time
+        if self.max_seconds is not None and elapsed >= self.max_seconds:
+            raise BudgetExceeded("max_seconds", f"Reached the time limit of {self.max_seconds} seconds")
+        prompt_tokens = self.prompt_tokens + self.vision_prompt_tokens
+        if self.max_prompt_tokens is not None and prompt_tokens >= self.max_prompt_tokens:
+            raise BudgetExceeded("max_prompt_tokens", f"Reached the limit of {self.max_prompt_tokens} prompt tokens ({prompt_tokens} spent)")
+        if self.max_cost is not None and self.cost >= self.max_cost:
+            raise BudgetExceeded("max_cost", f"Reached the cost limit of ${self.max_cost} (${self.cost:.4f} spent)")
+
+    def limits(self) -> Dict[str, Any]:
+        return {"max_seconds": self.max_seconds, "max_prompt_tokens": self.max_prompt_tokens, "max_cost": self.max_cost}
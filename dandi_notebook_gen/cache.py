@@ -0,0 +1,433 @@
+"""
+On-disk cache for responses returned by the DANDI tools
+"""
+
+from typing import Any, Dict, List, Optional, Tuple, Union
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+DEFAULT_NWB_INFO_MAX_BYTES = 128 * 1024 * 1024
+DEFAULT_CELL_OUTPUT_MAX_BYTES = 256 * 1024 * 1024
+DEFAULT_VISION_MAX_BYTES = 32 * 1024 * 1024
+DEFAULT_BYTE_RANGE_MAX_BYTES = 2 * 1024 * 1024 * 1024
+DEFAULT_BLOCK_SIZE = 256 * 1024
+DEFAULT_DRAFT_TTL_SECONDS = 60 * 60
+
+
+def get_cache_dir() -> Path:
+    """
+    Return the root directory of the cache.
+
+    The location can be set with the DANDI_NOTEBOOK_GEN_CACHE_DIR environment
+    variable. Otherwise $XDG_CACHE_HOME/dandi-notebook-gen (or
+    ~/.cache/dandi-notebook-gen) is used.
+    """
+    cache_dir = os.environ.get("DANDI_NOTEBOOK_GEN_CACHE_DIR")
+    if cache_dir:
+        return Path(cache_dir)
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return Path(base) / "dandi-notebook-gen"
+
+
+def cache_enabled() -> bool:
+    """Whether caching is enabled (disable with DANDI_NOTEBOOK_GEN_NO_CACHE=1)."""
+    value = os.environ.get("DANDI_NOTEBOOK_GEN_NO_CACHE", "")
+    return value.strip().lower() in ("", "0", "false", "no")
+
+
+def get_max_bytes(env_var: str = "DANDI_NOTEBOOK_GEN_CACHE_MAX_BYTES", default: int = DEFAULT_MAX_BYTES) -> int:
+    """Size bound of a cache namespace, read from env_var."""
+    value = os.environ.get(env_var)
+    return int(value) if value else default
+
+
+def get_draft_ttl() -> float:
+    """Lifetime in seconds of entries for draft versions (DANDI_NOTEBOOK_GEN_CACHE_DRAFT_TTL)."""
+    value = os.environ.get("DANDI_NOTEBOOK_GEN_CACHE_DRAFT_TTL")
+    return float(value) if value else DEFAULT_DRAFT_TTL_SECONDS
+
+
+def ttl_for_version(version: str) -> Optional[float]:
+    """
+    Return the time-to-live for a dandiset version.
+
+    Published versions are immutable so their entries never expire; the
+    draft version can change at any time.
+    """
+    return get_draft_ttl() if version == "draft" else None
+
+
+class DiskCache:
+    """
+    A size-bounded, least-recently-used cache of JSON values stored on disk.
+
+    Each entry is a single JSON file named by the hash of its key. Writes are
+    atomic, so several processes may share the same cache directory. Reading
+    an entry refreshes its modification time, which is what eviction uses to
+    find the least recently used entries. A running total of the entry sizes
+    is kept, as in BlockCache, so that a write only scans the directory when
+    the total exceeds max_bytes.
+
+    Parameters
+    ----------
+    namespace : str
+        Subdirectory of the cache directory holding this cache's entries.
+    directory : str or Path, optional
+        Root cache directory. Defaults to get_cache_dir().
+    max_bytes : int, optional
+        Upper bound on the total size of the entries. Defaults to get_max_bytes().
+    """
+
+    def __init__(self, namespace: str, *, directory: Union[str, Path, None] = None, max_bytes: Optional[int] = None):
+        self.namespace = namespace
+        self.directory = Path(directory) if directory is not None else get_cache_dir()
+        self.path = self.directory / namespace
+        self.max_bytes = max_bytes if max_bytes is not None else get_max_bytes()
+        self._total_bytes: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def _entry_path(self, key: Any) -> Path:
+        digest = hashlib.sha256(json.dumps(key, sort_keys=True).encode("utf-8")).hexdigest()
+        return self.path / digest[:2] / f"{digest}.json"
+
+    def get(self, key: Any, ttl: Optional[float] = None) -> Optional[Any]:
+        """
+        Return the cached value for key, or None if missing or expired.
+
+        Parameters
+        ----------
+        key : Any
+            JSON-serializable key.
+        ttl : float, optional
+            Maximum age of the entry in seconds. None means no expiry.
+        """
+        entry_path = self._entry_path(key)
+        try:
+            with open(entry_path, "r") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if ttl is not None and time.time() - entry.get("created", 0) > ttl:
+            try:
+                entry_path.unlink()
+            except OSError:
+                pass
+            return None
+        try:
+            os.utime(entry_path)
+        except OSError:
+            pass
+        return entry.get("value")
+
+    def set(self, key: Any, value: Any) -> None:
+        """Store a JSON-serializable value under key and evict old entries if needed."""
+        entry_path = self._entry_path(key)
+        entry_path.parent.mkdir(parents=True, exist_ok=True)
+        data = json.dumps({"key": key, "created": time.time(), "value": value}).encode("utf-8")
+        with self._lock:
+            try:
+                previous_size = entry_path.stat().st_size
+            except OSError:
+                previous_size = 0
+            fd, tmp_path = tempfile.mkstemp(dir=entry_path.parent, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(data)
+                os.replace(tmp_path, entry_path)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.unlink(tmp_path)
+                raise
+            if self._total_bytes is None:
+                self._total_bytes = sum(size for _, size, _ in self._entries())
+            else:
+                self._total_bytes += len(data) - previous_size
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def _entries(self):
+        if not self.path.exists():
+            return []
+        entries = []
+        for p in self.path.glob("*/*.json"):
+            try:
+                st = p.stat()
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, p))
+        return entries
+
+    def _evict(self) -> None:
+        # the directory is the truth; other processes may have written to it
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        entries.sort()
+        for _, size, p in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                p.unlink()
+            except OSError:
+                continue
+            total -= size
+        self._total_bytes = total
+
+    def clear(self) -> int:
+        """Remove all entries and return the number removed."""
+        num_removed = 0
+        for _, _, p in self._entries():
+            try:
+                p.unlink()
+                num_removed += 1
+            except OSError:
+                pass
+        with self._lock:
+            self._total_bytes = 0
+        return num_removed
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the location, number of entries and total size of the cache."""
+        entries = self._entries()
+        return {
+            "namespace": self.namespace,
+            "path": str(self.path),
+            "num_entries": len(entries),
+            "total_bytes": sum(size for _, size, _ in entries),
+            "max_bytes": self.max_bytes,
+        }
+
+
+class BlockCache:
+    """
+    A size-bounded, least-recently-used cache of blocks of remote files.
+
+    Files are identified by URL and split into fixed-size blocks. Each block
+    is stored as its own file next to a small meta.json holding the size of
+    the remote file. Writes are atomic and eviction uses modification times,
+    as in DiskCache, so several processes may share the directory.
+
+    Parameters
+    ----------
+    namespace : str, optional
+        Subdirectory of the cache directory holding the blocks.
+    directory : str or Path, optional
+        Root cache directory. Defaults to get_cache_dir().
+    max_bytes : int, optional
+        Upper bound on the total size of the blocks.
+    block_size : int, optional
+        Size of a block in bytes.
+    """
+
+    def __init__(
+        self,
+        namespace: str = "byte_ranges",
+        *,
+        directory: Union[str, Path, None] = None,
+        max_bytes: Optional[int] = None,
+        block_size: Optional[int] = None,
+    ):
+        self.namespace = namespace
+        self.directory = Path(directory) if directory is not None else get_cache_dir()
+        self.path = self.directory / namespace
+        self.max_bytes = max_bytes if max_bytes is not None else get_max_bytes(
+            "DANDI_NOTEBOOK_GEN_RANGE_CACHE_MAX_BYTES", DEFAULT_BYTE_RANGE_MAX_BYTES
+        )
+        self.block_size = block_size if block_size is not None else get_max_bytes(
+            "DANDI_NOTEBOOK_GEN_RANGE_BLOCK_BYTES", DEFAULT_BLOCK_SIZE
+        )
+        # running total of the block sizes, so that eviction does not have to
+        # scan the directory on every write; the range proxy writes blocks
+        # from several threads
+        self._total_bytes: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def _file_dir(self, url: str) -> Path:
+        digest = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        return self.path / digest[:2] / digest
+
+    def _write_atomic(self, path: Path, data: bytes) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+    def get_size(self, url: str) -> Optional[int]:
+        """Return the recorded size of the remote file, or None."""
+        try:
+            with open(self._file_dir(url) / "meta.json", "r") as f:
+                return json.load(f)["size"]
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def set_size(self, url: str, size: int) -> None:
+        meta = {"url": url, "size": size, "block_size": self.block_size}
+        self._write_atomic(self._file_dir(url) / "meta.json", json.dumps(meta).encode("utf-8"))
+
+    def _block_path(self, url: str, index: int) -> Path:
+        return self._file_dir(url) / f"{self.block_size}-{index}.bin"
+
+    def get_block(self, url: str, index: int) -> Optional[bytes]:
+        """Return block index of the file, or None if it is not cached."""
+        block_path = self._block_path(url, index)
+        try:
+            with open(block_path, "rb") as f:
+                data = f.read()
+        except OSError:
+            return None
+        try:
+            os.utime(block_path)
+        except OSError:
+            pass
+        return data
+
+    def set_block(self, url: str, index: int, data: bytes) -> None:
+        """Store a block and evict old blocks if needed."""
+        block_path = self._block_path(url, index)
+        with self._lock:
+            try:
+                previous_size = block_path.stat().st_size
+            except OSError:
+                previous_size = 0
+            self._write_atomic(block_path, data)
+            if self._total_bytes is None:
+                self._total_bytes = sum(size for _, size, _ in self._entries())
+            else:
+                self._total_bytes += len(data) - previous_size
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def _entries(self):
+        if not self.path.exists():
+            return []
+        entries = []
+        for p in self.path.glob("*/*/*.bin"):
+            try:
+                st = p.stat()
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, p))
+        return entries
+
+    def _evict(self) -> None:
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        entries.sort()
+        for _, size, p in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                p.unlink()
+            except OSError:
+                continue
+            total -= size
+        self._total_bytes = total
+
+    def clear(self) -> int:
+        """Remove all blocks and return the number removed."""
+        num_removed = 0
+        for _, _, p in self._entries():
+            try:
+                p.unlink()
+                num_removed += 1
+            except OSError:
+                pass
+        with self._lock:
+            self._total_bytes = 0
+        return num_removed
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the location, number of blocks and total size of the cache."""
+        entries = self._entries()
+        return {
+            "namespace": self.namespace,
+            "path": str(self.path),
+            "num_entries": len(entries),
+            "total_bytes": sum(size for _, size, _ in entries),
+            "max_bytes": self.max_bytes,
+            "block_size": self.block_size,
+        }
+
+
+# one DiskCache per namespace, directory and bound, so that the running
+# totals survive between calls
+_shared_caches: Dict[Tuple[str, str, int], DiskCache] = {}
+_shared_caches_lock = threading.Lock()
+
+
+def _shared_cache(namespace: str, max_bytes: Optional[int] = None) -> DiskCache:
+    if max_bytes is None:
+        max_bytes = get_max_bytes()
+    key = (namespace, str(get_cache_dir()), max_bytes)
+    with _shared_caches_lock:
+        cache = _shared_caches.get(key)
+        if cache is None:
+            cache = _shared_caches[key] = DiskCache(namespace, max_bytes=max_bytes)
+        return cache
+
+
+def get_response_cache() -> DiskCache:
+    """Return the cache used for dandiset_info and dandiset_assets responses."""
+    return _shared_cache("responses")
+
+
+def get_nwb_info_cache() -> DiskCache:
+    """
+    Return the cache used for nwb_file_info usage scripts.
+
+    Its size bound is set separately with DANDI_NOTEBOOK_GEN_NWB_CACHE_MAX_BYTES.
+    """
+    return _shared_cache(
+        "nwb_file_info",
+        max_bytes=get_max_bytes("DANDI_NOTEBOOK_GEN_NWB_CACHE_MAX_BYTES", DEFAULT_NWB_INFO_MAX_BYTES),
+    )
+
+
+def get_cell_output_cache() -> DiskCache:
+    """
+    Return the cache used for the outputs of executed notebook cells.
+
+    Its size bound is set separately with DANDI_NOTEBOOK_GEN_CELL_CACHE_MAX_BYTES.
+    """
+    return _shared_cache(
+        "cell_outputs",
+        max_bytes=get_max_bytes("DANDI_NOTEBOOK_GEN_CELL_CACHE_MAX_BYTES", DEFAULT_CELL_OUTPUT_MAX_BYTES),
+    )
+
+
+def get_vision_cache() -> DiskCache:
+    """
+    Return the cache of image descriptions by the vision model (see vision.py).
+
+    Its size bound is set separately with DANDI_NOTEBOOK_GEN_VISION_CACHE_MAX_BYTES.
+    """
+    return _shared_cache(
+        "vision",
+        max_bytes=get_max_bytes("DANDI_NOTEBOOK_GEN_VISION_CACHE_MAX_BYTES", DEFAULT_VISION_MAX_BYTES),
+    )
+
+
+def get_byte_range_cache() -> BlockCache:
+    """
+    Return the cache of remote file blocks used by the range proxy.
+
+    Its size bound is set with DANDI_NOTEBOOK_GEN_RANGE_CACHE_MAX_BYTES and
+    its block size with DANDI_NOTEBOOK_GEN_RANGE_BLOCK_BYTES.
+    """
+    return BlockCache("byte_ranges")
+
+
+def get_all_caches() -> List[Union[DiskCache, BlockCache]]:
+    """Return every cache managed by the package."""
+    return [get_response_cache(), get_nwb_info_cache(), get_cell_output_cache(), get_vision_cache(), get_byte_range_cache()]
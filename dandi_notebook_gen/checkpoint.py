@@ -0,0 +1,76 @@
+"""
+Checkpoints of the agent's conversation, for resuming interrupted runs
+
+Before every model call, the conversation so far and the tokens spent are
+written to checkpoint.json in the working directory. Everything else the
+agent produced (exploratory scripts and their plots in tmp_scripts/, a
+partial notebook.py) is already in the working directory.
+
+A resumed run (generate_notebook(..., resume=True) with the same working
+directory) sends the checkpointed conversation instead of starting a new
+one, with a note that the run was interrupted, so the agent picks up where
+it left off. The checkpoint is removed when the run completes.
+"""
+
+from typing import Any, Dict, List, Optional
+import json
+import os
+import time
+
+CHECKPOINT_FILE_NAME = "checkpoint.json"
+CHECKPOINT_VERSION = 1
+
+RESUME_NOTE = (
+    "[The task was interrupted at this point and has now been resumed. The files you "
+    "created in the working directory before the interruption are still there; check "
+    "them before redoing any work.]"
+)
+
+TOKEN_KEYS = [
+    "total_prompt_tokens",
+    "total_completion_tokens",
+    "total_vision_prompt_tokens",
+    "total_vision_completion_tokens",
+]
+
+
+def new_checkpoint_totals() -> Dict[str, int]:
+    """Return zeroed counters of the model calls of a run, as stored in a checkpoint."""
+    return {"num_completions": 0, **dict.fromkeys(TOKEN_KEYS, 0)}
+
+
+def save_checkpoint(path: str, messages: List[Dict[str, Any]], totals: Dict[str, int]) -> None:
+    """Write the conversation and token counts to path, atomically."""
+    checkpoint = {
+        "version": CHECKPOINT_VERSION,
+        "timestamp": time.strftime('%Y-%m-%d %H:%M:%S'),
+        **totals,
+        "messages": messages,
+    }
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp_path, path)
+
+
+def load_checkpoint(path: str) -> Optional[Dict[str, Any]]:
+    """Read a checkpoint; None if there is none or it cannot be used."""
+    try:
+        with open(path, "r") as f:
+            checkpoint = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if checkpoint.get("version") != CHECKPOINT_VERSION or not checkpoint.get("messages"):
+        return None
+    return checkpoint
+
+
+def resumed_messages(checkpoint: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Return the checkpointed conversation, with RESUME_NOTE added to its last message."""
+    messages = [dict(m) for m in checkpoint["messages"]]
+    last = messages[-1]
+    if isinstance(last.get("content"), str):
+        last["content"] = f"{last['content']}\n\n{RESUME_NOTE}"
+    else:
+        last["content"] = list(last["content"]) + [{"type": "text", "text": RESUME_NOTE}]
+    return messages
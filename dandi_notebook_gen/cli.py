@@ -1,11 +1,29 @@
 """
 Command-line interfaces for dandi-notebook-gen and dandi-notebook-gen-tools
+
+The tools CLI is launched as a fresh process for every tool call made by the
+agent, so each command imports only the modules it needs. In particular,
+nothing here imports the generator (minicline) or get_nwbfile_info (pynwb,
+h5py) at module level.
 """
 
 import json
+import sys
 import click
-from .generator import generate_notebook
-from .tools import dandiset_assets, nwb_file_info, dandiset_info
+
+def _run_tool(name, **kwargs):
+    """Run a tool in the resident daemon if one is running, otherwise in-process."""
+    from . import daemon
+    from .snapshot import get_snapshot_path
+    # a daemon started without the snapshot would go to the network
+    if daemon.forwarding_enabled() and not get_snapshot_path():
+        try:
+            # the tools' own timeout must not become the socket timeout
+            return daemon.call(name, arguments=kwargs)
+        except daemon.DaemonUnavailable:
+            pass
+    from . import tools
+    return getattr(tools, name)(**kwargs)
 
 @click.command(name="dandi-notebook-gen")
 @click.argument("dandiset_id", type=str)
@@ -15,7 +33,21 @@ from .tools import dandiset_assets, nwb_file_info, dandiset_info
 @click.option("--auto", is_flag=True, help="Run minicline in auto mode")
 @click.option("--approve-all-commands", is_flag=True, help="Run minicline in approve_all_commands mode")
 @click.option("--working-dir", default=None, help="Working directory to use for the task. If not provided, a temporary directory will be used.")
-def notebook_gen_cli(dandiset_id, output, model, vision_model, auto, approve_all_commands, working_dir):
+@click.option("--use-daemon/--no-daemon", default=None, help="Start a resident tool daemon for the duration of the run, which keeps notebook kernels warm (default: when the agent's commands run on the host)")
+@click.option("--prefetch", type=click.Choice(["inline", "files"]), default=None, help="Fetch the Dandiset metadata, assets and one NWB file's info before starting the agent, and put the results in the instructions (inline) or in files")
+@click.option("--if-changed", is_flag=True, help="Keep the existing output if the Dandiset version, instructions, models and package version are unchanged")
+@click.option("--no-range-cache", is_flag=True, help="Do not route reads of remote NWB files through the local byte-range cache")
+@click.option("--no-prompt-caching", is_flag=True, help="Substitute the Dandiset ID throughout the instructions and send no prompt caching hints")
+@click.option("--candidates", type=click.IntRange(min=1), default=1, help="Race this many generations and keep the first notebook that executes cleanly (requires --auto)")
+@click.option("--candidate-model", "candidate_models", multiple=True, help="Model of a candidate; repeat to give the candidates different models (used in turn)")
+@click.option("--resume", is_flag=True, help="Continue an interrupted run in --working-dir from its last checkpoint")
+@click.option("--max-seconds", type=click.FloatRange(min=0, min_open=True), default=None, help="End the run after this many seconds, keeping the notebook produced so far (applies to each of --candidates, which run at the same time)")
+@click.option("--max-prompt-tokens", type=click.IntRange(min=1), default=None, help="End the run after this many prompt tokens, keeping the notebook produced so far (split evenly between --candidates)")
+@click.option("--max-cost", type=click.FloatRange(min=0, min_open=True), default=None, help="End the run after this cost in USD (as reported by OpenRouter), keeping the notebook produced so far (split evenly between --candidates)")
+@click.option("--max-image-size", type=click.IntRange(min=1), default=1024, help="Downsample the images the agent reads to at most this many pixels wide and high before they reach the vision model")
+@click.option("--no-image-preprocessing", is_flag=True, help="Send the images as they are and do not reuse the descriptions of images seen before")
+@click.option("--no-container", is_flag=True, help="Run the agent's commands on the host instead of in a Docker container (required for the byte-range cache, the tool daemon and the tool output settings to reach them)")
+def notebook_gen_cli(dandiset_id, output, model, vision_model, auto, approve_all_commands, working_dir, use_daemon, prefetch, if_changed, no_range_cache, no_prompt_caching, candidates, candidate_models, resume, max_seconds, max_prompt_tokens, max_cost, max_image_size, no_image_preprocessing, no_container):
     """
     Generate a Jupyter notebook for exploring a Dandiset.
 
@@ -23,13 +55,64 @@ def notebook_gen_cli(dandiset_id, output, model, vision_model, auto, approve_all
     """
     click.echo(f"Generating notebook for Dandiset {dandiset_id}")
 
+    from .generator import generate_notebook
     try:
-        notebook_path = generate_notebook(dandiset_id, output_path=output, model=model, vision_model=vision_model, auto=auto, approve_all_commands=approve_all_commands, working_dir=working_dir if working_dir else None)
+        notebook_path = generate_notebook(dandiset_id, output_path=output, model=model, vision_model=vision_model, auto=auto, approve_all_commands=approve_all_commands, working_dir=working_dir if working_dir else None, use_daemon=use_daemon, prefetch=prefetch, if_changed=if_changed, range_cache=False if no_range_cache else None, prompt_caching=not no_prompt_caching, candidates=candidates, candidate_models=list(candidate_models) or None, resume=resume, max_seconds=max_seconds, max_prompt_tokens=max_prompt_tokens, max_cost=max_cost, preprocess_images=not no_image_preprocessing, max_image_size=max_image_size, no_container=no_container)
         click.echo(f"Notebook generated successfully: {notebook_path}")
     except Exception as e:
         click.echo(f"Error generating notebook: {str(e)}", err=True)
         raise click.Abort()
 
+@click.command(name="batch")
+@click.argument("dandiset_ids", nargs=-1, type=str)
+@click.option("--ids-file", default=None, help="File with one Dandiset ID per line ('#' starts a comment)")
+@click.option("--output-dir", "-o", default="notebooks", help="Directory for the notebooks, logs and summary.json")
+@click.option("--max-workers", "-j", type=int, default=4, help="Maximum number of generations running at once")
+@click.option("--model", "-m", default="anthropic/claude-3.7-sonnet", help="OpenRouter model name")
+@click.option("--vision-model", "-vm", default=None, help="OpenRouter model name for analyzing images. If not provided, the model parameter will be used.")
+@click.option("--approve-all-commands", is_flag=True, help="Run minicline in approve_all_commands mode")
+@click.option("--no-resume", is_flag=True, help="Regenerate Dandisets that already have a successful output and restart interrupted runs from scratch")
+@click.option("--use-daemon", is_flag=True, help="Start one resident tool daemon shared by all workers")
+@click.option("--if-changed", is_flag=True, help="Check completed Dandisets too, and regenerate only those whose inputs changed")
+@click.option("--no-container", is_flag=True, help="Run the agents' commands on the host instead of in Docker containers")
+def batch_cli(dandiset_ids, ids_file, output_dir, max_workers, model, vision_model, approve_all_commands, no_resume, use_daemon, if_changed, no_container):
+    """
+    Generate notebooks for many Dandisets in parallel.
+
+    DANDISET_IDS: The IDs of the Dandisets to generate notebooks for (may be combined with --ids-file).
+    """
+    from .batch import generate_notebooks, read_dandiset_ids
+    ids = list(dandiset_ids)
+    if ids_file:
+        ids.extend(read_dandiset_ids(ids_file))
+    if not ids:
+        raise click.UsageError("No Dandiset IDs given")
+
+    def report(record):
+        click.echo(f"{record['dandiset_id']}: {record['status']}")
+
+    try:
+        summary = generate_notebooks(
+            ids,
+            output_dir,
+            max_workers=max_workers,
+            model=model,
+            vision_model=vision_model,
+            approve_all_commands=approve_all_commands,
+            use_daemon=use_daemon,
+            resume=not no_resume,
+            if_changed=if_changed,
+            no_container=no_container,
+            on_complete=report
+        )
+    except Exception as e:
+        click.echo(f"Error running batch: {str(e)}", err=True)
+        raise click.Abort()
+    click.echo(f"{summary['num_success']} succeeded, {summary['num_skipped']} skipped, {summary['num_unchanged']} unchanged, {summary['num_failed']} failed")
+    click.echo(f"Summary written to {output_dir}/summary.json")
+    if summary["num_failed"]:
+        sys.exit(1)
+
 @click.group(name="dandi-notebook-gen-tools")
 def cli():
     """Tools for working with DANDI datasets."""
@@ -39,50 +122,158 @@ def cli():
 @click.argument("dandiset_id", type=str)
 @click.option("--version", default="draft", help="Version of the dataset to retrieve")
 @click.option("--page", type=int, default=1, help="Page number")
-@click.option("--page-size", type=int, default=20, help="Number of results per page")
-@click.option("--glob", default=None, help="Optional glob pattern to filter files (e.g., '*.nwb')")
-@click.option("--output", "-o", default=None, help="Output file path for the results (default: print to stdout)")
-def assets(dandiset_id, version, page, page_size, glob, output):
+@click.option("--page-size", type=int, default=None, help="Number of results per page (default: 20, or 100 per request with --all)")
+@click.option("--glob", "globs", multiple=True, help="Glob pattern to filter files (e.g., '*.nwb'); repeat for several, any may match")
+@click.option("--regex", "regexes", multiple=True, help="Regular expression searched for in the paths; repeat for several, any may match")
+@click.option("--min-size", default=None, help="Minimum file size, e.g. 10MB")
+@click.option("--max-size", default=None, help="Maximum file size, e.g. 1GiB")
+@click.option("--sort", type=click.Choice(["path", "size", "-path", "-size"]), default=None, help="Sort by path or size (- for descending)")
+@click.option("--summary", is_flag=True, help="Print counts and total bytes per subject, session and extension, and the smallest file of each extension")
+@click.option("--output", "-o", default=None, help="Output file path for the results (default: print to stdout); with --all, a .parquet path writes a Parquet file (requires pyarrow)")
+@click.option("--no-cache", is_flag=True, help="Bypass the on-disk response cache")
+@click.option("--all", "all_assets", is_flag=True, help="Stream every asset as newline-delimited JSON, ignoring --page")
+@click.option("--max-workers", type=int, default=8, help="Maximum number of pages fetched concurrently with --all")
+@click.option("--format", "fmt", type=click.Choice(["json", "ndjson", "tsv", "compact"]), default=None, help="Output format (default: $DANDI_NOTEBOOK_GEN_OUTPUT_FORMAT or json)")
+@click.option("--fields", default=None, help="Comma-separated fields to keep, e.g. 'path,size,asset_id' (applied to each asset)")
+@click.option("--human-sizes/--exact-sizes", default=None, help="Round byte counts, e.g. 1.72 GiB (default: only with --format compact)")
+def assets(dandiset_id, version, page, page_size, globs, regexes, min_size, max_size, sort, summary, output, no_cache, all_assets, max_workers, fmt, fields, human_sizes):
     """
     Get a list of assets/files in a dandiset version.
 
+    With filters, sorting or --summary, the full listing is fetched once and
+    cached, and the filtering happens locally.
+
     DANDISET_ID: The ID of the Dandiset to retrieve assets for.
     """
+    from .formatting import format_records, format_result, get_default_format, parse_fields
+    filters = dict(
+        glob=list(globs) or None,
+        regex=list(regexes) or None,
+        min_size=min_size,
+        max_size=max_size,
+    )
     try:
-        result = dandiset_assets(
-            dandiset_id=dandiset_id,
-            version=version,
-            page=page,
-            page_size=page_size,
-            glob=glob
-        )
+        if summary:
+            result = _run_tool("dandiset_assets_summary", dandiset_id=dandiset_id, version=version, use_cache=not no_cache, **filters)
+            text = format_result(result, fmt, human_sizes=human_sizes)
+        elif all_assets:
+            # streamed in-process; the daemon protocol returns one result per request
+            from . import tools
+            from .asset_filter import AssetFilter, sort_assets
+            asset_filter = AssetFilter(filters["glob"], filters["regex"], min_size, max_size)
+            if asset_filter.active or sort:
+                iterator = iter(sort_assets([a for a in tools.all_dandiset_assets(dandiset_id, version, use_cache=not no_cache) if asset_filter(a)], sort))
+            else:
+                iterator = tools.iter_dandiset_assets(
+                    dandiset_id=dandiset_id,
+                    version=version,
+                    page_size=page_size or 100,
+                    max_workers=max_workers,
+                    use_cache=not no_cache
+                )
+            if output and output.endswith(".parquet"):
+                from .asset_table import AssetTable
+                AssetTable.from_records(iterator).write_parquet(output)
+                click.echo(f"Results saved to {output}")
+                return
+            lines = format_records(iterator, fmt or get_default_format(), fields=parse_fields(fields), human_sizes=human_sizes)
+            if output:
+                with open(output, 'w') as f:
+                    for line in lines:
+                        f.write(line + "\n")
+                click.echo(f"Results saved to {output}")
+            else:
+                for line in lines:
+                    click.echo(line)
+            return
+        else:
+            result = _run_tool(
+                "dandiset_assets",
+                dandiset_id=dandiset_id,
+                version=version,
+                page=page,
+                page_size=page_size or 20,
+                use_cache=not no_cache,
+                sort=sort,
+                **filters
+            )
+            text = format_result(result, fmt, fields=parse_fields(fields), human_sizes=human_sizes)
 
         if output:
             with open(output, 'w') as f:
-                json.dump(result, f, indent=2)
+                f.write(text)
             click.echo(f"Results saved to {output}")
         else:
-            click.echo(json.dumps(result, indent=2))
+            click.echo(text)
     except Exception as e:
         click.echo(f"Error retrieving dandiset assets: {str(e)}", err=True)
         raise click.Abort()
 
 @cli.command(name="nwb-file-info")
 @click.argument("dandiset_id", type=str)
-@click.argument("nwb_file_url", type=str)
+@click.argument("nwb_file_urls", nargs=-1, type=str)
+@click.option("--glob", default=None, help="Also inspect assets whose path matches this glob pattern (e.g., 'sub-01/*.nwb')")
+@click.option("--version", default="draft", help="Version of the dataset used for --glob")
+@click.option("--max-files", type=int, default=10, help="Maximum number of files taken from the --glob matches")
+@click.option("--max-workers", type=int, default=4, help="Maximum number of files inspected concurrently")
+@click.option("--timeout", type=float, default=300, help="Timeout in seconds for each file")
+@click.option("--no-dedup", is_flag=True, help="Print the full script even for files with the same NWB object layout")
 @click.option("--output", "-o", default=None, help="Output file path for the results (default: print to stdout)")
-def nwb_info(dandiset_id, nwb_file_url, output):
+@click.option("--no-cache", is_flag=True, help="Bypass the on-disk cache of usage scripts")
+@click.option("--max-tokens", type=int, default=None, help="Summarize each script to about this many tokens (default: $DANDI_NOTEBOOK_GEN_NWB_INFO_MAX_TOKENS, or no limit)")
+@click.option("--max-chars", type=int, default=None, help="Summarize each script to at most this many characters (overrides --max-tokens)")
+@click.option("--expand", "expand_path", default=None, help="Only show this object and everything below it, e.g. 'nwb.acquisition[\"ElectricalSeries\"]'")
+def nwb_info(dandiset_id, nwb_file_urls, glob, version, max_files, max_workers, timeout, no_dedup, output, no_cache, max_tokens, max_chars, expand_path):
     """
-    Get information about an NWB file.
+    Get information about one or more NWB files.
+
+    DANDISET_ID: The ID of the Dandiset containing the NWB files.
+    NWB_FILE_URLS: URLs of the NWB files in the DANDI archive.
 
-    DANDISET_ID: The ID of the Dandiset containing the NWB file.
-    NWB_FILE_URL: URL of the NWB file in the DANDI archive.
+    With more than one file (or --glob), the files are inspected
+    concurrently and the script for each file is printed under a header
+    line with its URL.
+
+    Long scripts are summarized to fit --max-tokens/--max-chars: objects with
+    the same structure are collapsed, values are replaced by shapes and
+    dtypes, and finally only an outline of the objects is kept. Use --expand
+    to see any object in full.
     """
+    from .nwb_summary import CHARS_PER_TOKEN, get_default_max_chars, summarize_usage_script
+    if max_chars is None:
+        max_chars = max_tokens * CHARS_PER_TOKEN if max_tokens is not None else get_default_max_chars()
     try:
-        result = nwb_file_info(
-            dandiset_id=dandiset_id,
-            nwb_file_url=nwb_file_url
-        )
+        if len(nwb_file_urls) == 1 and not glob:
+            result = _run_tool(
+                "nwb_file_info",
+                dandiset_id=dandiset_id,
+                nwb_file_url=nwb_file_urls[0],
+                use_cache=not no_cache
+            )
+            if isinstance(result, str):
+                result = summarize_usage_script(result, max_chars=max_chars, expand=expand_path)
+        elif not nwb_file_urls and not glob:
+            raise click.UsageError("Give at least one NWB_FILE_URL or --glob")
+        else:
+            scripts = _run_tool(
+                "nwb_files_info",
+                dandiset_id=dandiset_id,
+                nwb_file_urls=list(nwb_file_urls),
+                glob=glob,
+                version=version,
+                max_files=max_files,
+                max_workers=max_workers,
+                timeout=timeout,
+                deduplicate=not no_dedup,
+                use_cache=not no_cache
+            )
+            for url, script in scripts.items():
+                if not script.startswith("# ERROR:"):
+                    try:
+                        scripts[url] = summarize_usage_script(script, max_chars=max_chars, expand=expand_path)
+                    except ValueError as e:
+                        scripts[url] = f"# ERROR: {e}"
+            result = "\n".join(f"# ===== {url} =====\n{script}" for url, script in scripts.items())
 
         if output:
             with open(output, 'w') as f:
@@ -96,6 +287,8 @@ def nwb_info(dandiset_id, nwb_file_url, output):
                 click.echo(result)
             else:
                 click.echo(json.dumps(result, indent=2))
+    except click.UsageError:
+        raise
     except Exception as e:
         click.echo(f"Error retrieving NWB file info: {str(e)}", err=True)
         raise click.Abort()
@@ -104,35 +297,243 @@ def nwb_info(dandiset_id, nwb_file_url, output):
 @click.argument("dandiset_id", type=str)
 @click.option("--version", default="draft", help="Version of the dataset to retrieve")
 @click.option("--output", "-o", default=None, help="Output file path for the results (default: print to stdout)")
-def dataset_info(dandiset_id, version, output):
+@click.option("--no-cache", is_flag=True, help="Bypass the on-disk response cache")
+@click.option("--format", "fmt", type=click.Choice(["json", "ndjson", "tsv", "compact"]), default=None, help="Output format (default: $DANDI_NOTEBOOK_GEN_OUTPUT_FORMAT or json)")
+@click.option("--fields", default=None, help="Comma-separated fields to keep; dotted fields select nested values, e.g. 'name,assetsSummary.numberOfFiles'")
+@click.option("--human-sizes/--exact-sizes", default=None, help="Round byte counts, e.g. 1.72 GiB (default: only with --format compact)")
+def dataset_info(dandiset_id, version, output, no_cache, fmt, fields, human_sizes):
     """
     Get information about a specific version of a DANDI dataset.
 
     DANDISET_ID: The ID of the Dandiset to retrieve information for.
     """
+    from .formatting import format_result, parse_fields
     try:
-        result = dandiset_info(
+        result = _run_tool(
+            "dandiset_info",
             dandiset_id=dandiset_id,
-            version=version
+            version=version,
+            use_cache=not no_cache
         )
+        text = format_result(result, fmt, fields=parse_fields(fields), human_sizes=human_sizes)
 
         if output:
             with open(output, 'w') as f:
-                json.dump(result, f, indent=2)
+                f.write(text)
             click.echo(f"Results saved to {output}")
         else:
-            click.echo(json.dumps(result, indent=2))
+            click.echo(text)
     except Exception as e:
         click.echo(f"Error retrieving dandiset info: {str(e)}", err=True)
         raise click.Abort()
 
+@cli.command(name="snapshot")
+@click.argument("dandiset_id", type=str)
+@click.option("--version", default="draft", help="Version of the dataset to capture")
+@click.option("--output", "-o", default=None, help="Path of the bundle (default: dandiset_DANDISET_ID_snapshot.json.gz)")
+@click.option("--nwb-file", "nwb_file_urls", multiple=True, help="URL of an NWB file whose usage script is captured; repeat for several")
+@click.option("--glob", default=None, help="Also capture the NWB files whose paths match this pattern")
+@click.option("--max-files", type=int, default=10, help="Maximum number of files taken from the --glob matches")
+@click.option("--no-cache", is_flag=True, help="Bypass the on-disk caches")
+def snapshot(dandiset_id, version, output, nwb_file_urls, glob, max_files, no_cache):
+    """
+    Capture a Dandiset for offline use.
+
+    Writes dandiset-info, the full asset listing and the nwb-file-info of
+    selected NWB files (by default one representative file) to a single
+    compressed bundle. With DANDI_NOTEBOOK_GEN_SNAPSHOT set to the bundle,
+    the tools serve from it without network access.
+
+    DANDISET_ID: The ID of the Dandiset to capture.
+    """
+    from .snapshot import create_snapshot
+    output = output or f"dandiset_{dandiset_id}_snapshot.json.gz"
+    try:
+        report = create_snapshot(
+            dandiset_id,
+            output,
+            version=version,
+            nwb_file_urls=list(nwb_file_urls),
+            glob=glob,
+            max_files=max_files,
+            use_cache=not no_cache
+        )
+    except Exception as e:
+        click.echo(f"Error creating snapshot: {str(e)}", err=True)
+        raise click.Abort()
+    for url, error in report["errors"].items():
+        click.echo(f"Could not capture {url}: {error}", err=True)
+    click.echo(f"Snapshot saved to {output}: {report['num_assets']} assets, {len(report['nwb_files'])} NWB files, {report['bytes']} bytes")
+
+@cli.command(name="execute-notebook")
+@click.argument("notebook_path", type=click.Path(exists=True, dir_okay=False), default="notebook.py")
+@click.option("--output", "-o", default=None, help="Path of the executed .ipynb (default: NOTEBOOK_PATH with an .ipynb extension)")
+@click.option("--timeout", type=float, default=600, help="Timeout in seconds for each cell")
+@click.option("--kernel", "kernel_name", default="python3", help="Jupyter kernel to run the cells in")
+@click.option("--fresh", is_flag=True, help="Ignore cached cell outputs and warm kernels and run every cell")
+@click.option("--no-cache", is_flag=True, help="Do not read or write the cell output cache")
+def execute_notebook_command(notebook_path, output, timeout, kernel_name, fresh, no_cache):
+    """
+    Convert a jupytext notebook to .ipynb and execute it.
+
+    Cell outputs are cached by a hash of the cell and all cells before it,
+    so after an edit only the first changed cell and the cells after it are
+    re-executed. When a resident daemon is running, its kernel is kept warm
+    between calls. Exits with status 1 if a cell raises.
+
+    NOTEBOOK_PATH: The jupytext notebook (default: notebook.py).
+    """
+    import os
+    kwargs = dict(
+        notebook_path=os.path.abspath(notebook_path),
+        output_path=os.path.abspath(output) if output else None,
+        timeout=timeout,
+        kernel_name=kernel_name,
+        use_cache=not no_cache,
+        fresh=fresh
+    )
+    try:
+        from . import daemon
+        result = None
+        if daemon.forwarding_enabled():
+            try:
+                # the daemon sends keep-alive lines while it works, so this only
+                # fires if it stops responding for longer than a cell may run
+                result = daemon.call("execute_notebook", timeout=timeout, arguments=kwargs)
+            except daemon.DaemonUnavailable:
+                pass
+        if result is None:
+            from .notebook_exec import execute_notebook
+            result = execute_notebook(**kwargs)
+    except Exception as e:
+        click.echo(f"Error executing notebook: {str(e)}", err=True)
+        raise click.Abort()
+
+    click.echo(
+        f"Executed {result['num_executed']} of {result['num_code_cells']} code cells "
+        f"({result['num_cached']} from cache, kernel: {result['kernel']}) in {result['elapsed_seconds']:.1f} s"
+    )
+    click.echo(f"Notebook written to {result['output_path']}")
+    error = result["error"]
+    if error:
+        click.echo(f"Error in cell {error['cell_index'] + 1}: {error['ename']}: {error['evalue']}", err=True)
+        if error["traceback"]:
+            click.echo(error["traceback"], err=True)
+        sys.exit(1)
+
+@cli.group(name="cache")
+def cache_group():
+    """Inspect or clear the on-disk caches."""
+    pass
+
+@cache_group.command(name="info")
+def cache_info():
+    """
+    Show the location and size of each cache.
+    """
+    from .cache import cache_enabled, get_all_caches
+    click.echo(json.dumps({
+        "enabled": cache_enabled(),
+        "caches": [c.stats() for c in get_all_caches()]
+    }, indent=2))
+
+@cache_group.command(name="clear")
+def cache_clear():
+    """
+    Remove all cached responses and usage scripts.
+    """
+    from .cache import get_all_caches
+    for c in get_all_caches():
+        num_removed = c.clear()
+        click.echo(f"Removed {num_removed} entries from {c.namespace}")
+
+@cli.command(name="serve")
+@click.option("--socket", "socket_path", default=None, help="Path of the Unix socket to listen on (default: $DANDI_NOTEBOOK_GEN_DAEMON_SOCKET or daemon.sock in the cache directory)")
+def serve(socket_path):
+    """
+    Run a resident daemon that serves tool calls from a warm process.
+
+    While it is running, dandiset-info, dandiset-assets and nwb-file-info
+    forward to it instead of doing the work in a new process.
+    """
+    from . import daemon
+    try:
+        path = socket_path or daemon.get_socket_path()
+        click.echo(f"Serving tools on {path}", err=True)
+        daemon.serve(path)
+    except Exception as e:
+        click.echo(f"Error running daemon: {str(e)}", err=True)
+        raise click.Abort()
+
+@cli.command(name="trace-report")
+@click.argument("paths", nargs=-1, required=True, type=click.Path(exists=True))
+@click.option("--output", "-o", default=None, help="Output file path for the report (default: print to stdout)")
+def trace_report(paths, output):
+    """
+    Aggregate the per-phase timings of one or more generation runs.
+
+    PATHS: trace.jsonl files, or directories searched recursively for them
+    (e.g. the output directory of a batch).
+    """
+    from .trace import aggregate_traces
+    result = aggregate_traces(paths)
+    if output:
+        with open(output, 'w') as f:
+            json.dump(result, f, indent=2)
+        click.echo(f"Results saved to {output}")
+    else:
+        click.echo(json.dumps(result, indent=2))
+
+class _CountingStream:
+    """Text stream wrapper that counts the bytes written through it."""
+
+    def __init__(self, stream):
+        self._stream = stream
+        self.num_bytes = 0
+
+    def write(self, s):
+        self.num_bytes += len(s.encode("utf-8", errors="replace"))
+        return self._stream.write(s)
+
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+
+def _traced_main():
+    from .trace import span
+    command = sys.argv[1] if len(sys.argv) > 1 else ""
+    stdout = _CountingStream(sys.stdout)
+    sys.stdout = stdout
+    try:
+        with span("cli", command, argv=sys.argv[1:]) as extra:
+            try:
+                cli()
+            except SystemExit as e:
+                code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+                extra["exit_code"] = code
+                extra["status"] = "ok" if code == 0 else "error"
+                raise
+            finally:
+                extra["bytes_out"] = stdout.num_bytes
+    finally:
+        sys.stdout = stdout._stream
+
 def main():
     """Entry point for the dandi-notebook-gen-tools CLI."""
-    cli()
+    from .trace import get_trace_path
+    if get_trace_path():
+        # launched by the agent during a traced generation run
+        _traced_main()
+    else:
+        cli()
 
 def notebook_gen_main():
     """Entry point for the dandi-notebook-gen CLI."""
-    notebook_gen_cli()
+    # `dandi-notebook-gen DANDISET_ID` stays the default form, so the batch
+    # subcommand is dispatched by hand rather than by turning this into a group
+    if len(sys.argv) > 1 and sys.argv[1] == "batch":
+        batch_cli(sys.argv[2:], prog_name="dandi-notebook-gen batch")
+    else:
+        notebook_gen_cli()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,397 @@
+"""
+Resident tool daemon for dandi-notebook-gen-tools
+
+`dandi-notebook-gen-tools serve` keeps a long-lived process listening on a
+local Unix socket. The process holds warm imports, the pooled HTTP session
+and an in-memory cache of recent results. The tools CLI forwards
+dandiset-info, dandiset-assets and nwb-file-info to the daemon when it is
+running and falls back to in-process execution when it is not.
+
+The protocol is one JSON request line per connection,
+{"command": ..., "kwargs": {...}}, answered by one JSON line,
+{"ok": true, "result": ...} or {"ok": false, "error": "..."}. While
+execute_notebook runs, the daemon sends an empty keep-alive line every
+HEARTBEAT_SECONDS, so that a client timeout only fires when the daemon stops
+responding. If the client disconnects (e.g. the agent's command timed out),
+the running cell is interrupted and the notebook's kernel is released.
+"""
+
+from typing import Any, Dict, Iterator, Optional
+import json
+import os
+import select
+import socket
+import socketserver
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+# interval of the keep-alive lines sent while a notebook executes
+HEARTBEAT_SECONDS = 5.0
+# how often the daemon checks whether the client of a running notebook is still there
+CLIENT_POLL_SECONDS = 0.2
+
+
+class DaemonUnavailable(Exception):
+    """Raised by call() when no daemon is listening on the socket."""
+    pass
+
+
+def get_socket_path() -> str:
+    """
+    Return the path of the daemon socket.
+
+    Set with DANDI_NOTEBOOK_GEN_DAEMON_SOCKET. Defaults to daemon.sock in the
+    cache directory.
+    """
+    path = os.environ.get("DANDI_NOTEBOOK_GEN_DAEMON_SOCKET")
+    if path:
+        return path
+    from .cache import get_cache_dir
+    return str(get_cache_dir() / "daemon.sock")
+
+
+def forwarding_enabled() -> bool:
+    """Whether CLI commands may forward to the daemon (disable with DANDI_NOTEBOOK_GEN_NO_DAEMON=1)."""
+    value = os.environ.get("DANDI_NOTEBOOK_GEN_NO_DAEMON", "")
+    return value.strip().lower() in ("", "0", "false", "no")
+
+
+def call(command: str, *, socket_path: Optional[str] = None, timeout: Optional[float] = None, arguments: Optional[Dict[str, Any]] = None, **kwargs: Any) -> Any:
+    """
+    Run a command in the daemon and return its result.
+
+    Parameters
+    ----------
+    command : str
+        Name of the command, e.g. "dandiset_info"
+    socket_path : str, optional
+        Path of the daemon socket. Defaults to get_socket_path().
+    timeout : float, optional
+        Socket timeout in seconds: the longest the daemon may stay silent (keep-alive
+        lines count). None waits indefinitely.
+    arguments : Dict[str, Any], optional
+        Keyword arguments for the command whose names clash with those of call,
+        e.g. the cell timeout of execute_notebook.
+    **kwargs
+        Keyword arguments for the command
+
+    Returns
+    -------
+    Any
+        The command's result
+
+    Raises
+    ------
+    DaemonUnavailable
+        If no daemon is listening on the socket.
+    RuntimeError
+        If the command failed in the daemon.
+    """
+    if socket_path is None:
+        socket_path = get_socket_path()
+    if not hasattr(socket, "AF_UNIX") or not os.path.exists(socket_path):
+        raise DaemonUnavailable(socket_path)
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.settimeout(timeout)
+        try:
+            sock.connect(socket_path)
+        except OSError as e:
+            raise DaemonUnavailable(socket_path) from e
+        with sock.makefile("rwb") as f:
+            f.write(json.dumps({"command": command, "kwargs": {**(arguments or {}), **kwargs}}).encode("utf-8") + b"\n")
+            f.flush()
+            line = f.readline()
+            while line in (b"\n", b"\r\n"):
+                # keep-alive
+                line = f.readline()
+    finally:
+        sock.close()
+    if not line:
+        raise RuntimeError(f"Daemon closed the connection while running {command}")
+    response = json.loads(line)
+    if not response.get("ok"):
+        raise RuntimeError(response.get("error", "unknown daemon error"))
+    return response.get("result")
+
+
+def is_running(socket_path: Optional[str] = None) -> bool:
+    """Whether a daemon is answering on the socket."""
+    try:
+        return call("ping", socket_path=socket_path, timeout=5) == "pong"
+    except (DaemonUnavailable, RuntimeError, OSError, ValueError):
+        return False
+
+
+class _MemoryCache:
+    """A small thread-safe LRU of recent command results, with optional expiry."""
+
+    def __init__(self, max_entries: int = 512):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str, ttl: Optional[float]) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            created, value = entry
+            if ttl is not None and time.time() - created > ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = (time.time(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+class ToolServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Unix socket server that runs tool commands in worker threads."""
+
+    daemon_threads = True
+
+    def __init__(self, socket_path: str):
+        self.socket_path = socket_path
+        self.memory_cache = _MemoryCache()
+        super().__init__(socket_path, _ToolRequestHandler)
+
+
+class _ToolRequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        line = self.rfile.readline()
+        if not line:
+            return
+        command = None
+        try:
+            request = json.loads(line)
+            command = request["command"]
+            if command == "execute_notebook":
+                result = self._execute_notebook(request.get("kwargs") or {})
+            else:
+                result = _dispatch(self.server, command, request.get("kwargs") or {})
+            response = {"ok": True, "result": result}
+        except Exception as e:
+            response = {"ok": False, "error": str(e)}
+        try:
+            self.wfile.write(json.dumps(response).encode("utf-8") + b"\n")
+        except OSError:
+            # the client is gone
+            return
+        if command == "shutdown":
+            # shutdown() blocks until serve_forever returns, so call it from another thread
+            threading.Thread(target=self.server.shutdown, daemon=True).start()
+
+
+    def _client_gone(self) -> bool:
+        """Whether the client closed its end; it sends nothing after the request line."""
+        readable, _, _ = select.select([self.connection], [], [], 0)
+        if not readable:
+            return False
+        try:
+            return self.connection.recv(1, socket.MSG_PEEK) == b""
+        except OSError:
+            return True
+
+    def _execute_notebook(self, kwargs: Dict[str, Any]) -> Any:
+        """
+        Run execute_notebook in a worker thread, keeping the client's connection alive
+        and interrupting the notebook if the client goes away.
+        """
+        # runs in the daemon so that the kernel stays warm between calls
+        from .notebook_exec import execute_notebook
+
+        cancel = threading.Event()
+        outcome: Dict[str, Any] = {}
+
+        def target():
+            try:
+                outcome["result"] = execute_notebook(keep_kernel=True, cancel=cancel, **kwargs)
+            except Exception as e:
+                outcome["error"] = e
+
+        worker = threading.Thread(target=target, daemon=True)
+        worker.start()
+        last_heartbeat = time.time()
+        while worker.is_alive():
+            worker.join(CLIENT_POLL_SECONDS)
+            if not worker.is_alive():
+                break
+            gone = self._client_gone()
+            if not gone and time.time() - last_heartbeat >= HEARTBEAT_SECONDS:
+                try:
+                    self.wfile.write(b"\n")
+                    self.wfile.flush()
+                except OSError:
+                    gone = True
+                last_heartbeat = time.time()
+            if gone:
+                cancel.set()
+                worker.join()
+        if "error" in outcome:
+            raise outcome["error"]
+        return outcome["result"]
+
+
+def _dispatch(server: ToolServer, command: str, kwargs: Dict[str, Any]) -> Any:
+    from . import tools
+    from .cache import ttl_for_version
+    from .transport import get_stats
+
+    if command == "ping":
+        return "pong"
+    if command == "shutdown":
+        return "bye"
+    if command == "stats":
+        return {"pid": os.getpid(), "http": get_stats(), "memory_cache_entries": len(server.memory_cache._entries)}
+    if command not in ("dandiset_info", "dandiset_assets", "dandiset_assets_summary", "nwb_file_info", "nwb_files_info"):
+        raise ValueError(f"Unknown command: {command}")
+
+    use_cache = kwargs.get("use_cache", True)
+    key = json.dumps([command, kwargs], sort_keys=True)
+    # nwb_file_info results depend only on the (immutable) asset URL
+    ttl = ttl_for_version(kwargs.get("version", "draft")) if command != "nwb_file_info" else None
+    if use_cache:
+        cached = server.memory_cache.get(key, ttl)
+        if cached is not None:
+            return cached
+    result = getattr(tools, command)(**kwargs)
+    if use_cache:
+        server.memory_cache.set(key, result)
+    return result
+
+
+def serve(socket_path: Optional[str] = None) -> None:
+    """
+    Run the daemon in the foreground until it receives a shutdown command.
+
+    Parameters
+    ----------
+    socket_path : str, optional
+        Path of the socket to listen on. Defaults to get_socket_path().
+    """
+    if socket_path is None:
+        socket_path = get_socket_path()
+    if is_running(socket_path):
+        raise RuntimeError(f"A daemon is already running on {socket_path}")
+    if os.path.exists(socket_path):
+        # stale socket left behind by a daemon that did not exit cleanly
+        os.unlink(socket_path)
+    os.makedirs(os.path.dirname(os.path.abspath(socket_path)), exist_ok=True)
+
+    # warm up the imports that the commands need
+    from . import tools  # noqa: F401
+    from .transport import get_session
+    get_session()
+
+    server = ToolServer(socket_path)
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        if "dandi_notebook_gen.notebook_exec" in sys.modules:
+            sys.modules["dandi_notebook_gen.notebook_exec"].shutdown_kernels()
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+
+
+def start_daemon(socket_path: Optional[str] = None, startup_timeout: float = 30.0) -> "subprocess.Popen[bytes]":
+    """
+    Start a daemon in a background process and wait until it answers.
+
+    Parameters
+    ----------
+    socket_path : str, optional
+        Path of the socket to listen on. Defaults to get_socket_path().
+    startup_timeout : float, optional
+        Seconds to wait for the daemon to come up, by default 30
+
+    Returns
+    -------
+    subprocess.Popen
+        The daemon process
+    """
+    if socket_path is None:
+        socket_path = get_socket_path()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "dandi_notebook_gen.cli", "serve", "--socket", socket_path],
+        stdin=subprocess.DEVNULL,
+    )
+    deadline = time.time() + startup_timeout
+    while not is_running(socket_path):
+        if proc.poll() is not None:
+            raise RuntimeError(f"Daemon exited with code {proc.returncode} during startup")
+        if time.time() > deadline:
+            proc.kill()
+            raise RuntimeError(f"Daemon did not start within {startup_timeout} seconds")
+        time.sleep(0.05)
+    return proc
+
+
+def stop_daemon(proc: "Optional[subprocess.Popen[bytes]]" = None, socket_path: Optional[str] = None, timeout: float = 10.0) -> None:
+    """
+    Ask the daemon to shut down, killing its process if it does not exit in time.
+
+    Parameters
+    ----------
+    proc : subprocess.Popen, optional
+        The process returned by start_daemon
+    socket_path : str, optional
+        Path of the daemon socket. Defaults to get_socket_path().
+    timeout : float, optional
+        Seconds to wait for the process to exit, by default 10
+    """
+    try:
+        call("shutdown", socket_path=socket_path, timeout=timeout)
+    except (DaemonUnavailable, RuntimeError, OSError):
+        pass
+    if proc is not None:
+        try:
+            proc.wait(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            proc.wait()
+        return
+    deadline = time.time() + timeout
+    while is_running(socket_path) and time.time() < deadline:
+        time.sleep(0.05)
+
+
+@contextmanager
+def running_daemon() -> Iterator[str]:
+    """
+    Run a private daemon for the duration of a with block.
+
+    The socket lives in a fresh temporary directory, and
+    DANDI_NOTEBOOK_GEN_DAEMON_SOCKET is set in os.environ so that tool
+    commands launched from this process (including by the agent) forward to
+    it. The previous environment is restored on exit.
+
+    Yields
+    ------
+    str
+        Path of the daemon socket
+    """
+    with tempfile.TemporaryDirectory(prefix="dng-") as tmpdir:
+        socket_path = os.path.join(tmpdir, "daemon.sock")
+        proc = start_daemon(socket_path)
+        previous = os.environ.get("DANDI_NOTEBOOK_GEN_DAEMON_SOCKET")
+        os.environ["DANDI_NOTEBOOK_GEN_DAEMON_SOCKET"] = socket_path
+        try:
+            yield socket_path
+        finally:
+            if previous is None:
+                os.environ.pop("DANDI_NOTEBOOK_GEN_DAEMON_SOCKET", None)
+            else:
+                os.environ["DANDI_NOTEBOOK_GEN_DAEMON_SOCKET"] = previous
+            stop_daemon(proc, socket_path)
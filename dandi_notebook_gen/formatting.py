@@ -0,0 +1,250 @@
+"""
+Output formats for the results of the tools CLI
+
+Results are printed in one of these formats:
+
+- json: indented JSON, as returned by the tools
+- ndjson: one JSON value per line. For an asset listing, the other fields
+  of the listing (e.g. count) come first, then one asset per line
+- tsv: tab-separated values. An asset listing becomes a header row and one
+  row per asset; other results become one `key<TAB>value` row per leaf,
+  with nested keys joined by dots
+- compact: JSON without whitespace. An asset listing becomes a header line
+  with the field names, then one JSON array of values per asset, so keys are
+  not repeated. Sizes are human-readable unless exact sizes are requested
+
+The default format is json, or DANDI_NOTEBOOK_GEN_OUTPUT_FORMAT if set.
+generate_notebook sets it to compact for the tools the agent runs.
+"""
+
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+import json
+import os
+from contextlib import contextmanager
+
+FORMAT_ENV = "DANDI_NOTEBOOK_GEN_OUTPUT_FORMAT"
+FORMATS = ("json", "ndjson", "tsv", "compact")
+DEFAULT_FORMAT = "json"
+# keys holding byte counts, rounded by human_sizes
+SIZE_KEYS = ("size", "numberOfBytes", "contentSize")
+
+_COMPACT = dict(separators=(",", ":"), ensure_ascii=False)
+
+
+def get_default_format() -> str:
+    """Return the output format used when none is given."""
+    fmt = os.environ.get(FORMAT_ENV) or DEFAULT_FORMAT
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown output format in {FORMAT_ENV}: {fmt} (expected one of {', '.join(FORMATS)})")
+    return fmt
+
+
+@contextmanager
+def default_output_format(fmt: str) -> Iterator[None]:
+    """Set the default output format of the tools for the duration of a with block."""
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown output format: {fmt} (expected one of {', '.join(FORMATS)})")
+    previous = os.environ.get(FORMAT_ENV)
+    os.environ[FORMAT_ENV] = fmt
+    try:
+        yield
+    finally:
+        if previous is None:
+            os.environ.pop(FORMAT_ENV, None)
+        else:
+            os.environ[FORMAT_ENV] = previous
+
+
+def parse_fields(fields: Optional[str]) -> Optional[List[str]]:
+    """Split a comma-separated --fields value; None or empty means all fields."""
+    if not fields:
+        return None
+    return [f.strip() for f in fields.split(",") if f.strip()] or None
+
+
+def human_size(num_bytes: Any) -> Any:
+    """Round a byte count to three significant digits, e.g. 1843200512 -> "1.72 GiB"."""
+    if not isinstance(num_bytes, (int, float)) or isinstance(num_bytes, bool):
+        return num_bytes
+    units = ["B", "KiB", "MiB", "GiB", "TiB", "PiB"]
+    value = float(num_bytes)
+    i = 0
+    # switch units at 1000 rather than 1024, so that three digits always suffice
+    while abs(value) >= 1000 and i < len(units) - 1:
+        value /= 1024
+        i += 1
+    unit = units[i]
+    if unit == "B":
+        return f"{int(value)} B"
+    return f"{value:.3g} {unit}"
+
+
+def _humanize(value: Any) -> Any:
+    if isinstance(value, dict):
+        # projected keys may be dotted paths, e.g. assetsSummary.numberOfBytes
+        return {k: human_size(v) if str(k).rsplit(".", 1)[-1] in SIZE_KEYS else _humanize(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_humanize(v) for v in value]
+    return value
+
+
+def _get_path(obj: Any, path: str) -> Any:
+    for key in path.split("."):
+        if not isinstance(obj, dict):
+            return None
+        obj = obj.get(key)
+    return obj
+
+
+def project(obj: Dict[str, Any], fields: Optional[List[str]]) -> Dict[str, Any]:
+    """Keep only the given fields of obj; dotted fields select nested values."""
+    if fields is None:
+        return obj
+    return {f: _get_path(obj, f) for f in fields}
+
+
+def _is_listing(result: Any) -> bool:
+    return isinstance(result, dict) and isinstance(result.get("results"), list)
+
+
+def _tsv_value(value: Any) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, (dict, list)):
+        text = json.dumps(value, **_COMPACT)
+    else:
+        text = str(value)
+    return text.replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n")
+
+
+def _flatten(obj: Any, prefix: str = "") -> Iterator[tuple]:
+    if isinstance(obj, dict) and obj:
+        for k, v in obj.items():
+            yield from _flatten(v, f"{prefix}.{k}" if prefix else str(k))
+    elif isinstance(obj, list) and obj and all(not isinstance(v, (dict, list)) for v in obj):
+        yield prefix, ", ".join(str(v) for v in obj)
+    elif isinstance(obj, list) and obj:
+        for i, v in enumerate(obj):
+            yield from _flatten(v, f"{prefix}.{i}")
+    else:
+        yield prefix, obj
+
+
+def format_records(
+    records: Iterable[Dict[str, Any]],
+    fmt: str,
+    *,
+    fields: Optional[List[str]] = None,
+    human_sizes: Optional[bool] = None,
+    header: Optional[Dict[str, Any]] = None,
+) -> Iterator[str]:
+    """
+    Format a stream of records (e.g. assets) line by line.
+
+    Parameters
+    ----------
+    records : Iterable[Dict[str, Any]]
+        The records. They are consumed lazily.
+    fmt : str
+        One of FORMATS. json is written as ndjson, one record per line.
+    fields : List[str], optional
+        Keep only these fields, in this order. For tsv and compact, the
+        columns are otherwise taken from the first record.
+    human_sizes : bool, optional
+        Round byte counts; defaults to True for compact and False otherwise.
+    header : Dict[str, Any], optional
+        Other fields of the listing (e.g. count), written before the records
+        (as a comment line for tsv).
+
+    Yields
+    ------
+    str
+        One line of output, without the trailing newline.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown output format: {fmt} (expected one of {', '.join(FORMATS)})")
+    if human_sizes is None:
+        human_sizes = fmt == "compact"
+    columns = fields
+    started = False
+    for record in records:
+        record = project(record, fields)
+        if human_sizes:
+            record = _humanize(record)
+        if not started:
+            started = True
+            if columns is None:
+                columns = list(record.keys())
+            yield from _header_lines(fmt, header, columns)
+        if fmt in ("json", "ndjson"):
+            yield json.dumps(record, ensure_ascii=False)
+        elif fmt == "compact":
+            yield json.dumps([record.get(c) for c in columns], **_COMPACT)
+        else:
+            yield "\t".join(_tsv_value(record.get(c)) for c in columns)
+    if not started:
+        yield from _header_lines(fmt, header, columns or [])
+
+
+def _header_lines(fmt: str, header: Optional[Dict[str, Any]], columns: List[str]) -> Iterator[str]:
+    if fmt in ("json", "ndjson"):
+        if header:
+            yield json.dumps(header, ensure_ascii=False)
+    elif fmt == "compact":
+        yield json.dumps({**(header or {}), "fields": columns}, **_COMPACT)
+    else:
+        for k, v in (header or {}).items():
+            yield f"# {k}: {_tsv_value(v)}"
+        yield "\t".join(columns)
+
+
+def format_result(
+    result: Any,
+    fmt: Optional[str] = None,
+    *,
+    fields: Optional[List[str]] = None,
+    human_sizes: Optional[bool] = None,
+) -> str:
+    """
+    Format the result of dandiset-info or dandiset-assets for printing.
+
+    Parameters
+    ----------
+    result : Any
+        The result. For an asset listing ({"results": [...], ...}), fields
+        apply to each asset; otherwise they apply to the result itself.
+    fmt : str, optional
+        One of FORMATS; defaults to get_default_format().
+    fields : List[str], optional
+        Keep only these fields; dotted fields (e.g. assetsSummary.numberOfBytes)
+        select nested values.
+    human_sizes : bool, optional
+        Round byte counts; defaults to True for compact and False otherwise.
+
+    Returns
+    -------
+    str
+        The formatted result, without a trailing newline.
+    """
+    fmt = fmt or get_default_format()
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown output format: {fmt} (expected one of {', '.join(FORMATS)})")
+    if human_sizes is None:
+        human_sizes = fmt == "compact"
+    if _is_listing(result):
+        if fmt == "json":
+            listing = {**result, "results": [project(r, fields) for r in result["results"]]}
+            return json.dumps(_humanize(listing) if human_sizes else listing, indent=2)
+        header = {k: v for k, v in result.items() if k != "results"}
+        return "\n".join(format_records(result["results"], fmt, fields=fields, human_sizes=human_sizes, header=header))
+    if isinstance(result, dict):
+        result = project(result, fields)
+    if human_sizes:
+        result = _humanize(result)
+    if fmt == "json":
+        return json.dumps(result, indent=2)
+    if fmt == "ndjson":
+        return json.dumps(result, ensure_ascii=False)
+    if fmt == "compact":
+        return json.dumps(result, **_COMPACT)
+    return "\n".join(f"{k}\t{_tsv_value(v)}" for k, v in _flatten(result))
@@ -2,19 +2,55 @@
 Python script generator for Dandisets using jupytext format and AI completion
 """
 
-from typing import Union
+from typing import List, Tuple, Union
+import hashlib
 import os
 import json
 import shutil
 import time
+from contextlib import nullcontext
 from pathlib import Path
 from tempfile import TemporaryDirectory
 from minicline import perform_task
+from .daemon import forwarding_enabled, running_daemon
+from .manifest import find_unchanged, generation_key, get_manifest_path, record_generation, resolve_version
+from .cache import cache_enabled, get_vision_cache
+from .formatting import FORMATS, default_output_format
+from .nwb_summary import default_nwb_info_budget
+from .minicline_hooks import instrument_minicline
+from .notebook_exec import convert_notebook
+from .range_proxy import restore_urls, running_range_proxy
+from .prefetch import estimate_savings, prefetch_context, render_prefetch_section
+from .budget import Budget, BudgetExceeded
+from .checkpoint import CHECKPOINT_FILE_NAME, load_checkpoint
+from .trace import TRACE_FILE_NAME, read_trace, span, summarize_spans, tracing_to
+from .vision import DEFAULT_MAX_IMAGE_SIZE, new_vision_stats
 
-def read_instructions(experimental_mode: bool) -> str:
+# only true while a warm kernel survives between execute-notebook calls
+WARM_KERNEL_NOTE = " After a run without errors, cells before the first one you changed or added are not re-executed, so extending the notebook is fast."
+
+# how dandiset-assets prints the listing, by output format (see formatting.py)
+ASSETS_FORMAT_NOTES = {
+    "compact": "The assets are printed compactly: a first line with the total count and the names of the fields, then one line of values per asset. ",
+    "tsv": "The assets are printed as tab-separated values: a comment line with the total count, a line with the names of the fields, then one line per asset. ",
+    "ndjson": "The assets are printed as one JSON object per line, after a first line with the total count. ",
+}
+
+def read_instructions(experimental_mode: bool, *, warm_kernels: bool = False, tool_output_format: Union[str, None] = None) -> str:
     """
     Read the instructions from the markdown file.
 
+    Parameters
+    ----------
+    experimental_mode : bool
+        Whether to use the experimental instructions.
+    warm_kernels : bool, optional
+        Whether execute-notebook is served by a tool daemon that keeps the kernel
+        warm, in which case the agent is told that fixes are cheap to re-run.
+    tool_output_format : str, optional
+        The output format of the tools the agent runs, which the description of the
+        asset listing follows. None means the tools' default (JSON).
+
     Returns
     -------
     str
@@ -24,9 +60,41 @@ def read_instructions(experimental_mode: bool) -> str:
     if experimental_mode:
         prompt_path = Path(__file__).parent / "instructions_experimental.md"
     with open(prompt_path, 'r') as f:
-        return f.read()
+        instructions = f.read()
+    instructions = instructions.replace("{{ ASSETS_FORMAT_NOTE }}", ASSETS_FORMAT_NOTES.get(tool_output_format or "", ""))
+    return instructions.replace("{{ EXECUTE_NOTEBOOK_NOTE }}", WARM_KERNEL_NOTE if warm_kernels else "")
+
+def build_instructions(dandiset_id: str, experimental_mode: bool, *, warm_kernels: bool = False, tool_output_format: Union[str, None] = None) -> Tuple[str, str]:
+    """
+    Build the task instructions as a stable prefix and a per-run suffix.
+
+    The prefix is the same for every Dandiset, so that providers can cache it
+    across runs; the Dandiset ID only appears in the short suffix.
+
+    Returns
+    -------
+    Tuple[str, str]
+        The prefix and the suffix; the instructions are their concatenation.
+    """
+    prefix = read_instructions(experimental_mode=experimental_mode, warm_kernels=warm_kernels, tool_output_format=tool_output_format).replace("{{ DANDISET_ID }}", "<DANDISET_ID>")
+    suffix = (
+        "\n\n## The Dandiset\n\n"
+        f"The Dandiset for this task is {dandiset_id}. Use {dandiset_id} wherever these instructions say <DANDISET_ID>.\n"
+    )
+    return prefix, suffix
+
+def commands_run_on_host(no_container: bool) -> bool:
+    """
+    Whether the commands the agent runs share this machine's network and environment.
+
+    Unless no_container is set, minicline runs them with `docker run`, which gives them
+    their own loopback interface and none of the DANDI_NOTEBOOK_GEN_* variables, so
+    neither the byte-range proxy, the tool daemon, the trace file nor the tool output
+    settings reach them. Apptainer (MINICLINE_USE_APPTAINER=true) shares both.
+    """
+    return no_container or os.environ.get("MINICLINE_USE_APPTAINER", "false").lower() == "true"
 
-def generate_notebook(dandiset_id: str, output_path=None, *, model="google/gemini-2.0-flash-001", vision_model: Union[str, None]=None, auto: bool=False, approve_all_commands: bool=False, working_dir: Union[str, None]=None, experimental_mode=True) -> str:
+def generate_notebook(dandiset_id: str, output_path=None, *, model="google/gemini-2.0-flash-001", vision_model: Union[str, None]=None, auto: bool=False, approve_all_commands: bool=False, working_dir: Union[str, None]=None, experimental_mode=True, use_daemon: Union[bool, None]=None, prefetch: Union[str, None]=None, if_changed: bool=False, range_cache: Union[bool, None]=None, tool_output_format: Union[str, None]="compact", nwb_info_max_tokens: Union[int, None]=8000, prompt_caching: bool=True, candidates: int=1, candidate_models: Union[List[str], None]=None, resume: bool=False, max_seconds: Union[float, None]=None, max_prompt_tokens: Union[int, None]=None, max_cost: Union[float, None]=None, preprocess_images: bool=True, max_image_size: Union[int, None]=DEFAULT_MAX_IMAGE_SIZE, no_container: bool=False) -> str:
     """
     Generate a Python script in jupytext format for exploring a Dandiset.
 
@@ -46,6 +114,84 @@ def generate_notebook(dandiset_id: str, output_path=None, *, model="google/gemin
         Whether to run minicline in approve_all_commands mode.
     working_dir : str, optional
         The working directory to use for the task. If not provided, a temporary directory will be used.
+    use_daemon : bool, optional
+        Whether to start a resident tool daemon for the duration of the run, so that the
+        agent's dandi-notebook-gen-tools calls are served from a warm process and
+        execute-notebook keeps its kernel warm between calls. None (the default) starts
+        one when the agent's commands run on the host (see no_container) and no daemon
+        was started by the caller (e.g. batch or a race of candidates).
+    prefetch : str, optional
+        Fetch the Dandiset metadata, asset listing and the usage script of a representative
+        NWB file before handing off to the agent. "inline" puts the results in the
+        instructions; "files" writes them to the prefetch/ subdirectory of the working
+        directory and points the agent at them. None (the default) disables the prefetch.
+    if_changed : bool, optional
+        Return the existing output without regenerating if the Dandiset version, the
+        instructions, the models and the package version are the same as when it was
+        generated. Generations are recorded in dandi-notebook-gen-manifest.json next to
+        the output.
+    range_cache : bool, optional
+        Run a local caching proxy for HTTP range reads for the duration of the run. The
+        URLs printed by nwb-file-info are routed through it, so that repeated reads of the
+        same remote NWB/LINDI files, within the run and across runs, are served from disk.
+        The original URLs are restored in the final notebook. Ignored if caching is
+        disabled with DANDI_NOTEBOOK_GEN_NO_CACHE, and unless the agent's commands run on
+        the host (see no_container), since a Docker container cannot reach the proxy.
+        None (the default) runs it whenever it can.
+    tool_output_format : str, optional
+        Default output format of the dandiset-info and dandiset-assets tools the agent
+        runs (see formatting.py), by default "compact", which repeats no keys and rounds
+        sizes. None leaves the tools' own default (indented JSON).
+    nwb_info_max_tokens : int, optional
+        Default budget of the nwb-file-info tool the agent runs, by default 8000 tokens.
+        Longer usage scripts are summarized (see nwb_summary.py) and the agent can expand
+        single objects. None prints the scripts in full.
+    prompt_caching : bool, optional
+        Build the instructions as a Dandiset-independent prefix plus a short suffix and
+        prepare the model calls for provider-side prompt caching (see prompt_cache.py).
+        Cached and uncached prompt tokens are recorded in metadata.json.
+    candidates : int, optional
+        Race this many independent generations, each in its own process and working
+        directory (candidate-N/ under working_dir), and keep the first notebook that
+        executed cleanly; the other candidates are cancelled (see hedge.py). The winner
+        and the tokens spent by all candidates are recorded in working_dir/metadata.json.
+        max_prompt_tokens and max_cost are split evenly between the candidates, so that
+        they bound the whole race. Requires auto mode. By default 1 (no race).
+    candidate_models : List[str], optional
+        Models of the candidates, used in turn. Defaults to model for every candidate.
+    resume : bool, optional
+        Continue an interrupted run in working_dir from its last checkpoint (see
+        checkpoint.py) instead of starting over. The agent gets the checkpointed
+        conversation and finds the files it already wrote (tmp_scripts/, a partial
+        notebook.py) in place. Without a checkpoint, the run starts from scratch.
+        Requires working_dir.
+    max_seconds : float, optional
+        Wall-clock limit of the run. The limits are checked before every model and tool
+        call of the agent (see budget.py); when one is reached, the run ends, keeping
+        notebook.ipynb (or, if there is none yet, the unexecuted notebook.py) as it is,
+        and metadata.json marks the result as partial. The checkpoint is kept, so the
+        run can be resumed with a larger budget.
+    max_prompt_tokens : int, optional
+        Limit on the prompt tokens of the run, including image analysis and, when
+        resuming, the interrupted run. With several candidates, each gets an equal share.
+    max_cost : float, optional
+        Limit on the cost in USD reported by OpenRouter. Requires prompt_caching, which
+        requests the usage accounting. With several candidates, each gets an equal share.
+    preprocess_images : bool, optional
+        Downsample and recompress the images the agent reads before they reach the vision
+        model, and reuse the descriptions of images with the same perceptual hash and
+        instructions, within the run and across runs unless caching is disabled with
+        DANDI_NOTEBOOK_GEN_NO_CACHE (see vision.py). The images, cache hits and vision
+        tokens saved are recorded in metadata.json. By default True.
+    max_image_size : int, optional
+        Maximum width and height of the images in pixels, by default 1024. None keeps
+        their size.
+    no_container : bool, optional
+        Run the agent's commands on the host instead of in minicline's Docker container.
+        The tool daemon, the byte-range proxy, the trace of the tools' spans and the
+        tool_output_format and nwb_info_max_tokens defaults are handed to the tools
+        through the local network and environment variables, so they only take effect
+        for commands run on the host (or with Apptainer, see commands_run_on_host).
 
     Returns
     -------
@@ -61,33 +207,218 @@ def generate_notebook(dandiset_id: str, output_path=None, *, model="google/gemin
     if approve_all_commands and not auto:
         raise ValueError("approve_all_commands can only be used with auto mode")
 
+    if prefetch not in (None, "inline", "files"):
+        raise ValueError("prefetch must be None, 'inline' or 'files'")
+
+    if tool_output_format is not None and tool_output_format not in FORMATS:
+        raise ValueError(f"tool_output_format must be None or one of {', '.join(FORMATS)}")
+
+    if resume and working_dir is None:
+        raise ValueError("resume requires a working_dir")
+
+    for name, limit in (("max_seconds", max_seconds), ("max_prompt_tokens", max_prompt_tokens), ("max_cost", max_cost)):
+        if limit is not None and limit <= 0:
+            raise ValueError(f"{name} must be positive")
+    if max_cost is not None and not prompt_caching:
+        raise ValueError("max_cost requires prompt_caching, which reports the cost of each call")
+
+    if max_image_size is not None and max_image_size < 1:
+        raise ValueError("max_image_size must be positive")
+
+    if candidates < 1:
+        raise ValueError("candidates must be at least 1")
+    if candidates > 1 and not auto:
+        raise ValueError("candidates can only be used with auto mode")
+
+    on_host = commands_run_on_host(no_container)
+    # features that were asked for explicitly, not just left at their defaults
+    host_features_requested = range_cache is True or use_daemon is True
+    if range_cache is None:
+        range_cache = on_host
+    # a daemon started by the caller, e.g. for all workers of a batch
+    inherited_daemon = "DANDI_NOTEBOOK_GEN_DAEMON_SOCKET" in os.environ
+    if use_daemon is None:
+        use_daemon = on_host and not inherited_daemon
+    warm_kernels = on_host and forwarding_enabled() and (use_daemon or inherited_daemon)
+    # the format setting only reaches commands run on the host
+    agent_output_format = tool_output_format if on_host else None
+
+    # candidates of other models use their own model for images unless one is given
+    candidate_vision_model = vision_model
     if not vision_model:
         vision_model = model
 
-    instructions = read_instructions(experimental_mode=experimental_mode)
-    # replace {{ DANDISET_ID }} with the actual dandiset_id
-    instructions = instructions.replace("{{ DANDISET_ID }}", dandiset_id)
+    if prompt_caching:
+        stable_prefix, suffix = build_instructions(dandiset_id, experimental_mode=experimental_mode, warm_kernels=warm_kernels,
+                                                   tool_output_format=agent_output_format)
+        instructions = stable_prefix + suffix
+    else:
+        stable_prefix = None
+        instructions = read_instructions(experimental_mode=experimental_mode, warm_kernels=warm_kernels,
+                                         tool_output_format=agent_output_format)
+        # replace {{ DANDISET_ID }} with the actual dandiset_id
+        instructions = instructions.replace("{{ DANDISET_ID }}", dandiset_id)
+
+    manifest_path = get_manifest_path(output_path)
+    generation = None
+    if if_changed:
+        try:
+            generation = generation_key(
+                dandiset_id,
+                resolved_version=resolve_version(dandiset_id),
+                instructions=instructions,
+                model=model,
+                vision_model=vision_model
+            )
+        except Exception as e:
+            print(f'Could not resolve the Dandiset version, regenerating: {e}')
+        else:
+            entry = find_unchanged(manifest_path, generation, output_path)
+            if entry is not None:
+                print(f'Dandiset {dandiset_id} is unchanged since {entry["timestamp"]}, keeping {output_path}')
+                return output_path
+
+    if candidates > 1:
+        from .hedge import race_candidates
+        options = dict(
+            vision_model=candidate_vision_model, auto=auto, approve_all_commands=approve_all_commands,
+            experimental_mode=experimental_mode, prefetch=prefetch, range_cache=range_cache,
+            tool_output_format=tool_output_format, nwb_info_max_tokens=nwb_info_max_tokens,
+            prompt_caching=prompt_caching, resume=resume,
+            # the token and cost limits bound the whole race, so each candidate gets an
+            # equal share; the candidates run at the same time, so max_seconds is not split
+            max_seconds=max_seconds,
+            max_prompt_tokens=max(1, max_prompt_tokens // candidates) if max_prompt_tokens is not None else None,
+            max_cost=max_cost / candidates if max_cost is not None else None,
+            preprocess_images=preprocess_images, max_image_size=max_image_size,
+            no_container=no_container,
+            # the candidates use the daemon started here, if any
+            use_daemon=False
+        )
+        # one daemon for all candidates; they inherit its address
+        with running_daemon() if use_daemon else nullcontext():
+            if working_dir is not None:
+                os.makedirs(working_dir, exist_ok=True)
+                race = race_candidates(dandiset_id, output_path, working_dir, num_candidates=candidates,
+                                       models=candidate_models or [model], options=options)
+            else:
+                with TemporaryDirectory() as temp_dir:
+                    race = race_candidates(dandiset_id, output_path, temp_dir, num_candidates=candidates,
+                                           models=candidate_models or [model], options=options)
+        # a notebook cut short by the budget is regenerated next time
+        if generation is not None and not race["winner_partial"]:
+            record_generation(manifest_path, generation, output_path)
+        return output_path
 
     start_time = time.time()
+    # set by run when the budget ends it early
+    partial = False
     def helper(working_dir: str):
         print(f'Using working directory: {working_dir}')
+        # model calls, agent tool calls and the dandi-notebook-gen-tools
+        # processes the agent launches all append spans to this file
+        trace_path = os.path.join(working_dir, TRACE_FILE_NAME)
+        with tracing_to(trace_path):
+            with default_output_format(tool_output_format) if tool_output_format else nullcontext(), \
+                    default_nwb_info_budget(nwb_info_max_tokens) if nwb_info_max_tokens else nullcontext():
+                run(working_dir, trace_path)
+
+    def run(working_dir: str, trace_path: str):
+        nonlocal partial
+        task_instructions = instructions
+        prefetch_metadata = None
+        checkpoint_path = os.path.join(working_dir, CHECKPOINT_FILE_NAME)
+        resume_from = load_checkpoint(checkpoint_path) if resume else None
+        log_file = os.path.join(working_dir, 'minicline.log')
+        if resume and resume_from is None:
+            print(f'No checkpoint in {working_dir}, starting from scratch')
+        elif resume_from is not None:
+            print(f'Resuming from the checkpoint of {resume_from["timestamp"]} ({resume_from["num_completions"]} model calls)')
+            # keep the log of the interrupted run
+            k = 1
+            while os.path.exists(os.path.join(working_dir, f'minicline.{k}.log')):
+                k += 1
+            if os.path.exists(log_file):
+                os.rename(log_file, os.path.join(working_dir, f'minicline.{k}.log'))
+        if prefetch and resume_from is None:
+            try:
+                with span('stage', 'prefetch', phase='prefetch'):
+                    report = prefetch_context(dandiset_id, working_dir)
+                task_instructions = instructions + render_prefetch_section(dandiset_id, report, prefetch)
+                prefetch_metadata = {
+                    'mode': prefetch,
+                    'nwb_file_url': report['nwb_file_url'],
+                    'files': report['files'],
+                    'elapsed_seconds': report['elapsed_seconds'],
+                    **estimate_savings(instructions, report)
+                }
+            except Exception as e:
+                # the agent can still gather the information itself
+                print(f'Prefetch failed, continuing without it: {e}')
+                prefetch_metadata = {'mode': prefetch, 'error': str(e)}
+        # tokens spent before the interruption count too
+        previous = resume_from or {}
+        budget = Budget(max_seconds=max_seconds, max_prompt_tokens=max_prompt_tokens, max_cost=max_cost, start_time=start_time)
+        budget.prompt_tokens = previous.get('total_prompt_tokens') or 0
+        budget.completion_tokens = previous.get('total_completion_tokens') or 0
+        budget.vision_prompt_tokens = previous.get('total_vision_prompt_tokens') or 0
+        budget.vision_completion_tokens = previous.get('total_vision_completion_tokens') or 0
+        budget_exceeded = None
+        vision_stats = new_vision_stats()
         # perform the task which should ultimately create a notebook.py
-        perform_task_result = perform_task(
-            instructions=instructions,
-            model=model,
-            vision_model=vision_model,
-            cwd=working_dir,
-            auto=auto,
-            approve_all_commands=approve_all_commands,
-            log_file=f'{working_dir}/minicline.log'
-        )
-        total_prompt_tokens = perform_task_result.total_prompt_tokens
-        total_completion_tokens = perform_task_result.total_completion_tokens
-        total_vision_prompt_tokens = perform_task_result.total_vision_prompt_tokens
-        total_vision_completion_tokens = perform_task_result.total_vision_completion_tokens
+        with instrument_minicline(trace_path=trace_path, prompt_caching=prompt_caching, stable_prefix=stable_prefix, cwd=working_dir,
+                                  checkpoint_path=checkpoint_path, resume_from=resume_from,
+                                  budget=budget if budget.limited else None,
+                                  preprocess_images=preprocess_images, max_image_size=max_image_size,
+                                  vision_cache=get_vision_cache() if cache_enabled() else None,
+                                  vision_stats=vision_stats) as completion_stats:
+            try:
+                perform_task_result = perform_task(
+                    instructions=task_instructions,
+                    model=model,
+                    vision_model=vision_model,
+                    cwd=working_dir,
+                    auto=auto,
+                    approve_all_commands=approve_all_commands,
+                    log_file=log_file,
+                    no_container=no_container
+                )
+            except BudgetExceeded as e:
+                print(f'Ending the run: {e}')
+                budget_exceeded = e
+                partial = True
+        if budget_exceeded is None:
+            # the run completed; a later resume starts over
+            if os.path.exists(checkpoint_path):
+                os.remove(checkpoint_path)
+            total_prompt_tokens = perform_task_result.total_prompt_tokens + (previous.get('total_prompt_tokens') or 0)
+            total_completion_tokens = perform_task_result.total_completion_tokens + (previous.get('total_completion_tokens') or 0)
+            total_vision_prompt_tokens = perform_task_result.total_vision_prompt_tokens + (previous.get('total_vision_prompt_tokens') or 0)
+            total_vision_completion_tokens = perform_task_result.total_vision_completion_tokens + (previous.get('total_vision_completion_tokens') or 0)
+        else:
+            # the budget has counted every call
+            total_prompt_tokens = budget.prompt_tokens
+            total_completion_tokens = budget.completion_tokens
+            total_vision_prompt_tokens = budget.vision_prompt_tokens
+            total_vision_completion_tokens = budget.vision_completion_tokens
+            py_path = os.path.join(working_dir, "notebook.py")
+            if not os.path.exists(os.path.join(working_dir, "notebook.ipynb")) and os.path.exists(py_path):
+                # the notebook as far as the agent got, without outputs
+                convert_notebook(py_path, os.path.join(working_dir, "notebook.ipynb"))
+        if proxy is not None:
+            # the notebook is meant to be run elsewhere, without the proxy
+            for name in ("notebook.py", "notebook.ipynb"):
+                path = os.path.join(working_dir, name)
+                if os.path.exists(path):
+                    with open(path, 'r') as f:
+                        text = f.read()
+                    restored = restore_urls(text, proxy.url)
+                    if restored != text:
+                        with open(path, 'w') as f:
+                            f.write(restored)
         with open(f'{working_dir}/metadata.json', 'w') as f:
             elapsed_time = time.time() - start_time
-            json.dump({
+            metadata = {
                 'model': model,
                 'vision_model': vision_model,
                 'total_prompt_tokens': total_prompt_tokens,
@@ -96,7 +427,36 @@ def generate_notebook(dandiset_id: str, output_path=None, *, model="google/gemin
                 'total_vision_completion_tokens': total_vision_completion_tokens,
                 'timestamp': time.strftime('%Y-%m-%d %H:%M:%S'),
                 'elapsed_time_seconds': elapsed_time
-            }, f, indent=2)
+            }
+            if prefetch_metadata is not None:
+                metadata['prefetch'] = prefetch_metadata
+            if budget.limited:
+                metadata['budget'] = budget.limits()
+                metadata['partial'] = budget_exceeded is not None
+                if budget_exceeded is not None:
+                    metadata['budget_exceeded'] = budget_exceeded.limit
+            if resume_from is not None:
+                metadata['resumed_from_checkpoint'] = {
+                    'timestamp': resume_from['timestamp'],
+                    'num_completions': resume_from['num_completions'],
+                    **{k: v for k, v in resume_from.items() if k.startswith('total_')}
+                }
+            if preprocess_images:
+                metadata['vision'] = {'max_image_size': max_image_size, **vision_stats}
+            if proxy is not None:
+                metadata['range_cache'] = dict(proxy.stats)
+            if prompt_caching:
+                metadata['prompt_cache'] = {
+                    'stable_prefix_sha256': hashlib.sha256(stable_prefix.encode('utf-8')).hexdigest(),
+                    'stable_prefix_chars': len(stable_prefix),
+                    'cached_prompt_tokens': completion_stats['cached_prompt_tokens'],
+                    'uncached_prompt_tokens': completion_stats['prompt_tokens'] - completion_stats['cached_prompt_tokens'],
+                    'cache_write_tokens': completion_stats['cache_write_tokens'],
+                    'cost': completion_stats['cost']
+                }
+            metadata['trace_file'] = TRACE_FILE_NAME
+            metadata['phases'] = summarize_spans(read_trace(trace_path))['phases']
+            json.dump(metadata, f, indent=2)
         # check that the notebook.ipynb was created
         notebook_path = os.path.join(working_dir, "notebook.ipynb")
         if not os.path.exists(notebook_path):
@@ -104,13 +464,22 @@ def generate_notebook(dandiset_id: str, output_path=None, *, model="google/gemin
         # copy the notebook.ipynb to the output path
         shutil.copy(notebook_path, output_path)
 
-    # Create a temporary directory
-    if working_dir is not None:
-        os.makedirs(working_dir, exist_ok=True)
-        helper(working_dir=working_dir)
-    else:
-        with TemporaryDirectory() as temp_dir:
-            helper(working_dir=temp_dir)
+    if not on_host and host_features_requested:
+        print('The agent\'s commands run in a container, which does not reach the byte-range cache, '
+              'the tool daemon or the tool settings of this process; pass no_container=True to run them on the host')
+    # the proxy starts first, so that the daemon inherits its address
+    with running_range_proxy() if range_cache and cache_enabled() and on_host else nullcontext() as proxy:
+        with running_daemon() if use_daemon else nullcontext():
+            # Create a temporary directory
+            if working_dir is not None:
+                os.makedirs(working_dir, exist_ok=True)
+                helper(working_dir=working_dir)
+            else:
+                with TemporaryDirectory() as temp_dir:
+                    helper(working_dir=temp_dir)
 
+    # a notebook cut short by the budget is regenerated next time
+    if generation is not None and not partial:
+        record_generation(manifest_path, generation, output_path)
 
     return output_path
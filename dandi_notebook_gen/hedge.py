@@ -0,0 +1,259 @@
+"""
+Hedged notebook generation: race several candidates, keep the first clean one
+
+Agent runs vary a lot in duration, and a few get stuck in long fix loops.
+race_candidates starts several independent generations of the same
+Dandiset, each in its own process, process group and working directory:
+
+    WORKING_DIR/
+        metadata.json        (the race: winner, per-candidate status, tokens)
+        candidate-1/
+            notebook.ipynb   (the candidate's notebook)
+            output.log       (stdout/stderr of the candidate)
+            result.json      (written by the candidate when it finishes)
+            work/            (the candidate's working directory)
+        candidate-2/
+        ...
+
+The first candidate that finishes with a notebook that executed cleanly (every
+code cell executed, no error outputs) wins, and the other candidates are
+cancelled together with any processes they started. If no candidate
+produces a clean notebook, the first one that produced a notebook at all is
+used.
+"""
+
+from typing import Any, Dict, List, Optional
+import json
+import multiprocessing
+import os
+import shutil
+import signal
+import sys
+import time
+import traceback
+
+from .trace import TRACE_FILE_NAME, read_trace
+
+# how often the candidates' result files are checked
+POLL_INTERVAL = 0.2
+# time given to cancelled candidates to exit before they are killed
+CANCEL_GRACE_SECONDS = 5.0
+
+TOKEN_KEYS = [
+    "total_prompt_tokens",
+    "total_completion_tokens",
+    "total_vision_prompt_tokens",
+    "total_vision_completion_tokens",
+]
+
+
+def executed_cleanly(notebook_path: str) -> bool:
+    """Whether every code cell of an .ipynb has been executed without an error output."""
+    try:
+        with open(notebook_path, "r") as f:
+            nb = json.load(f)
+    except (OSError, ValueError):
+        return False
+    for cell in nb.get("cells", []):
+        if cell.get("cell_type") != "code":
+            continue
+        if cell.get("execution_count") is None:
+            return False
+        if any(output.get("output_type") == "error" for output in cell.get("outputs", [])):
+            return False
+    return True
+
+
+def _candidate_paths(working_dir: str, index: int) -> Dict[str, str]:
+    candidate_dir = os.path.join(working_dir, f"candidate-{index + 1}")
+    return {
+        "dir": candidate_dir,
+        "notebook": os.path.join(candidate_dir, "notebook.ipynb"),
+        "log": os.path.join(candidate_dir, "output.log"),
+        "result": os.path.join(candidate_dir, "result.json"),
+        "working_dir": os.path.join(candidate_dir, "work"),
+    }
+
+
+def _run_candidate(dandiset_id: str, paths: Dict[str, str], options: Dict[str, Any]) -> None:
+    """Candidate process: generate one notebook and write result.json."""
+    # a process group of its own, so that cancelling it also stops the
+    # commands and kernels the agent started
+    os.setsid()
+    from .generator import generate_notebook
+
+    start_time = time.time()
+    with open(paths["log"], "w") as log:
+        original_stdout, original_stderr = sys.stdout, sys.stderr
+        sys.stdout = sys.stderr = log
+        try:
+            generate_notebook(dandiset_id, output_path=paths["notebook"], working_dir=paths["working_dir"], **options)
+            result = {"status": "success", "clean": executed_cleanly(paths["notebook"])}
+        except Exception as e:
+            traceback.print_exc()
+            result = {"status": "failed", "error": f"{type(e).__name__}: {e}"}
+        finally:
+            sys.stdout, sys.stderr = original_stdout, original_stderr
+    result["elapsed_time_seconds"] = time.time() - start_time
+    tmp_path = paths["result"] + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(result, f)
+    os.replace(tmp_path, paths["result"])
+
+
+def _cancel(process: multiprocessing.Process) -> None:
+    try:
+        os.killpg(process.pid, signal.SIGTERM)
+    except (ProcessLookupError, PermissionError):
+        pass
+    process.join(CANCEL_GRACE_SECONDS)
+    if process.is_alive():
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except (ProcessLookupError, PermissionError):
+            pass
+        process.join()
+
+
+def _read_json(path: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _token_counts(working_dir: str) -> Dict[str, int]:
+    """Tokens spent by a candidate, from its metadata.json or, if it was cancelled, its trace."""
+    metadata = _read_json(os.path.join(working_dir, "metadata.json"))
+    if metadata is not None:
+        return {key: metadata.get(key) or 0 for key in TOKEN_KEYS}
+    counts = dict.fromkeys(TOKEN_KEYS, 0)
+    trace_path = os.path.join(working_dir, TRACE_FILE_NAME)
+    if not os.path.exists(trace_path):
+        return counts
+    for s in read_trace(trace_path):
+        counts["total_prompt_tokens"] += s.get("prompt_tokens") or 0
+        counts["total_completion_tokens"] += s.get("completion_tokens") or 0
+        counts["total_vision_prompt_tokens"] += s.get("vision_prompt_tokens") or 0
+        counts["total_vision_completion_tokens"] += s.get("vision_completion_tokens") or 0
+    return counts
+
+
+def race_candidates(
+    dandiset_id: str,
+    output_path: str,
+    working_dir: str,
+    *,
+    num_candidates: int,
+    models: List[str],
+    options: Dict[str, Any],
+) -> Dict[str, Any]:
+    """
+    Run num_candidates generations at once and keep the first clean notebook.
+
+    Parameters
+    ----------
+    dandiset_id : str
+        The ID of the Dandiset.
+    output_path : str
+        Where the winning notebook is copied.
+    working_dir : str
+        Directory for the candidates' directories and the race's metadata.json.
+    num_candidates : int
+        The number of candidates.
+    models : List[str]
+        The models of the candidates, used in turn (candidate i gets
+        models[i % len(models)]).
+    options : Dict[str, Any]
+        Other generate_notebook arguments, the same for every candidate.
+
+    Returns
+    -------
+    Dict[str, Any]
+        The metadata of the race, also written to working_dir/metadata.json.
+
+    Raises
+    ------
+    RuntimeError
+        If no candidate produced a notebook.
+    """
+    start_time = time.time()
+    processes: List[multiprocessing.Process] = []
+    candidates: List[Dict[str, Any]] = []
+    for i in range(num_candidates):
+        paths = _candidate_paths(working_dir, i)
+        os.makedirs(paths["working_dir"], exist_ok=True)
+        model = models[i % len(models)]
+        process = multiprocessing.Process(
+            target=_run_candidate,
+            args=(dandiset_id, paths, {**options, "model": model}),
+            daemon=False,
+        )
+        process.start()
+        processes.append(process)
+        candidates.append({"candidate": i + 1, "model": model, "status": "running", "paths": paths})
+
+    winner: Optional[int] = None
+    fallback: Optional[int] = None
+    try:
+        while winner is None and any(c["status"] == "running" for c in candidates):
+            for i, c in enumerate(candidates):
+                if c["status"] != "running":
+                    continue
+                result = _read_json(c["paths"]["result"])
+                if result is None and processes[i].is_alive():
+                    continue
+                if result is None:
+                    # the process died without reporting
+                    result = {"status": "failed", "error": f"candidate exited with code {processes[i].exitcode}"}
+                c["elapsed_time_seconds"] = result.get("elapsed_time_seconds", time.time() - start_time)
+                if result["status"] != "success":
+                    c["status"], c["error"] = "failed", result.get("error")
+                elif result["clean"]:
+                    c["status"] = "won"
+                    winner = i
+                    break
+                else:
+                    c["status"] = "finished_with_errors"
+                    if fallback is None:
+                        fallback = i
+            if winner is None:
+                time.sleep(POLL_INTERVAL)
+    finally:
+        for i, c in enumerate(candidates):
+            if c["status"] == "running":
+                _cancel(processes[i])
+                c["status"] = "cancelled"
+                c["elapsed_time_seconds"] = time.time() - start_time
+            processes[i].join()
+
+    chosen = winner if winner is not None else fallback
+    metadata: Dict[str, Any] = {
+        "dandiset_id": dandiset_id,
+        "num_candidates": num_candidates,
+        "winner": candidates[chosen]["candidate"] if chosen is not None else None,
+        "winner_model": candidates[chosen]["model"] if chosen is not None else None,
+        "winner_executed_cleanly": winner is not None,
+        # the chosen notebook was cut short by the candidate's budget
+        "winner_partial": chosen is not None and bool(
+            (_read_json(os.path.join(candidates[chosen]["paths"]["working_dir"], "metadata.json")) or {}).get("partial")
+        ),
+        "elapsed_time_seconds": time.time() - start_time,
+        "timestamp": time.strftime('%Y-%m-%d %H:%M:%S'),
+        "candidates": [],
+    }
+    for c in candidates:
+        record = {k: v for k, v in c.items() if k != "paths"}
+        record.update(_token_counts(c["paths"]["working_dir"]))
+        metadata["candidates"].append(record)
+    # the total spend of the race, including cancelled candidates
+    for key in TOKEN_KEYS:
+        metadata[key] = sum(c[key] for c in metadata["candidates"])
+    with open(os.path.join(working_dir, "metadata.json"), "w") as f:
+        json.dump(metadata, f, indent=2)
+
+    if chosen is None:
+        raise RuntimeError(f"None of the {num_candidates} candidates produced a notebook; see {working_dir}/candidate-*/output.log")
+    shutil.copy(candidates[chosen]["paths"]["notebook"], output_path)
+    return metadata
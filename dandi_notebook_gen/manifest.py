@@ -0,0 +1,98 @@
+"""
+Generation manifest for skip-if-unchanged regeneration
+
+The manifest is a JSON file next to the generated notebooks that records,
+for each Dandiset, the inputs its notebook was generated from. A notebook
+only needs to be regenerated when one of those inputs has changed.
+"""
+
+from typing import Any, Dict, Optional
+import hashlib
+import json
+import os
+import time
+
+from . import __version__
+
+MANIFEST_FILE_NAME = "dandi-notebook-gen-manifest.json"
+
+
+def get_manifest_path(output_path: str) -> str:
+    """Return the manifest that covers a notebook output path."""
+    return os.path.join(os.path.dirname(os.path.abspath(output_path)), MANIFEST_FILE_NAME)
+
+
+def resolve_version(dandiset_id: str, version: str = "draft") -> str:
+    """
+    Resolve a Dandiset version to a string that changes whenever its content can.
+
+    Published versions are immutable, so they resolve to themselves. The
+    draft resolves to a hash of its current metadata (including the assets
+    summary), fetched without the response cache.
+    """
+    from .tools import dandiset_info
+    info = dandiset_info(dandiset_id, version=version, use_cache=False)
+    resolved = info.get("version", version) if isinstance(info, dict) else version
+    if resolved != "draft":
+        return resolved
+    digest = hashlib.sha256(json.dumps(info, sort_keys=True).encode("utf-8")).hexdigest()
+    return f"draft@{digest[:16]}"
+
+
+def generation_key(
+    dandiset_id: str,
+    *,
+    resolved_version: str,
+    instructions: str,
+    model: str,
+    vision_model: Optional[str],
+) -> Dict[str, Any]:
+    """Return the inputs that determine a generated notebook."""
+    return {
+        "dandiset_id": dandiset_id,
+        "resolved_version": resolved_version,
+        "instructions_sha256": hashlib.sha256(instructions.encode("utf-8")).hexdigest(),
+        "model": model,
+        "vision_model": vision_model,
+        "package_version": __version__,
+    }
+
+
+def read_manifest(path: str) -> Dict[str, Any]:
+    try:
+        with open(path, "r") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return manifest if isinstance(manifest, dict) else {}
+
+
+def find_unchanged(path: str, key: Dict[str, Any], output_path: str) -> Optional[Dict[str, Any]]:
+    """
+    Return the manifest entry for key if its notebook is still in place.
+
+    Returns None if the Dandiset has no entry, any input differs, or the
+    recorded notebook no longer exists at output_path.
+    """
+    entry = read_manifest(path).get(key["dandiset_id"])
+    if not entry or entry.get("key") != key:
+        return None
+    if os.path.abspath(entry.get("output_path", "")) != os.path.abspath(output_path):
+        return None
+    if not os.path.exists(output_path):
+        return None
+    return entry
+
+
+def record_generation(path: str, key: Dict[str, Any], output_path: str) -> None:
+    """Record a successful generation in the manifest (atomically)."""
+    manifest = read_manifest(path)
+    manifest[key["dandiset_id"]] = {
+        "key": key,
+        "output_path": os.path.abspath(output_path),
+        "timestamp": time.strftime('%Y-%m-%d %H:%M:%S'),
+    }
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
@@ -0,0 +1,258 @@
+"""
+Instrumentation of minicline's agent loop
+
+minicline has no callback API, so for the duration of a run the generator
+wraps the module-level functions that perform_task looks up at call time
+(run_completion, run_completion_with_retries, execute_tool and read_image
+in minicline.core) and restores them afterwards.
+"""
+
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+import re
+import time
+from contextlib import ExitStack, contextmanager
+
+from . import prompt_cache
+from .budget import Budget
+from .cache import DiskCache
+from .checkpoint import new_checkpoint_totals, resumed_messages, save_checkpoint
+from .trace import command_phase, record_span
+from .vision import new_vision_stats, preprocessed_read_image
+
+
+def _tool_phase(tool_name: str, params: dict) -> str:
+    if tool_name == "read_image":
+        return "vision"
+    if tool_name == "execute_command":
+        return command_phase(params.get("command", ""))
+    return "agent_tools"
+
+
+def _command_exit_status(text: str) -> Tuple[str, Optional[int]]:
+    """Parse the exit status out of minicline's execute_command result text."""
+    if text.startswith("Command executed successfully"):
+        return "ok", 0
+    m = re.match(r"Command failed with exit code (-?\d+)", text)
+    if m:
+        return "error", int(m.group(1))
+    if "timed out" in text[:200]:
+        return "timeout", None
+    return "error", None
+
+
+@contextmanager
+def _patched(module: Any, name: str, make_replacement: Callable[[Callable], Callable]) -> Iterator[None]:
+    original = getattr(module, name, None)
+    if original is None:
+        # an older or newer minicline without this function; leave it alone
+        yield
+        return
+    setattr(module, name, make_replacement(original))
+    try:
+        yield
+    finally:
+        setattr(module, name, original)
+
+
+def _cached_run_completion(original: Callable, stats: Dict[str, Any], stable_prefix: Optional[str], cwd: Optional[str]) -> Callable:
+    from minicline.completion.run_completion import run_completion as stock_run_completion
+    if original is stock_run_completion:
+        # minicline's own OpenRouter call: replace it with one that also
+        # reports cached tokens and cost
+        def run_completion(messages, *, model, **kwargs):
+            return prompt_cache.run_completion(messages, model=model, stats=stats, stable_prefix=stable_prefix, cwd=cwd)
+        return run_completion
+
+    # some other completion function: only send the hints
+    def hinted_run_completion(messages, *args, **kwargs):
+        hinted = prompt_cache.add_cache_hints(messages, model=kwargs.get("model", ""), stable_prefix=stable_prefix, cwd=cwd)
+        content, conversation, prompt_tokens, completion_tokens = original(hinted, *args, **kwargs)
+        stats["num_completions"] += 1
+        stats["prompt_tokens"] += prompt_tokens
+        stats["completion_tokens"] += completion_tokens
+        return content, list(messages) + list(conversation[len(hinted):]), prompt_tokens, completion_tokens
+    return hinted_run_completion
+
+
+def _traced_run_completion(original: Callable, trace_path: str, stats: Dict[str, Any]) -> Callable:
+    def run_completion(messages, *args, **kwargs):
+        model = kwargs.get("model", "?")
+        start = time.time()
+        cached_before = stats["cached_prompt_tokens"]
+        try:
+            result = original(messages, *args, **kwargs)
+        except BaseException as e:
+            record_span("model", model, start, time.time(), path=trace_path, phase="model",
+                        status="error", error=f"{type(e).__name__}: {e}")
+            raise
+        content, _, prompt_tokens, completion_tokens = result
+        record_span("model", model, start, time.time(), path=trace_path, phase="model", status="ok",
+                    prompt_tokens=prompt_tokens, completion_tokens=completion_tokens,
+                    cached_prompt_tokens=stats["cached_prompt_tokens"] - cached_before,
+                    bytes_out=len((content or "").encode("utf-8")))
+        return result
+    return run_completion
+
+
+def _traced_execute_tool(original: Callable, trace_path: str) -> Callable:
+    def execute_tool(tool_name, params, *args, **kwargs):
+        start = time.time()
+        result = original(tool_name, params, *args, **kwargs)
+        _, text, _, handled, vision_prompt_tokens, vision_completion_tokens = result
+        fields = {
+            "phase": _tool_phase(tool_name, params),
+            "status": "ok" if handled else "error",
+            "bytes_out": len((text or "").encode("utf-8")),
+        }
+        if tool_name == "execute_command":
+            fields["command"] = params.get("command")
+            fields["status"], fields["exit_code"] = _command_exit_status(text or "")
+        if tool_name == "read_image":
+            fields["vision_prompt_tokens"] = vision_prompt_tokens
+            fields["vision_completion_tokens"] = vision_completion_tokens
+        record_span("tool", tool_name, start, time.time(), path=trace_path, **fields)
+        return result
+    return execute_tool
+
+
+def _checkpointed_run_completion(original: Callable, checkpoint_path: str, totals: Dict[str, int], resume_from: Optional[Dict[str, Any]]) -> Callable:
+    state = {"resume": resumed_messages(resume_from) if resume_from else None}
+
+    def run_completion(messages, *args, **kwargs):
+        if state["resume"] is not None:
+            # the first call of a resumed run: continue the checkpointed
+            # conversation instead of the new one
+            messages = state["resume"]
+        save_checkpoint(checkpoint_path, list(messages), totals)
+        result = original(messages, *args, **kwargs)
+        state["resume"] = None
+        _, _, prompt_tokens, completion_tokens = result
+        totals["num_completions"] += 1
+        totals["total_prompt_tokens"] += prompt_tokens
+        totals["total_completion_tokens"] += completion_tokens
+        return result
+    return run_completion
+
+
+def _checkpointed_execute_tool(original: Callable, totals: Dict[str, int]) -> Callable:
+    def execute_tool(tool_name, params, *args, **kwargs):
+        result = original(tool_name, params, *args, **kwargs)
+        totals["total_vision_prompt_tokens"] += result[4]
+        totals["total_vision_completion_tokens"] += result[5]
+        return result
+    return execute_tool
+
+
+def _budgeted_run_completion(original: Callable, budget: Budget, stats: Dict[str, Any]) -> Callable:
+    # wraps run_completion_with_retries, which would retry on BudgetExceeded
+    def run_completion_with_retries(messages, *args, **kwargs):
+        budget.check()
+        result = original(messages, *args, **kwargs)
+        _, _, prompt_tokens, completion_tokens = result
+        budget.prompt_tokens += prompt_tokens
+        budget.completion_tokens += completion_tokens
+        # reported by the prompt caching replacement, if in use
+        budget.cost = stats["cost"]
+        return result
+    return run_completion_with_retries
+
+
+def _budgeted_execute_tool(original: Callable, budget: Budget) -> Callable:
+    def execute_tool(tool_name, params, *args, **kwargs):
+        if tool_name != "attempt_completion":
+            # let the agent finish if it is done
+            budget.check()
+        result = original(tool_name, params, *args, **kwargs)
+        budget.vision_prompt_tokens += result[4]
+        budget.vision_completion_tokens += result[5]
+        return result
+    return execute_tool
+
+
+@contextmanager
+def instrument_minicline(
+    *,
+    trace_path: Optional[str] = None,
+    prompt_caching: bool = False,
+    stable_prefix: Optional[str] = None,
+    cwd: Optional[str] = None,
+    checkpoint_path: Optional[str] = None,
+    resume_from: Optional[Dict[str, Any]] = None,
+    budget: Optional[Budget] = None,
+    preprocess_images: bool = False,
+    max_image_size: Optional[int] = None,
+    vision_cache: Optional[DiskCache] = None,
+    vision_stats: Optional[Dict[str, int]] = None,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Instrument minicline for the duration of a with block.
+
+    Parameters
+    ----------
+    trace_path : str, optional
+        If given, every model call and tool invocation is recorded as a span
+        in this trace file.
+    prompt_caching : bool, optional
+        Prepare the model calls for provider-side prompt caching (see
+        prompt_cache.py) and count cached prompt tokens.
+    stable_prefix : str, optional
+        The part of the task instructions that is the same across runs.
+    cwd : str, optional
+        The working directory of the run.
+    checkpoint_path : str, optional
+        If given, the conversation and the tokens spent so far are saved to
+        this file before every model call (see checkpoint.py).
+    resume_from : Dict[str, Any], optional
+        A checkpoint to resume: the first model call continues its
+        conversation, and its token counts are carried over to the new
+        checkpoints.
+    budget : Budget, optional
+        Limits checked before every model and tool call (see budget.py).
+    preprocess_images : bool, optional
+        Downsample and recompress the images the agent reads and reuse the
+        descriptions of images seen before (see vision.py).
+    max_image_size : int, optional
+        Maximum width and height of the images, in pixels. None only
+        recompresses them.
+    vision_cache : DiskCache, optional
+        Cache of image descriptions shared across runs.
+    vision_stats : Dict[str, int], optional
+        Counters of the images (see vision.new_vision_stats), updated as
+        they are read.
+
+    Yields
+    ------
+    Dict[str, Any]
+        Counters of the model calls made through run_completion with prompt
+        caching (see prompt_cache.new_completion_stats), updated as the
+        calls are made.
+    """
+    import minicline.core as core
+
+    stats = prompt_cache.new_completion_stats()
+    patches: List[Tuple[str, Callable[[Callable], Callable]]] = []
+    if prompt_caching:
+        patches.append(("run_completion", lambda f: _cached_run_completion(f, stats, stable_prefix, cwd)))
+    if trace_path:
+        # applied after the caching patch, so that it times the replacement
+        patches.append(("run_completion", lambda f: _traced_run_completion(f, trace_path, stats)))
+        patches.append(("execute_tool", lambda f: _traced_execute_tool(f, trace_path)))
+    if checkpoint_path:
+        # applied last, so that the resumed conversation also gets the cache hints
+        totals = new_checkpoint_totals()
+        if resume_from:
+            totals.update({key: resume_from.get(key) or 0 for key in totals})
+        patches.append(("run_completion", lambda f: _checkpointed_run_completion(f, checkpoint_path, totals, resume_from)))
+        patches.append(("execute_tool", lambda f: _checkpointed_execute_tool(f, totals)))
+    if budget is not None:
+        patches.append(("run_completion_with_retries", lambda f: _budgeted_run_completion(f, budget, stats)))
+        patches.append(("execute_tool", lambda f: _budgeted_execute_tool(f, budget)))
+    if preprocess_images:
+        patches.append(("read_image", lambda f: preprocessed_read_image(
+            f, max_image_size=max_image_size, cache=vision_cache,
+            stats=vision_stats if vision_stats is not None else new_vision_stats())))
+
+    with ExitStack() as stack:
+        for name, make_replacement in patches:
+            stack.enter_context(_patched(core, name, make_replacement))
+        yield stats
@@ -0,0 +1,333 @@
+"""
+Incremental, cell-cached execution of jupytext notebooks
+
+Each code cell is identified by a hash chain over its source and the sources
+of all code cells before it, so a cell's hash changes whenever anything that
+could affect its result changes. URLs routed through the byte-range proxy
+are hashed as the original URLs, since the proxy's port changes from run to
+run. Outputs of successfully executed cells are cached on disk by that hash.
+
+A kernel that has executed exactly the unchanged prefix of the notebook can
+continue from the first changed cell instead of starting over. A kernel in
+which a cell raised is discarded, since the failed cell may have changed its
+state before raising, so a fixed notebook is run again from a fresh kernel.
+Kernels only
+survive between calls inside a long-lived process (the resident daemon, see
+daemon.py); a one-off call starts a fresh kernel and runs every cell, unless
+all of them are cached.
+"""
+
+from typing import Any, Dict, List, Optional, Tuple
+import hashlib
+import os
+import re
+import subprocess
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+from .cache import DiskCache, cache_enabled, get_cell_output_cache
+from .range_proxy import restore_urls
+
+DEFAULT_TIMEOUT = 600
+DEFAULT_MAX_WARM_KERNELS = 8
+# how often a cancelled call checks whether to stop waiting
+CANCEL_POLL_SECONDS = 0.2
+
+_ANSI_ESCAPE = re.compile(r"\x1b\[[0-9;]*m")
+
+# warm kernels of the current process, keyed by (output path, kernel name)
+_sessions: "OrderedDict[Tuple[str, str], _KernelSession]" = OrderedDict()
+_locks: Dict[Tuple[str, str], threading.Lock] = {}
+_sessions_lock = threading.Lock()
+
+
+def get_max_warm_kernels() -> int:
+    """Number of kernels kept warm at once (DANDI_NOTEBOOK_GEN_MAX_WARM_KERNELS)."""
+    value = os.environ.get("DANDI_NOTEBOOK_GEN_MAX_WARM_KERNELS")
+    return int(value) if value else DEFAULT_MAX_WARM_KERNELS
+
+
+def cell_hashes(sources: List[str], *, kernel_name: str, cwd: str) -> List[str]:
+    """
+    Return the hash chain of a notebook's code cells.
+
+    The hash of cell i covers the kernel, the working directory and the
+    sources of cells 0..i.
+    """
+    h = hashlib.sha256(f"cell-chain-v1\0{kernel_name}\0{cwd}".encode("utf-8")).hexdigest()
+    hashes = []
+    for source in sources:
+        h = hashlib.sha256(f"{h}\0{source}".encode("utf-8")).hexdigest()
+        hashes.append(h)
+    return hashes
+
+
+class _KernelSession:
+    """A running kernel and the hashes of the cells it has executed, in order."""
+
+    def __init__(self, kernel_name: str, cwd: str):
+        from jupyter_client.manager import KernelManager
+        self.km = KernelManager(kernel_name=kernel_name)
+        # the kernel's own stdout/stderr would otherwise end up in ours
+        self.km.start_kernel(cwd=cwd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        self.kc = self.km.client()
+        self.kc.start_channels()
+        try:
+            self.kc.wait_for_ready(timeout=60)
+        except BaseException:
+            self.shutdown()
+            raise
+        self.executed: List[str] = []
+
+    def can_continue(self, hashes: List[str], first_changed: int) -> bool:
+        """Whether the kernel's state is that of an unchanged prefix of the notebook."""
+        n = len(self.executed)
+        return n <= first_changed and self.executed == hashes[:n] and self.km.is_alive()
+
+    def client(self, nb, timeout: Optional[float]):
+        from nbclient import NotebookClient
+        client = NotebookClient(nb, km=self.km, timeout=int(timeout) if timeout is not None else None)
+        client.kc = self.kc
+        client.reset_execution_trackers()
+        return client
+
+    def shutdown(self) -> None:
+        try:
+            self.kc.stop_channels()
+        finally:
+            self.km.shutdown_kernel(now=True)
+
+
+def _interrupt_on_cancel(session: _KernelSession, cancel: threading.Event, done: threading.Event) -> None:
+    """Interrupt the session's running cell once cancel is set, unless done is set first."""
+    while not done.is_set():
+        if cancel.wait(CANCEL_POLL_SECONDS):
+            if not done.is_set():
+                session.km.interrupt_kernel()
+            return
+
+
+def shutdown_kernels() -> None:
+    """Shut down all warm kernels of this process."""
+    with _sessions_lock:
+        sessions = list(_sessions.values())
+        _sessions.clear()
+    for session in sessions:
+        try:
+            session.shutdown()
+        except Exception:
+            pass
+
+
+def _take_session(key: Tuple[str, str]) -> Optional[_KernelSession]:
+    with _sessions_lock:
+        return _sessions.pop(key, None)
+
+
+def _keep_session(key: Tuple[str, str], session: _KernelSession) -> None:
+    with _sessions_lock:
+        _sessions[key] = session
+        evicted = []
+        while len(_sessions) > get_max_warm_kernels():
+            evicted.append(_sessions.popitem(last=False)[1])
+    for s in evicted:
+        s.shutdown()
+
+
+def _key_lock(key: Tuple[str, str]) -> threading.Lock:
+    with _sessions_lock:
+        return _locks.setdefault(key, threading.Lock())
+
+
+def _read_notebook(notebook_path: str):
+    if notebook_path.endswith(".ipynb"):
+        import nbformat
+        return nbformat.read(notebook_path, as_version=4)
+    # jupytext tries to import the `notebook` package; make sure it does not
+    # pick up a notebook.py from the current directory instead
+    saved_path = sys.path[:]
+    sys.path[:] = [p for p in sys.path if os.path.abspath(p or ".") != os.getcwd()]
+    try:
+        import jupytext
+    finally:
+        sys.path[:] = saved_path
+    return jupytext.read(notebook_path)
+
+
+def _renumber(code_cells: List[Any]) -> None:
+    """Number the execution counts 1..n, as a run from scratch would."""
+    for count, cell in enumerate(code_cells, start=1):
+        if cell.get("execution_count") is None:
+            continue
+        cell["execution_count"] = count
+        for output in cell.get("outputs", []):
+            if output.get("output_type") == "execute_result":
+                output["execution_count"] = count
+
+
+def _error_info(cell_index: int, cell: Any, exc: BaseException) -> Dict[str, Any]:
+    for output in cell.get("outputs", []):
+        if output.get("output_type") == "error":
+            return {
+                "cell_index": cell_index,
+                "ename": output.get("ename"),
+                "evalue": output.get("evalue"),
+                "traceback": _ANSI_ESCAPE.sub("", "\n".join(output.get("traceback", []))),
+            }
+    return {"cell_index": cell_index, "ename": type(exc).__name__, "evalue": str(exc), "traceback": ""}
+
+
+def convert_notebook(notebook_path: str, output_path: str) -> str:
+    """Convert a jupytext notebook to .ipynb without executing it."""
+    import nbformat
+    nbformat.write(_read_notebook(notebook_path), output_path)
+    return output_path
+
+
+def execute_notebook(
+    notebook_path: str = "notebook.py",
+    output_path: Optional[str] = None,
+    *,
+    timeout: Optional[float] = DEFAULT_TIMEOUT,
+    kernel_name: str = "python3",
+    use_cache: bool = True,
+    fresh: bool = False,
+    keep_kernel: bool = False,
+    cancel: Optional[threading.Event] = None,
+) -> Dict[str, Any]:
+    """
+    Convert a jupytext notebook to .ipynb and execute it, reusing unchanged cells.
+
+    Execution stops at the first cell that raises. The executed notebook is
+    written either way, as `jupyter execute --inplace` would.
+
+    Parameters
+    ----------
+    notebook_path : str, optional
+        The jupytext (.py) or .ipynb notebook, by default "notebook.py".
+        Cells run in its directory.
+    output_path : str, optional
+        Where to write the executed notebook. Defaults to notebook_path with
+        an .ipynb extension.
+    timeout : float, optional
+        Timeout in seconds for each cell, by default 600. None disables it.
+    kernel_name : str, optional
+        The Jupyter kernel, by default "python3".
+    use_cache : bool, optional
+        Whether to reuse and store cell outputs in the on-disk cache.
+    fresh : bool, optional
+        Ignore cached outputs and warm kernels and run every cell.
+    keep_kernel : bool, optional
+        Keep the kernel running after the call so that the next call for the
+        same notebook can continue from the first changed cell.
+    cancel : threading.Event, optional
+        When set (e.g. by the daemon after its client went away), the running
+        cell is interrupted and the kernel is discarded. A call still waiting
+        for another call on the same notebook raises RuntimeError instead.
+
+    Returns
+    -------
+    Dict[str, Any]
+        The output path, the number of code cells executed and taken from the
+        cache, the kernel used ("none", "new" or "warm"), the elapsed time and
+        the error (cell index, ename, evalue, traceback) or None.
+    """
+    import nbformat
+
+    start_time = time.time()
+    notebook_path = os.path.abspath(notebook_path)
+    if output_path is None:
+        output_path = os.path.splitext(notebook_path)[0] + ".ipynb"
+    output_path = os.path.abspath(output_path)
+    cwd = os.path.dirname(notebook_path)
+
+    nb = _read_notebook(notebook_path)
+    code_cells = [(i, cell) for i, cell in enumerate(nb.cells) if cell.cell_type == "code"]
+    for _, cell in code_cells:
+        cell.outputs = []
+        cell.execution_count = None
+    hashes = cell_hashes([restore_urls(cell.source) for _, cell in code_cells], kernel_name=kernel_name, cwd=cwd)
+
+    cache: Optional[DiskCache] = get_cell_output_cache() if use_cache and cache_enabled() else None
+    cached = [cache.get(h) if cache is not None and not fresh else None for h in hashes]
+    first_changed = next((j for j, c in enumerate(cached) if c is None), len(hashes))
+
+    restored: List[int] = []
+
+    def restore(j: int) -> None:
+        restored.append(j)
+        cell = code_cells[j][1]
+        cell.outputs = [nbformat.from_dict(o) for o in cached[j]["outputs"]]
+        cell.execution_count = cached[j]["execution_count"]
+
+    num_executed = 0
+    kernel = "none"
+    error = None
+    key = (output_path, kernel_name)
+    if first_changed == len(hashes):
+        for j in range(len(hashes)):
+            restore(j)
+    else:
+        lock = _key_lock(key)
+        while not lock.acquire(timeout=CANCEL_POLL_SECONDS):
+            if cancel is not None and cancel.is_set():
+                raise RuntimeError(f"Cancelled while waiting for another execution of {notebook_path}")
+        try:
+            session = _take_session(key) if keep_kernel else None
+            if session is not None and (fresh or not session.can_continue(hashes, first_changed)):
+                session.shutdown()
+                session = None
+            kernel = "warm" if session is not None else "new"
+            if session is None:
+                session = _KernelSession(kernel_name, cwd)
+            alive = True
+            done = threading.Event()
+            if cancel is not None:
+                threading.Thread(target=_interrupt_on_cancel, args=(session, cancel, done), daemon=True).start()
+            try:
+                start_at = len(session.executed)
+                for j in range(start_at):
+                    restore(j)
+                client = session.client(nb, timeout)
+                for j in range(start_at, len(hashes)):
+                    if cancel is not None and cancel.is_set():
+                        break
+                    index, cell = code_cells[j]
+                    try:
+                        client.execute_cell(cell, index)
+                    except Exception as e:
+                        # whatever the cell did before it raised stays in the kernel, and
+                        # after a timeout or crash its state cannot be trusted at all
+                        alive = False
+                        num_executed += 1
+                        error = _error_info(index, cell, e)
+                        break
+                    num_executed += 1
+                    session.executed.append(hashes[j])
+                    if cache is not None:
+                        cache.set(hashes[j], {"outputs": cell.outputs, "execution_count": cell.execution_count})
+            except BaseException:
+                alive = False
+                raise
+            finally:
+                done.set()
+                if keep_kernel and alive and not (cancel is not None and cancel.is_set()):
+                    _keep_session(key, session)
+                else:
+                    session.shutdown()
+        finally:
+            lock.release()
+
+    _renumber([cell for _, cell in code_cells])
+    nbformat.write(nb, output_path)
+    return {
+        "output_path": output_path,
+        "num_code_cells": len(code_cells),
+        "num_executed": num_executed,
+        "num_cached": len(restored),
+        "kernel": kernel,
+        "elapsed_seconds": time.time() - start_time,
+        "error": error,
+    }
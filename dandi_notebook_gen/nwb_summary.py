@@ -0,0 +1,302 @@
+"""
+Token-budgeted summaries of NWB usage scripts
+
+The usage script of an NWB file has a header (imports and the code that
+opens the file) followed by one line per neurodata object, e.g.
+
+    nwb.acquisition["ElectricalSeries"].data # (Dataset) shape (1000, 64); dtype float32
+
+Files with many acquisition/processing objects, units or electrodes produce
+scripts far longer than the agent needs. summarize_usage_script shortens
+such a script to a character budget with these steps, applied in order
+until it fits:
+
+1. collapse sibling objects with the same structure (e.g. one
+   ElectricalSeries per probe) to the first one plus a list of the others
+2. replace values by their shape and dtype, and truncate other values
+3. reduce the script to an outline of the objects down to a given depth,
+   from the deepest that fits up to one level below nwb
+4. truncate the outline
+
+The header is kept as long as it fits; scripts without object lines below
+nwb (e.g. ones that name the file differently) are truncated. The result
+never exceeds the budget. Any object can be shown in full with expand. The
+result only depends on the script and the budget.
+"""
+
+from typing import Dict, Iterator, List, Optional, Tuple
+import os
+import re
+from contextlib import contextmanager
+
+MAX_TOKENS_ENV = "DANDI_NOTEBOOK_GEN_NWB_INFO_MAX_TOKENS"
+CHARS_PER_TOKEN = 4
+# values longer than this are truncated in step 2
+VALUE_CHARS = 40
+# names listed for a group of collapsed siblings
+MAX_LISTED_NAMES = 10
+
+Path = Tuple[str, ...]
+
+_COMPONENT = r"""(?:\.\w+|\[(?:"[^"]*"|'[^']*'|\d+)\])"""
+_EXPR = re.compile(r"^\s*(?:#\s*)?([A-Za-z_]\w*" + _COMPONENT + r"*)")
+_ASSIGN = re.compile(r"^\s*([A-Za-z_]\w*)\s*=\s*([A-Za-z_]\w*" + _COMPONENT + r"*)\s*(?:#.*)?$")
+_ANY_ASSIGN = re.compile(r"^\s*[A-Za-z_]\w*\s*=(?!=)")
+_TYPE_COMMENT = re.compile(r"^(.*?#\s*\([^)]*\))\s*(.*)$")
+_SHAPE_DTYPE = re.compile(r"shape \([^)]*\)|dtype [\w\[\]<>.]+")
+
+
+def get_default_max_chars() -> Optional[int]:
+    """Return the default budget in characters (DANDI_NOTEBOOK_GEN_NWB_INFO_MAX_TOKENS), if any."""
+    value = os.environ.get(MAX_TOKENS_ENV)
+    return int(value) * CHARS_PER_TOKEN if value else None
+
+
+@contextmanager
+def default_nwb_info_budget(max_tokens: int) -> Iterator[None]:
+    """Set the default nwb-file-info budget for the duration of a with block."""
+    previous = os.environ.get(MAX_TOKENS_ENV)
+    os.environ[MAX_TOKENS_ENV] = str(max_tokens)
+    try:
+        yield
+    finally:
+        if previous is None:
+            os.environ.pop(MAX_TOKENS_ENV, None)
+        else:
+            os.environ[MAX_TOKENS_ENV] = previous
+
+
+def _split(expr: str) -> List[str]:
+    root = re.match(r"[A-Za-z_]\w*", expr).group(0)
+    components = [root]
+    for m in re.finditer(_COMPONENT, expr[len(root):]):
+        c = m.group(0)
+        components.append(c[1:] if c.startswith(".") else c.replace("'", '"'))
+    return components
+
+
+def _resolve(expr: str, aliases: Dict[str, Path]) -> Optional[Path]:
+    components = _split(expr)
+    if components[0] == "nwb":
+        return tuple(components)
+    if components[0] in aliases:
+        return aliases[components[0]] + tuple(components[1:])
+    return None
+
+
+def format_path(path: Path) -> str:
+    """Render an object path, e.g. ("nwb", "acquisition", '["x"]') -> nwb.acquisition["x"]."""
+    return path[0] + "".join(c if c.startswith("[") else f".{c}" for c in path[1:])
+
+
+def _parse(script: str) -> Tuple[List[str], List[Tuple[str, Path]], Dict[str, Path]]:
+    """Split a script into its header and (line, object path) pairs."""
+    header: List[str] = []
+    body: List[Tuple[str, Path]] = []
+    aliases: Dict[str, Path] = {}
+    current: Optional[Path] = None
+    for text in script.splitlines():
+        path = None
+        m = _ASSIGN.match(text)
+        if m:
+            # e.g. `acquisition = nwb.acquisition`; later lines may use the alias
+            path = _resolve(m.group(2), aliases)
+            if path is not None:
+                aliases[m.group(1)] = path
+        elif _ANY_ASSIGN.match(text):
+            # other assignments, e.g. `nwb = io.read()`, are not object lines
+            pass
+        else:
+            m = _EXPR.match(text)
+            if m:
+                path = _resolve(m.group(1), aliases)
+        if path is not None:
+            current = path
+        if current is None:
+            header.append(text)
+        else:
+            # other lines (blank lines, hints) go with the object before them
+            body.append((text, current))
+    return header, body, aliases
+
+
+def _type_of(text: str) -> str:
+    m = re.search(r"#\s*\(([^)]*)\)", text)
+    return m.group(1) if m else ""
+
+
+def _is_under(path: Path, prefix: Path) -> bool:
+    return path[:len(prefix)] == prefix
+
+
+def _collapse(body: List[Tuple[str, Path]]) -> Tuple[List[Tuple[str, Path]], List[Path]]:
+    """Collapse siblings with the same structure to the first of them."""
+    children: Dict[Path, List[Path]] = {}
+    signatures: Dict[Path, set] = {}
+    for text, path in body:
+        for depth in range(1, len(path)):
+            parent, child = path[:depth], path[:depth + 1]
+            siblings = children.setdefault(parent, [])
+            if child not in siblings:
+                siblings.append(child)
+            signatures.setdefault(child, set()).add((path[depth + 1:], _type_of(text)))
+    hidden: Dict[Path, None] = {}
+    notes: Dict[Path, List[Path]] = {}
+    for parent, siblings in children.items():
+        groups: Dict[tuple, List[Path]] = {}
+        for child in siblings:
+            name = child[-1]
+            # subscripted siblings are compared by structure alone; attributes
+            # only if their names differ just in digits (e.g. unit_0, unit_1)
+            key = "[]" if name.startswith("[") else re.sub(r"\d+", "#", name)
+            groups.setdefault((key, frozenset(signatures[child])), []).append(child)
+        for members in groups.values():
+            if len(members) > 1:
+                notes[members[0]] = members[1:]
+                hidden.update(dict.fromkeys(members[1:]))
+    kept = [(text, path) for text, path in body if not any(path[:d] in hidden for d in range(2, len(path) + 1))]
+    # add the note for each group after the last line of its first member
+    last_line: Dict[Path, int] = {}
+    for i, (_, path) in enumerate(kept):
+        for depth in range(2, len(path) + 1):
+            if path[:depth] in notes:
+                last_line[path[:depth]] = i
+    after: Dict[int, List[Path]] = {}
+    for first, i in last_line.items():
+        after.setdefault(i, []).append(first)
+    result: List[Tuple[str, Path]] = []
+    for i, (text, path) in enumerate(kept):
+        result.append((text, path))
+        for first in after.get(i, []):
+            others = notes[first]
+            names = ", ".join(format_path(p) for p in others[:MAX_LISTED_NAMES])
+            if len(others) > MAX_LISTED_NAMES:
+                names += f", ... ({len(others) - MAX_LISTED_NAMES} more)"
+            result.append((f"# ... and {len(others)} more with the same structure as {format_path(first)}: {names}", first))
+    return result, list(hidden)
+
+
+def _strip_values(body: List[Tuple[str, Path]]) -> List[Tuple[str, Path]]:
+    """Keep the type, shape and dtype of each object instead of its value."""
+    result = []
+    for text, path in body:
+        m = _TYPE_COMMENT.match(text)
+        if m and m.group(2):
+            shape_dtype = _SHAPE_DTYPE.findall(m.group(2))
+            if shape_dtype:
+                text = f"{m.group(1)} {'; '.join(shape_dtype)}"
+            elif len(m.group(2)) > VALUE_CHARS:
+                text = f"{m.group(1)} {m.group(2)[:VALUE_CHARS - 3]}..."
+        result.append((text, path))
+    return result
+
+
+def _outline(body: List[Tuple[str, Path]], depth: int) -> Tuple[List[Tuple[str, Path]], List[Path]]:
+    """Keep only the objects at most depth levels below nwb."""
+    hidden_counts: Dict[Path, int] = {}
+    for _, path in body:
+        if len(path) - 1 > depth:
+            ancestor = path[:depth + 1]
+            hidden_counts[ancestor] = hidden_counts.get(ancestor, 0) + 1
+    result = []
+    annotated = set()
+    for text, path in body:
+        if len(path) - 1 > depth:
+            continue
+        if path in hidden_counts and path not in annotated and _type_of(text):
+            annotated.add(path)
+            text = f"{text} [+{hidden_counts[path]} lines hidden]"
+        result.append((text, path))
+    return result, list(hidden_counts)
+
+
+def _join(header: List[str], body: List[Tuple[str, Path]], footer: Optional[str] = None) -> str:
+    lines = header + [text for text, _ in body]
+    if footer:
+        lines.append(footer)
+    return "\n".join(lines)
+
+
+def _footer(max_chars: int, steps: List[str], hidden: List[Path]) -> str:
+    footer = f"# Summarized to fit {max_chars} characters ({', '.join(steps)})."
+    if hidden:
+        footer += f" Show an object in full with --expand PATH, e.g. --expand '{format_path(hidden[0])}'"
+    return footer
+
+
+def _truncate(text: str, max_chars: int, footer: str) -> str:
+    """Cut text at a line boundary so that it and the footer fit in max_chars."""
+    if len(footer) + 1 >= max_chars:
+        return text[:max_chars]
+    limit = max_chars - len(footer) - 1
+    cut = text.rfind("\n", 0, limit + 1)
+    if cut <= 0:
+        cut = limit
+    return text[:cut] + "\n" + footer
+
+
+def summarize_usage_script(script: str, *, max_chars: Optional[int] = None, expand: Optional[str] = None) -> str:
+    """
+    Shorten an NWB usage script to fit a budget.
+
+    Parameters
+    ----------
+    script : str
+        The script returned by nwb_file_info.
+    max_chars : int, optional
+        The budget in characters. None returns the script (or the expanded
+        object) unchanged.
+    expand : str, optional
+        Only keep the header and the object at this path and everything
+        below it, e.g. 'nwb.acquisition["ElectricalSeries"]'. Aliases
+        assigned in the script can be used too.
+
+    Returns
+    -------
+    str
+        The summarized script.
+    """
+    if not expand and (max_chars is None or len(script) <= max_chars):
+        return script
+    header, body, aliases = _parse(script)
+    if expand:
+        m = _EXPR.match(expand.strip())
+        path = _resolve(m.group(1), aliases) if m and m.group(1) == expand.strip() else None
+        if path is None:
+            raise ValueError(f"Not an object path: {expand}")
+        # keep the assignments of aliases the object's lines may use
+        body = [(text, p) for text, p in body if _is_under(p, path) or (_is_under(path, p) and _ASSIGN.match(text))]
+        if not any(_is_under(p, path) for _, p in body):
+            top_level = sorted({format_path(p[:2]) for _, p in _parse(script)[1] if len(p) > 1})
+            raise ValueError(f"No object {format_path(path)} in the usage script; top-level objects: {', '.join(top_level)}")
+    text = _join(header, body)
+    if max_chars is None or len(text) <= max_chars:
+        return text
+    if not body:
+        # nothing to collapse or outline
+        return _truncate(text, max_chars, _footer(max_chars, ["truncated"], []))
+
+    steps = ["collapsed repeated objects"]
+    collapsed, hidden = _collapse(body)
+    text = _join(header, collapsed, _footer(max_chars, steps, hidden))
+    if len(text) <= max_chars:
+        return text
+
+    steps.append("values replaced by shapes and dtypes")
+    stripped = _strip_values(collapsed)
+    text = _join(header, stripped, _footer(max_chars, steps, hidden))
+    if len(text) <= max_chars:
+        return text
+
+    outline, outline_hidden = stripped, []
+    max_depth = max(len(path) - 1 for _, path in stripped)
+    for depth in range(max_depth - 1, 0, -1):
+        outline, outline_hidden = _outline(stripped, depth)
+        steps_with_depth = steps + [f"outline to depth {depth}"]
+        text = _join(header, outline, _footer(max_chars, steps_with_depth, outline_hidden + hidden))
+        if len(text) <= max_chars:
+            return text
+
+    # even the shallowest outline is too long
+    footer = _footer(max_chars, steps + ["outline to depth 1", "truncated"], outline_hidden + hidden)
+    return _truncate(_join(header, outline), max_chars, footer)
@@ -0,0 +1,175 @@
+"""
+Prefetch stage for notebook generation
+
+Steps 1-3 of the instructions always run the same three tools (dandiset-info,
+dandiset-assets, nwb-file-info on one file). Each of those steps costs the
+agent a full model round trip. The prefetch stage runs them up front,
+concurrently where possible, and hands the results to the agent either
+inline in the instructions or as files in the working directory.
+"""
+
+from typing import Any, Dict, List, Optional
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from . import tools
+from .nwb_summary import get_default_max_chars, summarize_usage_script
+
+PREFETCH_DIR = "prefetch"
+# number of assets included in the prefetched listing
+MAX_LISTED_ASSETS = 50
+# tool calls (and therefore model round trips) the agent no longer has to make
+TOOL_CALLS_SAVED = 3
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count of a text (about four characters per token)."""
+    return len(text) // 4
+
+
+def choose_representative_nwb_file(assets: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """
+    Choose a small but representative NWB file from an asset listing.
+
+    The file at the 25th percentile of size is chosen. That avoids both the
+    largest files, which are slow to inspect, and the smallest ones, which
+    are often stubs without the interesting data. Ties are broken by path so
+    the choice is deterministic.
+
+    Returns
+    -------
+    Dict[str, Any] or None
+        The chosen asset, or None if there are no NWB files.
+    """
+    nwb_assets = sorted(
+        (a for a in assets if a.get("path", "").endswith(".nwb")),
+        key=lambda a: (a.get("size", 0), a.get("path", "")),
+    )
+    if not nwb_assets:
+        return None
+    return nwb_assets[(len(nwb_assets) - 1) // 4]
+
+
+def prefetch_context(dandiset_id: str, working_dir: str, *, version: str = "draft") -> Dict[str, Any]:
+    """
+    Fetch the Dandiset metadata, asset listing and one NWB file's usage script.
+
+    dandiset_info runs concurrently with the asset listing and the
+    nwb_file_info call that depends on it. The results are written to
+    working_dir/prefetch/.
+
+    Parameters
+    ----------
+    dandiset_id : str
+        The ID of the Dandiset.
+    working_dir : str
+        The working directory of the run.
+    version : str, optional
+        The version of the Dandiset, by default "draft".
+
+    Returns
+    -------
+    Dict[str, Any]
+        Report with the prefetched texts ("texts"), the written files, the
+        chosen NWB file URL and timings.
+    """
+    start_time = time.time()
+    durations: Dict[str, float] = {}
+
+    def timed(name, func, *args, **kwargs):
+        t0 = time.time()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            durations[name] = time.time() - t0
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        info_future = executor.submit(timed, "dandiset_info", tools.dandiset_info, dandiset_id, version=version)
+        assets = timed("dandiset_assets", lambda: list(tools.iter_dandiset_assets(dandiset_id, version=version)))
+        chosen = choose_representative_nwb_file(assets)
+        nwb_file_url = tools.asset_download_url(chosen["asset_id"]) if chosen else None
+        usage_script = timed("nwb_file_info", tools.nwb_file_info, dandiset_id, nwb_file_url) if nwb_file_url else None
+        info = info_future.result()
+
+    listing = {"count": len(assets), "results": assets[:MAX_LISTED_ASSETS]}
+    texts = {
+        "dandiset_info.json": json.dumps(info, indent=2),
+        "dandiset_assets.json": json.dumps(listing, indent=2),
+    }
+    if usage_script is not None:
+        # the same budget the agent's own nwb-file-info calls get
+        texts["nwb_file_info.py"] = summarize_usage_script(usage_script, max_chars=get_default_max_chars())
+
+    prefetch_dir = os.path.join(working_dir, PREFETCH_DIR)
+    os.makedirs(prefetch_dir, exist_ok=True)
+    for name, text in texts.items():
+        with open(os.path.join(prefetch_dir, name), "w") as f:
+            f.write(text)
+
+    return {
+        "texts": texts,
+        "files": [f"{PREFETCH_DIR}/{name}" for name in texts],
+        "nwb_file_url": nwb_file_url,
+        "num_assets": len(assets),
+        "elapsed_seconds": time.time() - start_time,
+        "sequential_seconds": sum(durations.values()),
+        "durations": durations,
+    }
+
+
+def render_prefetch_section(dandiset_id: str, report: Dict[str, Any], mode: str) -> str:
+    """
+    Render the instructions section that hands the prefetched results to the agent.
+
+    Parameters
+    ----------
+    dandiset_id : str
+        The ID of the Dandiset.
+    report : Dict[str, Any]
+        The report returned by prefetch_context.
+    mode : str
+        "inline" to include the results in the section, or "files" to point
+        the agent at the files in the working directory.
+    """
+    texts = report["texts"]
+    lines = [
+        "",
+        "## Prefetched information",
+        "",
+        f"Steps 1-3 of the plan have already been done for you. The output of `dandi-notebook-gen-tools dandiset-info {dandiset_id}`, "
+        f"the asset listing (the first {MAX_LISTED_ASSETS} of {report['num_assets']} assets) and the output of "
+        f"`dandi-notebook-gen-tools nwb-file-info` for {report['nwb_file_url']} are given below. "
+        "Do not rerun these commands; only use the tools again if you need more assets or information about another NWB file.",
+        "",
+    ]
+    if mode == "inline":
+        for name, text in texts.items():
+            lang = "python" if name.endswith(".py") else "json"
+            lines += [f"### {name}", "", f"```{lang}", text, "```", ""]
+    else:
+        lines += ["The results are in these files in the working directory:", ""]
+        lines += [f"- {f}" for f in report["files"]]
+        lines.append("")
+    return "\n".join(lines)
+
+
+def estimate_savings(instructions: str, report: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Estimate what the prefetch saved compared to the agent doing steps 1-3 itself.
+
+    Without the prefetch, each of the three tool calls is a model round trip
+    whose prompt holds the instructions plus the results gathered so far.
+    Those prompts are the estimated prompt tokens saved. The time saved is
+    measured only for the tool calls themselves (sequential minus
+    concurrent); the avoided model latency is not measured.
+    """
+    base_tokens = estimate_tokens(instructions)
+    result_tokens = [estimate_tokens(t) for t in report["texts"].values()]
+    prompt_tokens_saved = sum(base_tokens + sum(result_tokens[:k]) for k in range(TOOL_CALLS_SAVED))
+    return {
+        "tool_calls_saved": TOOL_CALLS_SAVED,
+        "estimated_prompt_tokens_saved": prompt_tokens_saved,
+        "tool_seconds_saved": max(0.0, report["sequential_seconds"] - report["elapsed_seconds"]),
+    }
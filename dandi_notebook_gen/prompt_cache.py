@@ -0,0 +1,176 @@
+"""
+Provider-side prompt caching for the agent's model calls
+
+Every turn of the agent re-sends the whole conversation: minicline's system
+prompt, the task instructions and all turns so far. Providers cache prompt
+prefixes, so most of those tokens can be billed (and processed) at the
+cached rate, as long as the prefix is byte-for-byte the same:
+
+- The instructions are split into a prefix that is the same for every
+  Dandiset and a short per-run suffix (see generator.build_instructions).
+- minicline's system prompt embeds the working directory, which differs
+  between runs. The working directory is also given in the
+  environment_details of the first user message, so in the system prompt it
+  is replaced by ".".
+- Models that need explicit cache breakpoints (Anthropic and Gemini models
+  on OpenRouter) get cache_control hints on the system prompt, on the end of
+  the stable instructions prefix and on the last message. Other providers
+  cache prefixes automatically.
+
+run_completion replaces minicline's OpenRouter call with one that sends
+these hints and asks for usage accounting, so that cached and uncached
+prompt tokens (and the cost) can be recorded.
+"""
+
+from typing import Any, Dict, List, Optional, Tuple
+import copy
+import os
+
+OPENROUTER_URL = "https://openrouter.ai/api/v1/chat/completions"
+# models that only cache at explicit cache_control breakpoints
+CACHE_CONTROL_MODEL_PREFIXES = ("anthropic/", "google/gemini")
+# completions can take minutes; the tools' default read timeout is too short
+COMPLETION_READ_TIMEOUT = 600.0
+
+_EPHEMERAL = {"type": "ephemeral"}
+
+
+def new_completion_stats() -> Dict[str, Any]:
+    """Return zeroed counters for the model calls of a run."""
+    return {
+        "num_completions": 0,
+        "prompt_tokens": 0,
+        "cached_prompt_tokens": 0,
+        "cache_write_tokens": 0,
+        "completion_tokens": 0,
+        "cost": 0.0,
+    }
+
+
+def supports_cache_control(model: str) -> bool:
+    """Whether the model needs explicit cache_control breakpoints."""
+    return model.startswith(CACHE_CONTROL_MODEL_PREFIXES)
+
+
+def _blocks(content: Any) -> List[Dict[str, Any]]:
+    if isinstance(content, str):
+        return [{"type": "text", "text": content}]
+    return [dict(block) for block in content]
+
+
+def add_cache_hints(
+    messages: List[Dict[str, Any]],
+    *,
+    model: str,
+    stable_prefix: Optional[str] = None,
+    cwd: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Return a copy of messages prepared for prefix caching.
+
+    Parameters
+    ----------
+    messages : List[Dict[str, Any]]
+        The conversation as built by minicline. It is not modified.
+    model : str
+        The model; cache_control breakpoints are only added where needed.
+    stable_prefix : str, optional
+        The part of the task instructions that is the same across runs. The
+        first user message is split after it, so it can be cached on its own.
+    cwd : str, optional
+        The working directory, replaced by "." in the system prompt.
+
+    Returns
+    -------
+    List[Dict[str, Any]]
+        The messages to send.
+    """
+    hints = supports_cache_control(model)
+    result = [dict(m) for m in messages]
+    if result and result[0].get("role") == "system" and isinstance(result[0].get("content"), str):
+        text = result[0]["content"]
+        if cwd:
+            text = text.replace(cwd, ".")
+        result[0]["content"] = [{"type": "text", "text": text, "cache_control": _EPHEMERAL}] if hints else text
+    first_user = next((m for m in result if m.get("role") == "user"), None)
+    if first_user is not None and stable_prefix:
+        blocks = _blocks(first_user["content"])
+        text = blocks[0].get("text", "") if blocks else ""
+        start = text.find(stable_prefix)
+        if blocks and start >= 0 and hints:
+            end = start + len(stable_prefix)
+            blocks[0:1] = [
+                {"type": "text", "text": text[:end], "cache_control": _EPHEMERAL},
+                {"type": "text", "text": text[end:]},
+            ]
+            first_user["content"] = blocks
+    if hints and len(result) > 1:
+        last = result[-1]
+        blocks = _blocks(last["content"])
+        if blocks:
+            # a copy, so that the breakpoint does not stay on this message in later turns
+            blocks[-1] = {**copy.deepcopy(blocks[-1]), "cache_control": _EPHEMERAL}
+            last["content"] = blocks
+    return result
+
+
+def parse_usage(usage: Dict[str, Any]) -> Tuple[int, int, float]:
+    """Return (cached prompt tokens, cache write tokens, cost) from a usage object."""
+    details = usage.get("prompt_tokens_details") or {}
+    cached = details.get("cached_tokens") or usage.get("cache_read_input_tokens") or 0
+    written = details.get("cache_write_tokens") or usage.get("cache_creation_input_tokens") or 0
+    return int(cached), int(written), float(usage.get("cost") or 0.0)
+
+
+def run_completion(
+    messages: List[Dict[str, Any]],
+    *,
+    model: str,
+    stats: Optional[Dict[str, Any]] = None,
+    stable_prefix: Optional[str] = None,
+    cwd: Optional[str] = None,
+) -> Tuple[str, List[Dict[str, Any]], int, int]:
+    """
+    Drop-in replacement for minicline's OpenRouter run_completion.
+
+    Sends the messages with cache hints (see add_cache_hints) and usage
+    accounting, and adds the tokens and cost of the call to stats. Returns
+    the same (content, messages, prompt tokens, completion tokens) tuple as
+    minicline, with the unmodified messages.
+    """
+    from .transport import get_timeout, post_json
+    api_key = os.getenv("OPENROUTER_API_KEY")
+    if not api_key:
+        raise ValueError("OPENROUTER_API_KEY environment variable not set")
+    headers = {
+        "Authorization": f"Bearer {api_key}",
+        "HTTP-Referer": "https://neurosift.app",
+        "Content-Type": "application/json"
+    }
+    payload = {
+        "model": model,
+        "messages": add_cache_hints(messages, model=model, stable_prefix=stable_prefix, cwd=cwd),
+        "usage": {"include": True},
+    }
+    print(f"Using model: {model}")
+    print(f"Num. messages in conversation: {len(messages)}")
+    # minicline's run_completion_with_retries retries failed calls; retrying here
+    # too would multiply the wait, and a call that timed out may have been billed
+    response = post_json(OPENROUTER_URL, payload, headers=headers, timeout=(get_timeout()[0], COMPLETION_READ_TIMEOUT),
+                         max_retries=0)
+    if response.status_code != 200:
+        raise RuntimeError(f"OpenRouter API request failed: {response.text}")
+    completion = response.json()
+    usage = completion.get("usage") or {}
+    prompt_tokens = int(usage.get("prompt_tokens", 0))
+    completion_tokens = int(usage.get("completion_tokens", 0))
+    cached, written, cost = parse_usage(usage)
+    if stats is not None:
+        stats["num_completions"] += 1
+        stats["prompt_tokens"] += prompt_tokens
+        stats["cached_prompt_tokens"] += cached
+        stats["cache_write_tokens"] += written
+        stats["completion_tokens"] += completion_tokens
+        stats["cost"] += cost
+    content = completion["choices"][0]["message"].get("content") or ""
+    return content, list(messages) + [{"role": "assistant", "content": content}], prompt_tokens, completion_tokens
@@ -0,0 +1,321 @@
+"""
+Local caching proxy for HTTP range reads of remote NWB and LINDI files
+
+Exploratory scripts, nwb_file_info and the notebook execution all read the
+same remote files in separate processes. While generate_notebook runs, it
+starts this proxy and exports its address as DANDI_NOTEBOOK_GEN_RANGE_PROXY.
+A URL such as
+
+    https://api.dandiarchive.org/api/assets/ID/download/
+
+is then routed through the proxy as
+
+    http://127.0.0.1:PORT/https/api.dandiarchive.org/api/assets/ID/download/
+
+The proxy serves range requests from the on-disk block cache
+(cache.BlockCache) and fetches only the missing blocks from the original
+URL. LINDI JSON files are rewritten as they are served, so that the chunk
+URLs they reference go through the proxy too. Rewritten URLs are restored in
+the final notebook.
+"""
+
+from typing import Dict, Iterator, List, Optional, Tuple
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from .cache import BlockCache, get_byte_range_cache
+
+PROXY_ENV = "DANDI_NOTEBOOK_GEN_RANGE_PROXY"
+# missing blocks are fetched in runs of at most this many blocks per request
+MAX_BLOCKS_PER_REQUEST = 16
+# presigned redirect targets (e.g. S3 URLs of DANDI assets) are reused for this long
+REDIRECT_TTL_SECONDS = 300
+
+_QUOTED_URL = re.compile(r"""(["'])(https?)://""")
+
+
+def get_proxy_url() -> Optional[str]:
+    """Return the address of the range proxy of the current run, if any."""
+    return os.environ.get(PROXY_ENV) or None
+
+
+def proxied_url(url: str, proxy_url: Optional[str] = None) -> str:
+    """Route an http(s) URL through the proxy (unchanged if there is no proxy)."""
+    proxy_url = proxy_url or get_proxy_url()
+    if not proxy_url or not url.startswith(("http://", "https://")) or url.startswith(proxy_url):
+        return url
+    scheme, rest = url.split("://", 1)
+    return f"{proxy_url}/{scheme}/{rest}"
+
+
+def rewrite_urls(text: str, proxy_url: Optional[str] = None) -> str:
+    """Route every quoted http(s) URL in a script or JSON document through the proxy."""
+    proxy_url = proxy_url or get_proxy_url()
+    if not proxy_url:
+        return text
+    return _QUOTED_URL.sub(lambda m: f"{m.group(1)}{proxy_url}/{m.group(2)}/", text)
+
+
+def restore_urls(text: str, proxy_url: Optional[str] = None) -> str:
+    """Undo proxied_url/rewrite_urls for every URL in text."""
+    proxy_url = proxy_url or get_proxy_url()
+    if not proxy_url:
+        return text
+    return re.sub(re.escape(proxy_url) + r"/(https?)/", r"\1://", text)
+
+
+class _Upstream:
+    """Fetches byte ranges of remote files and remembers redirect targets."""
+
+    def __init__(self):
+        self._redirects: Dict[str, Tuple[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def _target(self, url: str) -> str:
+        with self._lock:
+            entry = self._redirects.get(url)
+        if entry and time.time() - entry[1] < REDIRECT_TTL_SECONDS:
+            return entry[0]
+        return url
+
+    def fetch(self, url: str, start: int, end: int) -> Tuple[bytes, int]:
+        """
+        Fetch bytes start..end (inclusive) of a remote file.
+
+        Returns the data and the total size of the file. If the server
+        ignores the range, the whole file is returned with start 0.
+        """
+        from .transport import request
+        target = self._target(url)
+        response = request("GET", target, headers={"Range": f"bytes={start}-{end}"})
+        if response.status_code in (401, 403) and target != url:
+            # the presigned redirect target expired
+            target = url
+            response = request("GET", target, headers={"Range": f"bytes={start}-{end}"})
+        if response.history:
+            with self._lock:
+                self._redirects[url] = (response.url, time.time())
+        if response.status_code == 206:
+            m = re.match(r"bytes (\d+)-(\d+)/(\d+)", response.headers.get("Content-Range", ""))
+            if not m or int(m.group(1)) != start:
+                raise RuntimeError(f"Unexpected Content-Range from {url}: {response.headers.get('Content-Range')}")
+            return response.content, int(m.group(3))
+        if response.status_code == 200:
+            return response.content, len(response.content)
+        raise RuntimeError(f"Failed to fetch {url}: HTTP {response.status_code}")
+
+
+class RangeProxy:
+    """
+    Threaded HTTP server that serves remote files from the block cache.
+
+    Parameters
+    ----------
+    cache : BlockCache, optional
+        Defaults to get_byte_range_cache().
+    """
+
+    def __init__(self, cache: Optional[BlockCache] = None):
+        self.cache = cache if cache is not None else get_byte_range_cache()
+        self.upstream = _Upstream()
+        self.stats = {"requests": 0, "blocks_hit": 0, "blocks_fetched": 0, "upstream_requests": 0, "bytes_served": 0}
+        self._stats_lock = threading.Lock()
+        self._httpd: Optional[ThreadingHTTPServer] = None
+
+    def _count(self, **increments: int) -> None:
+        with self._stats_lock:
+            for name, value in increments.items():
+                self.stats[name] += value
+
+    @property
+    def url(self) -> str:
+        assert self._httpd is not None, "proxy is not running"
+        return f"http://127.0.0.1:{self._httpd.server_address[1]}"
+
+    def start(self) -> "RangeProxy":
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), _ProxyHandler)
+        self._httpd.daemon_threads = True
+        self._httpd.proxy = self  # type: ignore[attr-defined]
+        threading.Thread(target=self._httpd.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
+
+    def __enter__(self) -> "RangeProxy":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def _store(self, url: str, first_block: int, data: bytes) -> None:
+        bs = self.cache.block_size
+        for k in range(0, len(data), bs):
+            self.cache.set_block(url, first_block + k // bs, data[k:k + bs])
+
+    def size(self, url: str) -> int:
+        """Return the size of the remote file, fetching its first block if needed."""
+        size = self.cache.get_size(url)
+        if size is None:
+            data, size = self.upstream.fetch(url, 0, self.cache.block_size - 1)
+            self._count(upstream_requests=1, blocks_fetched=1)
+            self.cache.set_size(url, size)
+            self._store(url, 0, data)
+        return size
+
+    def read(self, url: str, start: int, end: int) -> bytes:
+        """Return bytes start..end (inclusive) of the remote file."""
+        bs = self.cache.block_size
+        first, last = start // bs, end // bs
+        blocks: Dict[int, bytes] = {}
+        missing: List[int] = []
+        for index in range(first, last + 1):
+            data = self.cache.get_block(url, index)
+            if data is None:
+                missing.append(index)
+            else:
+                blocks[index] = data
+        self._count(blocks_hit=len(blocks))
+        # fetch contiguous runs of missing blocks with one request each
+        runs: List[List[int]] = []
+        for index in missing:
+            if runs and runs[-1][-1] == index - 1 and len(runs[-1]) < MAX_BLOCKS_PER_REQUEST:
+                runs[-1].append(index)
+            else:
+                runs.append([index])
+        for run in runs:
+            data, size = self.upstream.fetch(url, run[0] * bs, (run[-1] + 1) * bs - 1)
+            self._count(upstream_requests=1, blocks_fetched=len(run))
+            if len(data) == size and run[0] > 0:
+                # the server ignored the range and sent the whole file
+                data = data[run[0] * bs:]
+            self._store(url, run[0], data)
+            for k, index in enumerate(run):
+                blocks[index] = data[k * bs:(k + 1) * bs]
+        joined = b"".join(blocks[index] for index in range(first, last + 1))
+        return joined[start - first * bs:end - first * bs + 1]
+
+    def iter_read(self, url: str, start: int, end: int) -> Iterator[bytes]:
+        """Like read, in pieces of at most MAX_BLOCKS_PER_REQUEST blocks."""
+        step = self.cache.block_size * MAX_BLOCKS_PER_REQUEST
+        for offset in range(start, end + 1, step):
+            yield self.read(url, offset, min(end, offset + step - 1))
+
+
+def _parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    m = re.match(r"bytes=(\d*)-(\d*)$", header.strip())
+    if not m or not (m.group(1) or m.group(2)):
+        return None
+    if m.group(1):
+        start = int(m.group(1))
+        end = min(int(m.group(2)), size - 1) if m.group(2) else size - 1
+    else:
+        start, end = max(0, size - int(m.group(2))), size - 1
+    return start, end
+
+
+class _ProxyHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+        pass
+
+    def _original_url(self) -> Optional[str]:
+        m = re.match(r"/(https?)/(.+)$", self.path)
+        return f"{m.group(1)}://{m.group(2)}" if m else None
+
+    def _send_error(self, status: int, message: str) -> None:
+        body = message.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "text/plain")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_HEAD(self):
+        self._serve(head=True)
+
+    def do_GET(self):
+        self._serve(head=False)
+
+    def _serve(self, head: bool) -> None:
+        proxy: RangeProxy = self.server.proxy  # type: ignore[attr-defined]
+        proxy._count(requests=1)
+        url = self._original_url()
+        if url is None:
+            self._send_error(404, f"Not a proxied URL: {self.path}")
+            return
+        try:
+            if url.split("?")[0].endswith(".lindi.json"):
+                # served whole and rewritten, so that the chunks it references are proxied too
+                size = proxy.size(url)
+                content = rewrite_urls(b"".join(proxy.iter_read(url, 0, size - 1)).decode("utf-8"), proxy.url).encode("utf-8")
+                self._serve_bytes(content, head)
+                return
+            size = proxy.size(url)
+            byte_range = _parse_range(self.headers.get("Range", ""), size)
+            start, end = byte_range if byte_range else (0, size - 1)
+            if start >= size:
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{size}")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            pieces = [] if head else list(proxy.iter_read(url, start, end))
+        except Exception as e:
+            self._send_error(502, f"{type(e).__name__}: {e}")
+            return
+        self.send_response(206 if byte_range else 200)
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Content-Length", str(end - start + 1))
+        if byte_range:
+            self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+        self.end_headers()
+        for piece in pieces:
+            self.wfile.write(piece)
+            proxy._count(bytes_served=len(piece))
+
+    def _serve_bytes(self, content: bytes, head: bool) -> None:
+        proxy: RangeProxy = self.server.proxy  # type: ignore[attr-defined]
+        byte_range = _parse_range(self.headers.get("Range", ""), len(content))
+        start, end = byte_range if byte_range else (0, len(content) - 1)
+        self.send_response(206 if byte_range else 200)
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(end - start + 1))
+        if byte_range:
+            self.send_header("Content-Range", f"bytes {start}-{end}/{len(content)}")
+        self.end_headers()
+        if not head:
+            self.wfile.write(content[start:end + 1])
+            proxy._count(bytes_served=end - start + 1)
+
+
+@contextmanager
+def running_range_proxy() -> Iterator[RangeProxy]:
+    """
+    Run a range proxy for the duration of a with block.
+
+    Its address is exported as DANDI_NOTEBOOK_GEN_RANGE_PROXY, so that
+    processes started inside the block (e.g. dandi-notebook-gen-tools
+    nwb-file-info) route their URLs through it.
+    """
+    previous = os.environ.get(PROXY_ENV)
+    with RangeProxy() as proxy:
+        os.environ[PROXY_ENV] = proxy.url
+        try:
+            yield proxy
+        finally:
+            if previous is None:
+                os.environ.pop(PROXY_ENV, None)
+            else:
+                os.environ[PROXY_ENV] = previous
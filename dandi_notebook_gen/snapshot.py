@@ -0,0 +1,210 @@
+"""
+Offline snapshot bundles of a Dandiset
+
+create_snapshot captures everything the tools fetch for one version of a
+Dandiset into a single gzip-compressed JSON file:
+
+- the result of dandiset_info
+- the full asset listing
+- the nwb_file_info usage scripts of selected NWB files
+
+When DANDI_NOTEBOOK_GEN_SNAPSHOT is set to the path of a bundle,
+dandiset_info, dandiset_assets (including the filters, --all and --summary)
+and nwb_file_info are served from it and never touch the network. Requests
+that the bundle cannot answer (another Dandiset or version, an NWB file
+that was not captured) fail with an error naming what it contains.
+Requests for the default version ("draft") are answered with the version
+that was captured.
+"""
+
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+import gzip
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+SNAPSHOT_ENV = "DANDI_NOTEBOOK_GEN_SNAPSHOT"
+SNAPSHOT_FORMAT = "dandi-notebook-gen-snapshot"
+SNAPSHOT_FORMAT_VERSION = 1
+# NWB files captured by default, chosen as in prefetch.choose_representative_nwb_file
+DEFAULT_MAX_FILES = 10
+
+_loaded: Dict[str, Tuple[float, "Snapshot"]] = {}
+_loaded_lock = threading.Lock()
+
+
+def get_snapshot_path() -> Optional[str]:
+    """Return the path of the snapshot bundle to serve from, if any."""
+    return os.environ.get(SNAPSHOT_ENV) or None
+
+
+@contextmanager
+def _without_snapshot() -> Iterator[None]:
+    previous = os.environ.pop(SNAPSHOT_ENV, None)
+    try:
+        yield
+    finally:
+        if previous is not None:
+            os.environ[SNAPSHOT_ENV] = previous
+
+
+class Snapshot:
+    """A loaded snapshot bundle."""
+
+    def __init__(self, data: Dict[str, Any], path: str):
+        if data.get("format") != SNAPSHOT_FORMAT or data.get("format_version") != SNAPSHOT_FORMAT_VERSION:
+            raise ValueError(f"Not a snapshot bundle (or an unsupported version of one): {path}")
+        self.path = path
+        self.dandiset_id: str = data["dandiset_id"]
+        self.version: str = data["version"]
+        self.created: str = data.get("created", "")
+        self.info: Dict[str, Any] = data["dandiset_info"]
+        self.assets: List[Dict[str, Any]] = data["assets"]
+        self.nwb_file_info_scripts: Dict[str, str] = data["nwb_file_info"]
+
+    def _check(self, dandiset_id: str, version: str) -> None:
+        if dandiset_id != self.dandiset_id or version not in (self.version, "draft"):
+            raise RuntimeError(
+                f"Dandiset {dandiset_id} version {version} is not in the snapshot {self.path} "
+                f"(it contains Dandiset {self.dandiset_id} version {self.version})"
+            )
+
+    def dandiset_info(self, dandiset_id: str, version: str) -> Dict[str, Any]:
+        self._check(dandiset_id, version)
+        return self.info
+
+    def dandiset_assets(self, dandiset_id: str, version: str) -> List[Dict[str, Any]]:
+        self._check(dandiset_id, version)
+        return self.assets
+
+    def nwb_file_info(self, nwb_file_url: str) -> str:
+        from .range_proxy import restore_urls
+        script = self.nwb_file_info_scripts.get(restore_urls(nwb_file_url))
+        if script is None:
+            available = ", ".join(self.nwb_file_info_scripts) or "none"
+            raise RuntimeError(f"{nwb_file_url} is not in the snapshot {self.path}; NWB files in it: {available}")
+        return script
+
+
+def load_snapshot(path: str) -> Snapshot:
+    """Load a snapshot bundle; it is kept in memory until the file changes."""
+    path = os.path.abspath(path)
+    mtime = os.path.getmtime(path)
+    with _loaded_lock:
+        entry = _loaded.get(path)
+        if entry is not None and entry[0] == mtime:
+            return entry[1]
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        snapshot = Snapshot(json.load(f), path)
+    with _loaded_lock:
+        _loaded[path] = (mtime, snapshot)
+    return snapshot
+
+
+def get_snapshot() -> Optional[Snapshot]:
+    """Return the snapshot named by DANDI_NOTEBOOK_GEN_SNAPSHOT, if set."""
+    path = get_snapshot_path()
+    return load_snapshot(path) if path else None
+
+
+def _select_nwb_files(assets: List[Dict[str, Any]], glob: Optional[str], max_files: int) -> List[str]:
+    from .asset_filter import AssetFilter
+    from .prefetch import choose_representative_nwb_file
+    from .tools import asset_download_url
+    if glob:
+        asset_filter = AssetFilter(glob)
+        return [asset_download_url(a["asset_id"]) for a in assets if asset_filter(a)][:max_files]
+    chosen = choose_representative_nwb_file(assets)
+    return [asset_download_url(chosen["asset_id"])] if chosen else []
+
+
+def create_snapshot(
+    dandiset_id: str,
+    output_path: str,
+    *,
+    version: str = "draft",
+    nwb_file_urls: Optional[List[str]] = None,
+    glob: Optional[str] = None,
+    max_files: int = DEFAULT_MAX_FILES,
+    max_workers: int = 4,
+    use_cache: bool = True,
+) -> Dict[str, Any]:
+    """
+    Capture a Dandiset version into a snapshot bundle.
+
+    Parameters
+    ----------
+    dandiset_id : str
+        DANDI dataset ID
+    output_path : str
+        Path of the bundle (gzip-compressed JSON).
+    version : str, optional
+        Version of the dataset, by default "draft"
+    nwb_file_urls : List[str], optional
+        NWB files whose usage scripts are captured.
+    glob : str, optional
+        Also capture the NWB files whose paths match this pattern, at most
+        max_files of them. If neither nwb_file_urls nor glob is given, one
+        representative NWB file is captured.
+    max_files : int, optional
+        Maximum number of files taken from the glob matches, by default 10
+    max_workers : int, optional
+        Maximum number of usage scripts extracted concurrently, by default 4
+    use_cache : bool, optional
+        Whether to use the on-disk caches, by default True
+
+    Returns
+    -------
+    Dict[str, Any]
+        The path, the number of assets, the captured NWB file URLs, the
+        files that failed (URL -> error) and the size of the bundle.
+    """
+    from . import tools
+    from .range_proxy import restore_urls
+
+    with _without_snapshot():
+        info = tools.dandiset_info(dandiset_id, version=version, use_cache=use_cache)
+        assets = tools.all_dandiset_assets(dandiset_id, version, use_cache=use_cache)
+        urls = list(nwb_file_urls or [])
+        if glob or not urls:
+            urls += _select_nwb_files(assets, glob, max_files)
+        urls = list(dict.fromkeys(urls))
+
+        def extract(url: str) -> str:
+            # the bundle holds the original URLs, whatever proxy is running
+            return restore_urls(tools.nwb_file_info(dandiset_id, url, use_cache=use_cache))
+
+        scripts: Dict[str, str] = {}
+        errors: Dict[str, str] = {}
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {url: executor.submit(extract, url) for url in urls}
+            for url, future in futures.items():
+                try:
+                    scripts[url] = future.result()
+                except Exception as e:
+                    errors[url] = f"{type(e).__name__}: {e}"
+
+    data = {
+        "format": SNAPSHOT_FORMAT,
+        "format_version": SNAPSHOT_FORMAT_VERSION,
+        "created": time.strftime('%Y-%m-%d %H:%M:%S'),
+        "dandiset_id": dandiset_id,
+        "version": version,
+        "dandiset_info": info,
+        "assets": assets,
+        "nwb_file_info": scripts,
+    }
+    tmp_path = output_path + ".tmp"
+    with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+        json.dump(data, f, separators=(",", ":"))
+    os.replace(tmp_path, output_path)
+    return {
+        "path": output_path,
+        "num_assets": len(assets),
+        "nwb_files": list(scripts),
+        "errors": errors,
+        "bytes": os.path.getsize(output_path),
+    }
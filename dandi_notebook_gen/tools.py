@@ -1,22 +1,45 @@
-from typing import Dict, Any, Optional
-import requests
+from typing import Dict, Any, Iterator, List, Optional, Union
+import hashlib
+import os
+import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 
-# needs to be installed from source: https://github.com/rly/get-nwbfile-info
-from get_nwbfile_info import get_nwbfile_usage_script
+from .asset_filter import AssetFilter, sort_assets, summarize_assets
+from .asset_table import AssetTable
+from .cache import cache_enabled, get_nwb_info_cache, get_response_cache, ttl_for_version
+from .snapshot import get_snapshot, get_snapshot_path
+from .transport import post_json
+
+API_BASE_URL = os.environ.get(
+    "DANDI_NOTEBOOK_GEN_API_URL", "https://neurosift-chat-agent-tools.vercel.app/api"
+)
 
 def dandiset_assets(
     dandiset_id: str,
     version: str = "draft",
     page: int = 1,
     page_size: int = 20,
-    glob: Optional[str] = None,
+    glob: Union[str, List[str], None] = None,
+    use_cache: bool = True,
+    regex: Union[str, List[str], None] = None,
+    min_size: Union[int, str, None] = None,
+    max_size: Union[int, str, None] = None,
+    sort: Optional[str] = None,
 ) -> Dict[str, Any]:
     """Get a list of assets/files in a dandiset version.
 
     The output provides:
-    - count: total number of assets
+    - count: total number of assets (matching the filters, if any)
     - results: array of assets with asset_id, path, and size
 
+    Without filters or sorting, the page is requested from the server.
+    Otherwise, or when serving from a snapshot (see snapshot.py), the full
+    listing is fetched once (see all_dandiset_assets) and filtered, sorted
+    and paginated locally (see asset_filter.py).
+
     Parameters
     ----------
     dandiset_id : str
@@ -27,30 +50,233 @@ def dandiset_assets(
         Page number, by default 1
     page_size : int, optional
         Number of results per page, by default 20
-    glob : str, optional
-        Optional glob pattern to filter files (e.g., '*.nwb' for NWB files)
+    glob : str or List[str], optional
+        Glob patterns to filter files (e.g., '*.nwb' for NWB files); any may match
+    use_cache : bool, optional
+        Whether to use the on-disk response cache, by default True
+    regex : str or List[str], optional
+        Regular expressions searched for in the paths; any may match
+    min_size : int or str, optional
+        Minimum size, in bytes or e.g. "10MB"
+    max_size : int or str, optional
+        Maximum size, in bytes or e.g. "1GiB"
+    sort : str, optional
+        Sort by "path" or "size" ("-path", "-size" for descending order)
 
     Returns
     -------
     Dict[str, Any]
         Dictionary containing count and results
     """
-    url = "https://neurosift-chat-agent-tools.vercel.app/api/dandiset_assets"
+    asset_filter = AssetFilter(glob, regex, min_size, max_size)
+    if asset_filter.active or sort or get_snapshot_path():
+        matches = sort_assets([a for a in all_dandiset_assets(dandiset_id, version, use_cache=use_cache) if asset_filter(a)], sort)
+        start = (page - 1) * page_size
+        return {"count": len(matches), "results": matches[start:start + page_size]}
+
+    url = f"{API_BASE_URL}/dandiset_assets"
+    use_cache = use_cache and cache_enabled()
+    cache_key = ["dandiset_assets", url, dandiset_id, version, page, page_size, None]
+    if use_cache:
+        cached = get_response_cache().get(cache_key, ttl=ttl_for_version(version))
+        if cached is not None:
+            return cached
     payload = {
         "dandiset_id": dandiset_id,
         "version": version,
         "page": page,
         "page_size": page_size,
     }
-    if glob:
-        payload["glob"] = glob
 
-    response = requests.post(url, json=payload)
+    response = post_json(url, payload)
     if response.status_code != 200:
         raise RuntimeError(f"Failed to fetch dandiset assets: {response.text}")
-    return response.json()
+    result = response.json()
+    if use_cache:
+        get_response_cache().set(cache_key, result)
+    return result
+
+def all_dandiset_assets(dandiset_id: str, version: str = "draft", use_cache: bool = True) -> List[Dict[str, Any]]:
+    """Get every asset of a dandiset version, fetched once and kept in the response cache.
+
+    Parameters
+    ----------
+    dandiset_id : str
+        DANDI dataset ID
+    version : str, optional
+        Version of the dataset to retrieve, by default "draft"
+    use_cache : bool, optional
+        Whether to use the on-disk response cache, by default True
+
+    Returns
+    -------
+    List[Dict[str, Any]]
+        The assets, in listing order
+    """
+    snapshot = get_snapshot()
+    if snapshot is not None:
+        return snapshot.dandiset_assets(dandiset_id, version)
+    use_cache = use_cache and cache_enabled()
+    cache_key = ["all_dandiset_assets", API_BASE_URL, dandiset_id, version]
+    if use_cache:
+        cached = get_response_cache().get(cache_key, ttl=ttl_for_version(version))
+        if cached is not None:
+            return cached
+    # only the full listing is cached; caching every page as well would store
+    # the listing twice
+    assets = list(iter_dandiset_assets(dandiset_id, version=version, use_cache=False))
+    if use_cache:
+        get_response_cache().set(cache_key, assets)
+    return assets
+
+def dandiset_assets_summary(
+    dandiset_id: str,
+    version: str = "draft",
+    glob: Union[str, List[str], None] = None,
+    use_cache: bool = True,
+    regex: Union[str, List[str], None] = None,
+    min_size: Union[int, str, None] = None,
+    max_size: Union[int, str, None] = None,
+) -> Dict[str, Any]:
+    """Summarize the assets of a dandiset version.
+
+    Counts files and bytes per subject, session and file extension, and
+    lists the smallest file of each extension (see
+    asset_filter.summarize_assets). The filters are those of dandiset_assets.
+
+    Parameters
+    ----------
+    dandiset_id : str
+        DANDI dataset ID
+    version : str, optional
+        Version of the dataset to retrieve, by default "draft"
+    glob, regex, min_size, max_size : optional
+        Only summarize the matching assets, as in dandiset_assets
+    use_cache : bool, optional
+        Whether to use the on-disk response cache, by default True
+
+    Returns
+    -------
+    Dict[str, Any]
+        The summary
+    """
+    asset_filter = AssetFilter(glob, regex, min_size, max_size)
+    return summarize_assets(a for a in all_dandiset_assets(dandiset_id, version, use_cache=use_cache) if asset_filter(a))
+
+def iter_dandiset_assets(
+    dandiset_id: str,
+    version: str = "draft",
+    glob: Union[str, List[str], None] = None,
+    page_size: int = 100,
+    max_workers: int = 8,
+    use_cache: bool = True,
+) -> Iterator[Dict[str, Any]]:
+    """Iterate over every asset in a dandiset version.
+
+    The first page is fetched on its own to learn the total count. The
+    remaining pages are then fetched concurrently by a bounded pool of
+    worker threads, while assets are yielded in listing order. At most
+    2 * max_workers pages are held in memory at a time.
+
+    Parameters
+    ----------
+    dandiset_id : str
+        DANDI dataset ID
+    version : str, optional
+        Version of the dataset to retrieve, by default "draft"
+    glob : str or List[str], optional
+        Glob patterns to filter files (e.g., '*.nwb' for NWB files), applied
+        locally to the full listing (see all_dandiset_assets)
+    page_size : int, optional
+        Number of results per page request, by default 100
+    max_workers : int, optional
+        Maximum number of pages fetched concurrently, by default 8
+    use_cache : bool, optional
+        Whether to use the on-disk response cache, by default True
+
+    Yields
+    ------
+    Dict[str, Any]
+        One asset with asset_id, path, and size
+    """
+    def fetch(page: int) -> Dict[str, Any]:
+        return dandiset_assets(
+            dandiset_id, version=version, page=page, page_size=page_size, use_cache=use_cache
+        )
+
+    if glob:
+        asset_filter = AssetFilter(glob)
+        yield from (a for a in all_dandiset_assets(dandiset_id, version, use_cache=use_cache) if asset_filter(a))
+        return
 
-def nwb_file_info(dandiset_id: str, nwb_file_url: str) -> str:
+    first = fetch(1)
+    yield from first["results"]
+    num_pages = -(-first["count"] // page_size)
+    if num_pages <= 1:
+        return
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = deque()
+        next_page = 2
+        while next_page <= num_pages or pending:
+            while next_page <= num_pages and len(pending) < 2 * max_workers:
+                pending.append(executor.submit(fetch, next_page))
+                next_page += 1
+            yield from pending.popleft().result()["results"]
+
+def dandiset_asset_table(
+    dandiset_id: str,
+    version: str = "draft",
+    glob: Union[str, List[str], None] = None,
+    page_size: int = 100,
+    max_workers: int = 8,
+    use_cache: bool = True,
+) -> AssetTable:
+    """Get every asset in a dandiset version as a compact, columnar AssetTable.
+
+    The pages are streamed into the table (see iter_dandiset_assets) and
+    the glob is applied on the way, so the listing never exists as one list
+    of dicts. The exception is a snapshot (see snapshot.py), whose listing
+    is already held in memory. Use this instead of dandiset_assets or
+    iter_dandiset_assets for dandisets with very many assets.
+
+    Parameters
+    ----------
+    dandiset_id : str
+        DANDI dataset ID
+    version : str, optional
+        Version of the dataset to retrieve, by default "draft"
+    glob : str or List[str], optional
+        Glob patterns to filter files (e.g., '*.nwb' for NWB files)
+    page_size : int, optional
+        Number of results per page request, by default 100
+    max_workers : int, optional
+        Maximum number of pages fetched concurrently, by default 8
+    use_cache : bool, optional
+        Whether to use the on-disk response cache, by default True
+
+    Returns
+    -------
+    AssetTable
+        The assets, in listing order
+    """
+    # iter_dandiset_assets would filter a full listing built by all_dandiset_assets
+    asset_filter = AssetFilter(glob)
+    assets = iter_dandiset_assets(
+        dandiset_id, version=version, page_size=page_size, max_workers=max_workers, use_cache=use_cache
+    )
+    return AssetTable.from_records(a for a in assets if asset_filter(a))
+
+def _get_nwbfile_info_version() -> str:
+    """Version of get_nwbfile_info, looked up without importing it."""
+    from importlib.metadata import PackageNotFoundError, version
+    for name in ("get_nwbfile_info", "get-nwbfile-info"):
+        try:
+            return version(name)
+        except PackageNotFoundError:
+            pass
+    return "unknown"
+
+def nwb_file_info(dandiset_id: str, nwb_file_url: str, use_cache: bool = True) -> str:
     """Get information about an NWB file.
 
     Includes metadata and information about how to load the neurodata objects
@@ -62,6 +288,11 @@ def nwb_file_info(dandiset_id: str, nwb_file_url: str) -> str:
         DANDI dataset ID
     nwb_file_url : str
         URL of the NWB file in the DANDI archive
+    use_cache : bool, optional
+        Whether to use the on-disk cache of usage scripts, by default True.
+        DANDI asset URLs are immutable, so cached scripts never expire; the
+        cache key includes the get_nwbfile_info version so that upgrading it
+        regenerates them.
 
     Returns
     -------
@@ -77,10 +308,172 @@ def nwb_file_info(dandiset_id: str, nwb_file_url: str) -> str:
     # return response.json()
 
     # new method:
+    # during a generation run the URLs in the script are routed through the
+    # range proxy, so that the agent's reads of the file are cached; the
+    # cache always holds the script with the original URLs
+    from .range_proxy import rewrite_urls
+    snapshot = get_snapshot()
+    if snapshot is not None:
+        return rewrite_urls(snapshot.nwb_file_info(nwb_file_url))
+    use_cache = use_cache and cache_enabled()
+    cache_key = ["nwb_file_info", nwb_file_url, _get_nwbfile_info_version()]
+    if use_cache:
+        cached = get_nwb_info_cache().get(cache_key)
+        if cached is not None:
+            return rewrite_urls(cached)
+    # imported here because get_nwbfile_info pulls in pynwb and h5py, which
+    # would slow down every other tool call.
+    # needs to be installed from source: https://github.com/rly/get-nwbfile-info
+    from get_nwbfile_info import get_nwbfile_usage_script
     script = get_nwbfile_usage_script(nwb_file_url)
-    return script
+    if use_cache:
+        get_nwb_info_cache().set(cache_key, script)
+    return rewrite_urls(script)
+
+def asset_download_url(asset_id: str) -> str:
+    """Return the DANDI download URL for an asset ID."""
+    return f"https://api.dandiarchive.org/api/assets/{asset_id}/download/"
+
+def nwb_layout_signature(script: str, nwb_file_url: str) -> str:
+    """Hash of a usage script with the file URL, comments and blank lines removed.
+
+    Files that share the same NWB object layout produce the same code and
+    differ only in the URL and the values described in the comments, so
+    they get the same signature.
+    """
+    from .range_proxy import restore_urls
+    lines = []
+    for line in restore_urls(script).replace(nwb_file_url, "<URL>").splitlines():
+        line = re.sub(r"\s+#.*$", "", line).rstrip()
+        if line and not line.lstrip().startswith("#"):
+            lines.append(line)
+    return hashlib.sha256("\n".join(lines).encode("utf-8")).hexdigest()
+
+class _Extraction:
+    def __init__(self, url: str):
+        self.url = url
+        self.started: Optional[float] = None
+        self.done = threading.Event()
+        self.lock = threading.Lock()
+        self.timed_out = False
+        self.result: Optional[str] = None
+        self.error: Optional[str] = None
+
+def nwb_files_info(
+    dandiset_id: str,
+    nwb_file_urls: Optional[List[str]] = None,
+    glob: Optional[str] = None,
+    version: str = "draft",
+    max_files: int = 10,
+    max_workers: int = 4,
+    timeout: float = 300,
+    deduplicate: bool = True,
+    use_cache: bool = True,
+) -> Dict[str, str]:
+    """Get information about several NWB files at once.
+
+    Usage scripts are extracted concurrently by a bounded pool of worker
+    threads. Each extraction has its own timeout, counted from when it
+    starts. Timed-out extractions are reported as errors and left to finish
+    in the background without blocking the caller.
+
+    Parameters
+    ----------
+    dandiset_id : str
+        DANDI dataset ID
+    nwb_file_urls : List[str], optional
+        URLs of the NWB files in the DANDI archive
+    glob : str, optional
+        Glob pattern over the dandiset's asset paths (e.g., 'sub-01/*.nwb'),
+        used in addition to nwb_file_urls
+    version : str, optional
+        Version of the dataset used for glob, by default "draft"
+    max_files : int, optional
+        Maximum number of files taken from the glob matches, by default 10
+    max_workers : int, optional
+        Maximum number of files extracted concurrently, by default 4
+    timeout : float, optional
+        Timeout in seconds for each file, by default 300
+    deduplicate : bool, optional
+        Whether to replace the script of a file whose NWB object layout is
+        the same as an earlier file's with a short reference to it, by
+        default True
+    use_cache : bool, optional
+        Whether to use the on-disk caches, by default True
+
+    Returns
+    -------
+    Dict[str, str]
+        The usage script (or an error message) for each URL, in input order
+    """
+    urls = list(nwb_file_urls or [])
+    if glob:
+        matches = 0
+        for asset in iter_dandiset_assets(dandiset_id, version=version, glob=glob, use_cache=use_cache):
+            if matches >= max_files:
+                break
+            urls.append(asset_download_url(asset["asset_id"]))
+            matches += 1
+    urls = list(dict.fromkeys(urls))
+    if not urls:
+        raise ValueError("No NWB files given or matched")
+
+    slots = threading.Semaphore(max_workers)
+    jobs = [_Extraction(url) for url in urls]
+
+    def run(job: _Extraction) -> None:
+        slots.acquire()
+        job.started = time.monotonic()
+        try:
+            job.result = nwb_file_info(dandiset_id, job.url, use_cache=use_cache)
+        except Exception as e:
+            job.error = f"{type(e).__name__}: {e}"
+        finally:
+            with job.lock:
+                job.done.set()
+                if not job.timed_out:
+                    slots.release()
+
+    for job in jobs:
+        # daemon threads, so that a hung extraction cannot keep the process alive
+        threading.Thread(target=run, args=(job,), daemon=True).start()
+    pending = list(jobs)
+    while pending:
+        now = time.monotonic()
+        for job in list(pending):
+            with job.lock:
+                if job.done.is_set():
+                    pending.remove(job)
+                elif job.started is not None and now - job.started > timeout:
+                    job.timed_out = True
+                    pending.remove(job)
+                    # give the slot back so the remaining files are not held up
+                    slots.release()
+        if pending:
+            pending[0].done.wait(0.1)
 
-def dandiset_info(dandiset_id: str, version: str = "draft") -> Dict[str, Any]:
+    results: Dict[str, str] = {}
+    first_url_by_signature: Dict[str, str] = {}
+    for job in jobs:
+        if job.timed_out:
+            results[job.url] = f"# ERROR: Timed out after {timeout} seconds"
+            continue
+        if job.result is None:
+            results[job.url] = f"# ERROR: {job.error}"
+            continue
+        if deduplicate:
+            signature = nwb_layout_signature(job.result, job.url)
+            if signature in first_url_by_signature:
+                results[job.url] = (
+                    f"# Same NWB object layout as {first_url_by_signature[signature]}\n"
+                    f"# Use its usage script with this URL: {job.url}\n"
+                )
+                continue
+            first_url_by_signature[signature] = job.url
+        results[job.url] = job.result
+    return results
+
+def dandiset_info(dandiset_id: str, version: str = "draft", use_cache: bool = True) -> Dict[str, Any]:
     """Get information about a specific version of a DANDI dataset.
 
     When the version is unknown, use "draft".
@@ -96,18 +489,32 @@ def dandiset_info(dandiset_id: str, version: str = "draft") -> Dict[str, Any]:
         DANDI dataset ID
     version : str, optional
         Version of the dataset to retrieve, by default "draft"
+    use_cache : bool, optional
+        Whether to use the on-disk response cache, by default True
 
     Returns
     -------
     Dict[str, Any]
         Dictionary containing detailed dataset information
     """
-    url = "https://neurosift-chat-agent-tools.vercel.app/api/dandiset_info"
+    snapshot = get_snapshot()
+    if snapshot is not None:
+        return snapshot.dandiset_info(dandiset_id, version)
+    url = f"{API_BASE_URL}/dandiset_info"
+    use_cache = use_cache and cache_enabled()
+    cache_key = ["dandiset_info", url, dandiset_id, version]
+    if use_cache:
+        cached = get_response_cache().get(cache_key, ttl=ttl_for_version(version))
+        if cached is not None:
+            return cached
     payload = {"dandiset_id": dandiset_id, "version": version}
-    response = requests.post(url, json=payload)
+    response = post_json(url, payload)
     if response.status_code != 200:
         raise RuntimeError(f"Failed to fetch dandiset info: {response.text}")
-    return response.json()
+    result = response.json()
+    if use_cache:
+        get_response_cache().set(cache_key, result)
+    return result
 
 dandiset_info_spec = {
     "type": "function",
@@ -166,6 +573,23 @@ where XXXXXX is the dandiset ID and XXXXX is the version.""",
                     "type": "string",
                     "description": "File pattern filter (optional)",
                 },
+                "regex": {
+                    "type": "string",
+                    "description": "Regular expression searched for in the paths (optional)",
+                },
+                "min_size": {
+                    "type": "string",
+                    "description": "Minimum file size, e.g. '10MB' (optional)",
+                },
+                "max_size": {
+                    "type": "string",
+                    "description": "Maximum file size, e.g. '1GiB' (optional)",
+                },
+                "sort": {
+                    "type": "string",
+                    "enum": ["path", "size", "-path", "-size"],
+                    "description": "Sort order (optional)",
+                },
             },
             "required": ["dandiset_id"],
         },
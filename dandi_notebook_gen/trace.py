@@ -0,0 +1,209 @@
+"""
+Structured tracing of notebook generation runs
+
+A trace is a JSON-lines file with one span per line. Each span records a
+model call, an agent tool invocation, a subprocess or a stage of the
+generator, with its start/end time, duration, exit status and the number of
+bytes of output it produced. generate_notebook writes trace.jsonl in the
+working directory and exports its path as DANDI_NOTEBOOK_GEN_TRACE_FILE, so
+dandi-notebook-gen-tools processes launched by the agent append their own
+spans to the same file.
+"""
+
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+import json
+import os
+import re
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+TRACE_ENV = "DANDI_NOTEBOOK_GEN_TRACE_FILE"
+TRACE_FILE_NAME = "trace.jsonl"
+
+# spans of these kinds are nested inside other spans, so they are reported
+# separately and not counted in the phase totals
+NESTED_KINDS = ("cli",)
+
+
+def get_trace_path() -> Optional[str]:
+    """Return the trace file of the current run, if any."""
+    return os.environ.get(TRACE_ENV) or None
+
+
+@contextmanager
+def tracing_to(path: str) -> Iterator[str]:
+    """
+    Start a new trace file and export it to child processes for the enclosed block.
+
+    Any existing file at path is truncated.
+    """
+    open(path, "w").close()
+    previous = os.environ.get(TRACE_ENV)
+    os.environ[TRACE_ENV] = path
+    try:
+        yield path
+    finally:
+        if previous is None:
+            os.environ.pop(TRACE_ENV, None)
+        else:
+            os.environ[TRACE_ENV] = previous
+
+
+def command_phase(command: str) -> str:
+    """Classify a shell command run by the agent into a phase."""
+    if "dandi-notebook-gen-tools" in command:
+        if "execute-notebook" in command:
+            return "notebook_execution"
+        return "dandi_tools"
+    if re.search(r"\bjupyter\b.*\bexecute\b|\bjupytext\b|\bnbconvert\b", command):
+        return "notebook_execution"
+    if re.search(r"\bpython[0-9.]*\b", command):
+        return "exploratory_scripts"
+    return "other_commands"
+
+
+def record_span(kind: str, name: str, start: float, end: float, *, path: Optional[str] = None, **fields: Any) -> None:
+    """
+    Append one span to the trace file.
+
+    Does nothing if there is no trace file. Lines are written with a single
+    append, so concurrent processes can share the file.
+
+    Parameters
+    ----------
+    kind : str
+        "model", "tool", "stage" or "cli"
+    name : str
+        Model name, tool name, stage name or CLI command
+    start, end : float
+        Wall-clock times (time.time())
+    path : str, optional
+        Trace file. Defaults to get_trace_path().
+    **fields
+        Extra JSON-serializable fields, e.g. phase, status, bytes_out
+    """
+    path = path or get_trace_path()
+    if not path:
+        return
+    span = {"kind": kind, "name": name, "start": start, "end": end, "duration": end - start, "pid": os.getpid()}
+    span.update(fields)
+    line = (json.dumps(span) + "\n").encode("utf-8")
+    fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        os.write(fd, line)
+    finally:
+        os.close(fd)
+
+
+@contextmanager
+def span(kind: str, name: str, *, path: Optional[str] = None, **fields: Any) -> Iterator[Dict[str, Any]]:
+    """
+    Record the enclosed block as a span.
+
+    Yields a dict that the block can add fields to (e.g. bytes_out). The
+    status is "ok", or "error" with the exception message if the block
+    raised.
+    """
+    extra: Dict[str, Any] = dict(fields)
+    start = time.time()
+    try:
+        yield extra
+    except BaseException as e:
+        # the block may already have decided the status (e.g. SystemExit(0))
+        if extra.setdefault("status", "error") != "ok":
+            extra.setdefault("error", f"{type(e).__name__}: {e}")
+        raise
+    finally:
+        extra.setdefault("status", "ok")
+        record_span(kind, name, start, time.time(), path=path, **extra)
+
+
+def read_trace(path: str) -> List[Dict[str, Any]]:
+    """Read the spans of a trace file, skipping malformed lines."""
+    spans = []
+    with open(path, "r") as f:
+        for line in f:
+            try:
+                spans.append(json.loads(line))
+            except ValueError:
+                continue
+    return spans
+
+
+def summarize_spans(spans: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Roll spans up into a per-phase breakdown.
+
+    Returns
+    -------
+    Dict[str, Any]
+        {"phases": {phase: {"count", "total_seconds", "bytes_out", "errors"}},
+         "cli": {...same for nested CLI spans by command...}}
+    """
+    phases: Dict[str, Dict[str, Any]] = {}
+    cli: Dict[str, Dict[str, Any]] = {}
+    for s in spans:
+        if s.get("kind") in NESTED_KINDS:
+            bucket = cli.setdefault(s.get("name", "?"), {"count": 0, "total_seconds": 0.0, "bytes_out": 0, "errors": 0})
+        else:
+            phase = s.get("phase") or s.get("kind", "other")
+            bucket = phases.setdefault(phase, {"count": 0, "total_seconds": 0.0, "bytes_out": 0, "errors": 0})
+        bucket["count"] += 1
+        bucket["total_seconds"] += s.get("duration", 0.0)
+        bucket["bytes_out"] += s.get("bytes_out") or 0
+        if s.get("status") not in (None, "ok"):
+            bucket["errors"] += 1
+    return {"phases": phases, "cli": cli}
+
+
+def find_trace_files(paths: Iterable[str]) -> List[str]:
+    """Expand directories into the trace files they contain (recursively)."""
+    found = []
+    for p in paths:
+        if os.path.isdir(p):
+            found.extend(sorted(str(f) for f in Path(p).rglob(TRACE_FILE_NAME)))
+        else:
+            found.append(p)
+    return found
+
+
+def _percentile(values: List[float], q: float) -> float:
+    values = sorted(values)
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(round(q * (len(values) - 1))))]
+
+
+def aggregate_traces(paths: Iterable[str]) -> Dict[str, Any]:
+    """
+    Aggregate the phase breakdowns of many runs.
+
+    For every phase, reports how many runs it appeared in, the total and
+    per-run mean, median, 95th percentile and maximum of its time.
+
+    Parameters
+    ----------
+    paths : Iterable[str]
+        Trace files, or directories to search for trace.jsonl files.
+    """
+    files = find_trace_files(paths)
+    per_run: List[Dict[str, Any]] = []
+    for f in files:
+        summary = summarize_spans(read_trace(f))
+        per_run.append({"trace_file": f, **summary})
+    phase_names = sorted({name for run in per_run for name in run["phases"]})
+    phases = {}
+    for name in phase_names:
+        seconds = [run["phases"][name]["total_seconds"] for run in per_run if name in run["phases"]]
+        phases[name] = {
+            "num_runs": len(seconds),
+            "count": sum(run["phases"][name]["count"] for run in per_run if name in run["phases"]),
+            "errors": sum(run["phases"][name]["errors"] for run in per_run if name in run["phases"]),
+            "total_seconds": sum(seconds),
+            "mean_seconds": sum(seconds) / len(seconds),
+            "p50_seconds": _percentile(seconds, 0.5),
+            "p95_seconds": _percentile(seconds, 0.95),
+            "max_seconds": max(seconds),
+        }
+    return {"num_runs": len(per_run), "phases": phases, "runs": per_run}
@@ -0,0 +1,156 @@
+"""
+Shared HTTP transport used by the DANDI tools
+
+All tools go through one requests.Session so that connections are pooled and
+kept alive between calls. Requests time out instead of stalling, and
+transient failures (connection errors, 429 and 5xx responses) are retried
+with exponential backoff and jitter.
+"""
+
+from typing import Any, Dict, Optional, Tuple
+import os
+import random
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+_stats_lock = threading.Lock()
+_stats = {"requests": 0, "retries": 0, "failures": 0, "bytes_sent": 0, "bytes_received": 0}
+
+
+def _env_float(name: str, default: float) -> float:
+    value = os.environ.get(name)
+    return float(value) if value else default
+
+
+def get_timeout() -> Tuple[float, float]:
+    """
+    Return the (connect, read) timeout in seconds.
+
+    Configure with DANDI_NOTEBOOK_GEN_CONNECT_TIMEOUT and
+    DANDI_NOTEBOOK_GEN_READ_TIMEOUT.
+    """
+    return (
+        _env_float("DANDI_NOTEBOOK_GEN_CONNECT_TIMEOUT", 10.0),
+        _env_float("DANDI_NOTEBOOK_GEN_READ_TIMEOUT", 60.0),
+    )
+
+
+def get_max_retries() -> int:
+    """Number of retries after the first attempt (DANDI_NOTEBOOK_GEN_MAX_RETRIES)."""
+    value = os.environ.get("DANDI_NOTEBOOK_GEN_MAX_RETRIES")
+    return int(value) if value else 4
+
+
+def get_session() -> requests.Session:
+    """Return the process-wide session, creating it on first use."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                pool_size = int(os.environ.get("DANDI_NOTEBOOK_GEN_POOL_SIZE", "16"))
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _session = session
+    return _session
+
+
+def _backoff_delay(attempt: int, response: Optional[requests.Response]) -> float:
+    base = _env_float("DANDI_NOTEBOOK_GEN_BACKOFF_BASE", 0.5)
+    cap = _env_float("DANDI_NOTEBOOK_GEN_BACKOFF_MAX", 30.0)
+    if response is not None:
+        retry_after = response.headers.get("Retry-After")
+        if retry_after and retry_after.isdigit():
+            return min(float(retry_after), cap)
+    # full jitter: uniform in [0, base * 2^attempt]
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+def _count(**increments: int) -> None:
+    with _stats_lock:
+        for k, v in increments.items():
+            _stats[k] += v
+
+
+def request(method: str, url: str, *, max_retries: Optional[int] = None, **kwargs: Any) -> requests.Response:
+    """
+    Send an HTTP request through the shared session.
+
+    Connection errors, timeouts and responses with a status in
+    RETRY_STATUS_CODES are retried with exponential backoff and jitter. After
+    the last retry the final response is returned (or the final exception is
+    raised), so callers check the status code as usual.
+
+    Parameters
+    ----------
+    method : str
+        HTTP method
+    url : str
+        Request URL
+    max_retries : int, optional
+        Number of retries after the first attempt. Defaults to get_max_retries();
+        0 sends the request once, for callers that retry themselves or for which
+        a repeated request is not safe.
+    **kwargs
+        Passed through to requests.Session.request. A default timeout from
+        get_timeout() is used if none is given.
+
+    Returns
+    -------
+    requests.Response
+        The response
+    """
+    kwargs.setdefault("timeout", get_timeout())
+    if max_retries is None:
+        max_retries = get_max_retries()
+    session = get_session()
+    attempt = 0
+    while True:
+        response = None
+        try:
+            response = session.request(method, url, **kwargs)
+        except (requests.ConnectionError, requests.Timeout):
+            _count(requests=1)
+            if attempt >= max_retries:
+                _count(failures=1)
+                raise
+        else:
+            body = response.request.body
+            _count(
+                requests=1,
+                bytes_sent=len(body) if body else 0,
+                bytes_received=len(response.content),
+            )
+            if response.status_code not in RETRY_STATUS_CODES:
+                return response
+            if attempt >= max_retries:
+                _count(failures=1)
+                return response
+        _count(retries=1)
+        time.sleep(_backoff_delay(attempt, response))
+        attempt += 1
+
+
+def post_json(url: str, payload: Dict[str, Any], **kwargs: Any) -> requests.Response:
+    """POST a JSON payload through the shared session (see request)."""
+    return request("POST", url, json=payload, **kwargs)
+
+
+def get_stats() -> Dict[str, int]:
+    """Return a copy of the request, retry and byte counters."""
+    with _stats_lock:
+        return dict(_stats)
+
+
+def reset_stats() -> None:
+    """Reset all counters to zero."""
+    with _stats_lock:
+        for k in _stats:
+            _stats[k] = 0
@@ -0,0 +1,193 @@
+"""
+Pre-processing and de-duplication of the images the agent reads
+
+The agent passes every plot it makes to minicline's read_image, which sends
+the PNG as it is to the vision model and attaches it to the conversation.
+Matplotlib figures are often far larger than the model can use, and many of
+them are near-duplicates made while iterating on a script. For the duration
+of a run (see minicline_hooks.instrument_minicline) read_image is replaced
+with one that:
+
+- downsamples the image so that neither side exceeds max_image_size pixels
+  and recompresses it as an optimized PNG with a 256-color palette (exact
+  for images with at most 256 colors), keeping the original if that is not
+  smaller and the image was not downsampled
+- computes a perceptual hash (dHash) of the image and looks the description
+  up by that hash, the vision model and the instructions: first among the
+  images of the run, then in the on-disk vision cache
+
+Only exact hash matches reuse a description. While the agent fixes a plot,
+each new version is a near-duplicate of the broken one, and it has to be
+described anew. Even an exact match can hide a small change, so a reused
+description is labeled as such in the tool result, and the attached image
+is always the new one. Descriptions are only cached for images the vision
+model described without an error. The counters of the run (images, bytes and pixels before and
+after, cache hits and the vision tokens they saved) go to metadata.json.
+"""
+
+from typing import Any, Callable, Dict, Optional, Tuple
+import base64
+import io
+from pathlib import Path
+
+from .cache import DiskCache
+
+DEFAULT_MAX_IMAGE_SIZE = 1024
+# side of the grayscale thumbnail the hash is computed from (64 bits)
+HASH_SIZE = 8
+# prefix of a description that was reused rather than produced for this image
+REUSED_DESCRIPTION_NOTE = (
+    "(reused from an earlier image with the same perceptual hash; "
+    "check the attached image for changes the description may not cover)"
+)
+
+
+def new_vision_stats() -> Dict[str, int]:
+    return {
+        "num_images": 0,
+        "num_downsampled": 0,
+        "num_cache_hits": 0,
+        "bytes_in": 0,
+        "bytes_out": 0,
+        "pixels_in": 0,
+        "pixels_out": 0,
+        "saved_vision_prompt_tokens": 0,
+        "saved_vision_completion_tokens": 0,
+    }
+
+
+def perceptual_hash(image) -> str:
+    """
+    Difference hash of a PIL image, as 16 hex digits.
+
+    Each bit compares two horizontally adjacent pixels of a 9x8 grayscale
+    thumbnail, so re-renderings that differ in size, compression or small
+    details get the same hash.
+    """
+    from PIL import Image
+    gray = image.convert("L").resize((HASH_SIZE + 1, HASH_SIZE), Image.LANCZOS)
+    pixels = gray.tobytes()
+    bits = 0
+    for row in range(HASH_SIZE):
+        for col in range(HASH_SIZE):
+            left = pixels[row * (HASH_SIZE + 1) + col]
+            right = pixels[row * (HASH_SIZE + 1) + col + 1]
+            bits = (bits << 1) | (left > right)
+    return f"{bits:0{HASH_SIZE * HASH_SIZE // 4}x}"
+
+
+def prepare_image(data: bytes, max_image_size: Optional[int] = DEFAULT_MAX_IMAGE_SIZE) -> Tuple[bytes, Dict[str, Any]]:
+    """
+    Downsample and recompress an image for the vision model.
+
+    Parameters
+    ----------
+    data : bytes
+        The image file (any format Pillow reads).
+    max_image_size : int, optional
+        Maximum width and height in pixels, by default 1024. None keeps the
+        size and only recompresses.
+
+    Returns
+    -------
+    Tuple[bytes, Dict[str, Any]]
+        The PNG to send, and its perceptual hash, original and new size in
+        pixels and whether it was downsampled.
+    """
+    from PIL import Image
+    image = Image.open(io.BytesIO(data))
+    image.load()
+    original_size = image.size
+    phash = perceptual_hash(image)
+    if image.mode not in ("RGB", "RGBA", "L", "P"):
+        image = image.convert("RGBA")
+    if image.mode == "RGBA" and image.getchannel("A").getextrema() == (255, 255):
+        # matplotlib saves opaque figures with an alpha channel
+        image = image.convert("RGB")
+    downsampled = bool(max_image_size) and max(image.size) > max_image_size
+    if downsampled:
+        image.thumbnail((max_image_size, max_image_size), Image.LANCZOS)
+    if image.mode == "RGB":
+        # exact for plots with few colors; resampling adds antialiased shades,
+        # which would otherwise make the PNG larger than the original
+        image = image.quantize(colors=256, method=Image.Quantize.MEDIANCUT, dither=Image.Dither.NONE)
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG", optimize=True)
+    output = buffer.getvalue()
+    if not downsampled and len(output) >= len(data) and data.startswith(b"\x89PNG"):
+        output = data
+    return output, {
+        "phash": phash,
+        "original_size": original_size,
+        "size": image.size,
+        "downsampled": downsampled,
+    }
+
+
+def preprocessed_read_image(
+    original: Callable,
+    *,
+    max_image_size: Optional[int],
+    cache: Optional[DiskCache],
+    stats: Dict[str, int],
+) -> Callable:
+    """
+    Wrap minicline's read_image (see the module docstring).
+
+    Files that are outside the working directory, missing or not images are
+    left to the original, which reports the error to the agent.
+    """
+    from minicline.tools import read_image as read_image_module
+    from minicline.tools.is_within_directory import is_within_directory
+
+    # descriptions of this run's images by (hash, vision model, instructions),
+    # also when the disk cache is off
+    seen: Dict[Tuple[str, str, Optional[str]], Dict[str, Any]] = {}
+
+    def read_image(path, *, instructions, cwd, vision_model):
+        if not is_within_directory(path, cwd):
+            return original(path, instructions=instructions, cwd=cwd, vision_model=vision_model)
+        try:
+            data = (Path(cwd) / path).read_bytes()
+            output, info = prepare_image(data, max_image_size)
+        except Exception:
+            return original(path, instructions=instructions, cwd=cwd, vision_model=vision_model)
+        stats["num_images"] += 1
+        stats["num_downsampled"] += int(info["downsampled"])
+        stats["bytes_in"] += len(data)
+        stats["bytes_out"] += len(output)
+        stats["pixels_in"] += info["original_size"][0] * info["original_size"][1]
+        stats["pixels_out"] += info["size"][0] * info["size"][1]
+
+        tool_call_summary = f"read_image for '{path}'"
+        data_url = f"data:image/png;base64,{base64.b64encode(output).decode('utf-8')}"
+        prompt_tokens = completion_tokens = 0
+        description = None
+        reused = False
+        if vision_model:
+            key = ["read_image", info["phash"], vision_model, instructions, max_image_size]
+            entry = seen.get((info["phash"], vision_model, instructions))
+            if entry is None and cache is not None:
+                entry = cache.get(key)
+            if entry is not None:
+                stats["num_cache_hits"] += 1
+                stats["saved_vision_prompt_tokens"] += entry["prompt_tokens"]
+                stats["saved_vision_completion_tokens"] += entry["completion_tokens"]
+                description = entry["description"]
+                reused = True
+            else:
+                try:
+                    description, prompt_tokens, completion_tokens = read_image_module._get_ai_description(
+                        data_url, vision_model=vision_model, instructions=instructions
+                    )
+                except Exception as e:
+                    return tool_call_summary, f"ERROR READING FILE {path}: {str(e)}", None, 0, 0
+                entry = {"description": description, "prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens}
+                if cache is not None:
+                    cache.set(key, entry)
+            seen[(info["phash"], vision_model, instructions)] = entry
+        text = f'The image for {path} is attached.'
+        if description:
+            text += f' AI description {REUSED_DESCRIPTION_NOTE}: {description}' if reused else f' AI description: {description}'
+        return tool_call_summary, text, data_url, prompt_tokens, completion_tokens
+    return read_image
@@ -0,0 +1,20 @@
+"""
+Shared fixtures for the tests
+"""
+
+import pytest
+from benchmarks.standin import StandInServer
+from dandi_notebook_gen import tools
+
+@pytest.fixture
+def standin(monkeypatch):
+    """
+    A running stand-in for the tools API (benchmarks.standin), with the
+    on-disk cache off. Tests adjust its assets, dandiset_info, files,
+    latency and failures, and count requests in its stats.
+    """
+    with StandInServer(100) as server:
+        monkeypatch.setenv("DANDI_NOTEBOOK_GEN_API_URL", server.api_url)
+        monkeypatch.setenv("DANDI_NOTEBOOK_GEN_NO_CACHE", "1")
+        monkeypatch.setattr(tools, "API_BASE_URL", server.api_url)
+        yield server
@@ -0,0 +1,73 @@
+"""
+Tests for the asyncio API
+"""
+
+import asyncio
+import pytest
+
+pytest.importorskip("httpx")
+
+from dandi_notebook_gen import aio, tools
+
+@pytest.fixture
+def api(standin):
+    """The stand-in, serving a 250-asset listing"""
+    standin.assets = [{"asset_id": f"a{i}", "path": f"f{i}.nwb", "size": i} for i in range(250)]
+    return standin
+
+def test_specs_match_sync_tools():
+    """Test that the async functions carry the same specs as the sync ones"""
+    assert aio.dandiset_info.spec == tools.dandiset_info.spec
+    assert aio.dandiset_assets.spec == tools.dandiset_assets.spec
+    assert aio.nwb_file_info.spec == tools.nwb_file_info.spec
+
+def test_specs_parameters_are_accepted():
+    """Test that every parameter advertised in the specs is accepted by the async functions"""
+    import inspect
+    for name in ("dandiset_info", "dandiset_assets", "nwb_file_info"):
+        parameters = inspect.signature(getattr(aio, name)).parameters
+        assert set(getattr(aio, name).spec["function"]["parameters"]["properties"]) <= set(parameters)
+
+def test_filtered_assets_match_sync_tools(api):
+    """Test that filters and sorting give the same results as the sync API"""
+    options = dict(glob="f1*", regex=r"\d{2}\.nwb$", min_size=10, max_size=150, sort="-size", page=2, page_size=5)
+    async def main():
+        try:
+            return await aio.dandiset_assets("000001", **options)
+        finally:
+            await aio.aclose()
+    result = asyncio.run(main())
+    assert result == tools.dandiset_assets("000001", **options)
+    assert result["count"] == 61 and result["results"][0]["asset_id"] == "a145"
+
+def test_gather_dandiset_info(api):
+    """Test gathering metadata for many dandisets from one loop"""
+    async def main():
+        try:
+            return await asyncio.gather(*(aio.dandiset_info(f"{i:06d}") for i in range(10)))
+        finally:
+            await aio.aclose()
+    results = asyncio.run(main())
+    assert [r["id"] for r in results] == [f"DANDI:{i:06d}/draft" for i in range(10)]
+
+def test_iter_dandiset_assets(api):
+    """Test that every asset is yielded in order"""
+    async def main():
+        try:
+            return [a async for a in aio.iter_dandiset_assets("000001", page_size=100)]
+        finally:
+            await aio.aclose()
+    assets = asyncio.run(main())
+    assert [a["asset_id"] for a in assets] == [f"a{i}" for i in range(250)]
+    assert api.stats["api_requests"] == 3
+
+def test_timeout(api):
+    """Test that a slow request is cancelled by the timeout"""
+    api.latency = 1.0
+    async def main():
+        try:
+            await aio.dandiset_info("000001", timeout=0.1)
+        finally:
+            await aio.aclose()
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(main())
@@ -0,0 +1,53 @@
+"""
+Tests for local filtering and summaries of asset listings
+"""
+
+import pytest
+from dandi_notebook_gen.asset_filter import AssetFilter, extension, parse_size, sort_assets, summarize_assets
+
+ASSETS = [
+    {"asset_id": "a", "path": "sub-01/sub-01_ses-1_ecephys.nwb", "size": 5000},
+    {"asset_id": "b", "path": "sub-01/sub-01_ses-2_ecephys.nwb", "size": 3000},
+    {"asset_id": "c", "path": "sub-02/sub-02_ses-1_behavior+image.nwb", "size": 9000},
+    {"asset_id": "d", "path": "sub-02/sub-02_ses-1_image.nwb.lindi.json", "size": 100},
+    {"asset_id": "e", "path": "dandiset.yaml", "size": 10},
+]
+
+def test_parse_size():
+    """Test decimal and binary units"""
+    assert parse_size(1024) == 1024
+    assert parse_size("500MB") == 500_000_000
+    assert parse_size("1.5GiB") == 1.5 * 1024 ** 3
+    assert parse_size("2 KiB") == 2048
+    assert parse_size("12b") == 12
+    for value in ("ten megabytes", "5ib", "1i"):
+        with pytest.raises(ValueError):
+            parse_size(value)
+
+def test_asset_filter():
+    """Test that any glob or regex may match and that all kinds of filters apply"""
+    paths = lambda f: [a["asset_id"] for a in ASSETS if f(a)]
+    assert paths(AssetFilter(["*.nwb"])) == ["a", "b", "c"]
+    assert paths(AssetFilter(["sub-02/*", "*.yaml"])) == ["c", "d", "e"]
+    assert paths(AssetFilter(regexes=[r"ses-2", r"behavior\+"])) == ["b", "c"]
+    assert paths(AssetFilter("*.nwb", min_size="4KB")) == ["a", "c"]
+    assert paths(AssetFilter("sub-01/*", regexes="ses-1")) == ["a"]
+    assert not AssetFilter().active
+    with pytest.raises(ValueError):
+        AssetFilter(regexes="(")
+
+def test_sort_assets():
+    """Test sorting by size and path in both directions"""
+    assert [a["asset_id"] for a in sort_assets(ASSETS, "size")] == ["e", "d", "b", "a", "c"]
+    assert [a["asset_id"] for a in sort_assets(ASSETS, "-path")][0] == "d"
+    assert sort_assets(ASSETS, None) is ASSETS
+
+def test_summarize_assets():
+    """Test counts per subject, session and extension and the smallest file of each extension"""
+    summary = summarize_assets(ASSETS)
+    assert summary["count"] == 5 and summary["bytes"] == 17110
+    assert summary["by_subject"] == {"01": {"count": 2, "bytes": 8000}, "02": {"count": 2, "bytes": 9100}, "(none)": {"count": 1, "bytes": 10}}
+    assert summary["by_session"]["1"]["count"] == 3
+    assert summary["by_extension"][".nwb"]["count"] == 3
+    assert summary["smallest_by_extension"][".nwb"]["asset_id"] == "b"
+    assert extension("sub-02/x.nwb.lindi.json") == ".nwb.lindi.json"
@@ -0,0 +1,47 @@
+"""
+Tests for the columnar asset listing
+"""
+
+import pytest
+from dandi_notebook_gen.asset_filter import AssetFilter
+from dandi_notebook_gen.asset_table import AssetRecord, AssetTable
+
+ASSETS = [
+    {"asset_id": "id-0", "path": "sub-01/sub-01_ses-1.nwb", "size": 10},
+    {"asset_id": "id-1", "path": "sub-01/sub-01_ses-2.nwb", "size": 20},
+    {"asset_id": "id-2", "path": "dandiset.yaml", "size": 3},
+    {"asset_id": "id-3", "path": "sub-02/ses-1/café.nwb", "size": 2 ** 40},
+]
+
+def test_round_trip():
+    """Test that rows read back equal the records they were built from"""
+    table = AssetTable.from_records(iter(ASSETS))
+    assert len(table) == 4
+    assert list(table.records()) == ASSETS
+    assert table[-1] == AssetRecord("id-3", "sub-02/ses-1/café.nwb", 2 ** 40)
+    assert table.directories == ["sub-01", "", "sub-02/ses-1"]
+    assert table.total_size() == 33 + 2 ** 40
+    with pytest.raises(IndexError):
+        table[4]
+
+def test_filter():
+    """Test that a filter returns a new table"""
+    table = AssetTable.from_records(ASSETS).filter(AssetFilter("*.nwb", max_size=15))
+    assert [r.asset_id for r in table] == ["id-0"]
+
+def test_to_numpy():
+    """Test the NumPy export"""
+    np = pytest.importorskip("numpy")
+    columns = AssetTable.from_records(ASSETS).to_numpy()
+    assert columns["size"].dtype == np.int64 and columns["size"].tolist() == [a["size"] for a in ASSETS]
+    assert columns["path"].tolist() == [a["path"] for a in ASSETS]
+    assert AssetTable().to_numpy()["size"].shape == (0,)
+
+def test_to_arrow_and_parquet(tmp_path):
+    """Test the Arrow and Parquet exports"""
+    pytest.importorskip("pyarrow")
+    import pyarrow.parquet as pq
+    table = AssetTable.from_records(ASSETS)
+    assert table.to_arrow().to_pylist() == ASSETS
+    table.write_parquet(str(tmp_path / "assets.parquet"))
+    assert pq.read_table(str(tmp_path / "assets.parquet")).to_pylist() == ASSETS
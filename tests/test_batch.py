@@ -0,0 +1,56 @@
+"""
+Tests for batch notebook generation
+"""
+
+import json
+import os
+from unittest.mock import patch
+from dandi_notebook_gen.batch import generate_notebooks, is_complete, read_dandiset_ids
+
+def fake_generate_notebook(dandiset_id, output_path=None, *, working_dir=None, auto=False, **kwargs):
+    """Stand-in for generate_notebook that writes the same files a real run would"""
+    assert auto
+    if dandiset_id == "999999":
+        raise RuntimeError("notebook.ipynb was not created")
+    with open(os.path.join(working_dir, "metadata.json"), "w") as f:
+        json.dump({"total_prompt_tokens": 100, "total_completion_tokens": 10, "elapsed_time_seconds": 1.0}, f)
+    with open(output_path, "w") as f:
+        f.write("{}")
+    return output_path
+
+def test_read_dandiset_ids(tmp_path):
+    """Test that blank lines and comments are ignored"""
+    path = tmp_path / "ids.txt"
+    path.write_text("000001\n\n# comment\n 000002 \n")
+    assert read_dandiset_ids(str(path)) == ["000001", "000002"]
+
+@patch("dandi_notebook_gen.generator.generate_notebook", fake_generate_notebook)
+def test_generate_notebooks_summary_and_resume(tmp_path):
+    """Test per-Dandiset status in the summary and skipping of completed runs"""
+    output_dir = str(tmp_path / "out")
+    summary = generate_notebooks(["000001", "000002", "999999"], output_dir, max_workers=2)
+    statuses = {r["dandiset_id"]: r["status"] for r in summary["runs"]}
+    assert statuses == {"000001": "success", "000002": "success", "999999": "failed"}
+    assert summary["total_prompt_tokens"] == 200
+    assert os.path.exists(os.path.join(output_dir, "000001", "notebook.ipynb"))
+    with open(os.path.join(output_dir, "summary.json")) as f:
+        assert json.load(f)["num_failed"] == 1
+
+    summary = generate_notebooks(["000001", "000002", "999999"], output_dir, max_workers=2)
+    statuses = {r["dandiset_id"]: r["status"] for r in summary["runs"]}
+    assert statuses == {"000001": "skipped", "000002": "skipped", "999999": "failed"}
+    assert summary["total_prompt_tokens"] == 200
+
+@patch("dandi_notebook_gen.generator.generate_notebook", fake_generate_notebook)
+def test_partial_runs_are_not_skipped(tmp_path):
+    """Test that a notebook cut short by the budget is regenerated when the batch is resumed"""
+    output_dir = str(tmp_path / "out")
+    generate_notebooks(["000001"], output_dir, max_workers=1)
+    assert is_complete(output_dir, "000001")
+    metadata_path = os.path.join(output_dir, "000001", "work", "metadata.json")
+    with open(metadata_path, "w") as f:
+        json.dump({"total_prompt_tokens": 100, "partial": True, "budget_exceeded": "max_cost"}, f)
+    assert not is_complete(output_dir, "000001")
+    summary = generate_notebooks(["000001"], output_dir, max_workers=1)
+    assert summary["runs"][0]["status"] == "success"
+    assert is_complete(output_dir, "000001")
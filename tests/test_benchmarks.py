@@ -0,0 +1,50 @@
+"""
+Smoke tests for the offline benchmark suite
+"""
+
+import requests
+from benchmarks.run import compare_to_baseline, run_benchmarks
+from benchmarks.standin import StandInServer, make_asset_listing
+
+def test_make_asset_listing_is_deterministic():
+    """Test that large listings are built from the template with distinct paths"""
+    assets = make_asset_listing(10)
+    assert assets == make_asset_listing(10)
+    assert len({a["path"] for a in assets}) == 10
+    assert len({a["asset_id"] for a in assets}) == 10
+
+def test_standin_pages_and_globs():
+    """Test that the stand-in pages and filters the listing like the API"""
+    with StandInServer(100) as server:
+        response = requests.post(f"{server.api_url}/dandiset_assets", json={"dandiset_id": "000001", "page": 2, "page_size": 30})
+        result = response.json()
+        assert result["count"] == 100
+        assert result["results"] == server.assets[30:60]
+        response = requests.post(f"{server.api_url}/dandiset_assets", json={"dandiset_id": "000001", "glob": "*ecephys.nwb", "page_size": 1000})
+        assert response.json()["count"] == 50
+
+def test_standin_serves_range_requests(tmp_path):
+    """Test that files are served in byte ranges"""
+    path = tmp_path / "blob.bin"
+    path.write_bytes(bytes(range(256)) * 4)
+    with StandInServer(1, files={"blob.bin": str(path)}) as server:
+        response = requests.get(server.file_url("blob.bin"), headers={"Range": "bytes=10-19"})
+        assert response.status_code == 206
+        assert response.content == bytes(range(10, 20))
+        assert response.headers["Content-Range"] == "bytes 10-19/1024"
+        assert server.stats["bytes_served"] == 10
+
+def test_run_benchmarks_quick():
+    """Test that a quick run produces machine-readable results"""
+    results = run_benchmarks(quick=True, only=["tool_latency", "listing_throughput", "range_reads"])
+    assert results["results"]["listing_throughput"]["workers_1"]["num_assets"] == 500
+    assert results["results"]["tool_latency"]["dandiset_info"]["cold"]["n"] == 3
+    assert "skipped" in results["results"]["range_reads"]["nwb_file_info"]
+    assert compare_to_baseline(results, results, tolerance=0.0) == []
+
+def test_compare_to_baseline_flags_slowdowns():
+    """Test that only timings slower than the tolerance are reported"""
+    baseline = {"results": {"a": {"p50_seconds": 1.0}, "b": {"seconds": 1.0}}}
+    current = {"results": {"a": {"p50_seconds": 1.1}, "b": {"seconds": 2.0}}}
+    regressions = compare_to_baseline(current, baseline, tolerance=0.25)
+    assert [r["benchmark"] for r in regressions] == ["b.seconds"]
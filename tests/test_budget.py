@@ -0,0 +1,31 @@
+"""
+Tests for the limits of a generation run
+"""
+
+import time
+import pytest
+from dandi_notebook_gen.budget import Budget, BudgetExceeded
+
+def test_budget_within_limits():
+    """Test that an unlimited or unspent budget passes"""
+    Budget().check()
+    Budget(max_seconds=60, max_prompt_tokens=100, max_cost=1.0).check()
+    assert not Budget().limited
+
+def test_budget_limits():
+    """Test that each limit is reported by name"""
+    budget = Budget(max_prompt_tokens=100)
+    budget.prompt_tokens, budget.vision_prompt_tokens = 90, 10
+    with pytest.raises(BudgetExceeded) as e:
+        budget.check()
+    assert e.value.limit == "max_prompt_tokens"
+
+    budget = Budget(max_cost=0.5)
+    budget.cost = 0.6
+    with pytest.raises(BudgetExceeded) as e:
+        budget.check()
+    assert e.value.limit == "max_cost"
+
+    with pytest.raises(BudgetExceeded) as e:
+        Budget(max_seconds=10, start_time=time.time() - 11).check()
+    assert e.value.limit == "max_seconds"
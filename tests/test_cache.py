@@ -0,0 +1,69 @@
+"""
+Tests for the on-disk response cache
+"""
+
+import os
+import time
+from dandi_notebook_gen.cache import DiskCache, ttl_for_version
+
+def test_get_set_roundtrip(tmp_path):
+    """Test that stored values are returned for the same key"""
+    cache = DiskCache("test", directory=tmp_path)
+    key = ["dandiset_info", "http://example", "000001", "draft"]
+    assert cache.get(key) is None
+    cache.set(key, {"name": "Test Dandiset"})
+    assert cache.get(key) == {"name": "Test Dandiset"}
+    assert cache.get(key + ["other"]) is None
+
+def test_ttl_expiry(tmp_path):
+    """Test that entries older than the ttl are treated as missing"""
+    cache = DiskCache("test", directory=tmp_path)
+    cache.set("key", 1)
+    assert cache.get("key", ttl=60) == 1
+    time.sleep(0.05)
+    assert cache.get("key", ttl=0.01) is None
+    assert cache.get("key") is None
+
+def test_published_versions_never_expire():
+    """Test that only the draft version gets a ttl"""
+    assert ttl_for_version("draft") is not None
+    assert ttl_for_version("0.220127.2115") is None
+
+def test_lru_eviction(tmp_path):
+    """Test that the least recently used entries are evicted first"""
+    cache = DiskCache("test", directory=tmp_path, max_bytes=10_000)
+    value = "x" * 3000
+    cache.set("a", value)
+    cache.set("b", value)
+    # make "a" older than "b", then touch "a" so "b" becomes least recently used
+    for i, key in enumerate(["a", "b"]):
+        t = time.time() - 100 + i
+        os.utime(cache._entry_path(key), (t, t))
+    assert cache.get("a") == value
+    cache.set("c", value)
+    cache.set("d", value)
+    assert cache.get("b") is None
+    assert cache.get("a") == value
+    assert cache.stats()["total_bytes"] <= 10_000
+
+def test_writes_keep_a_running_total(tmp_path):
+    """Test that writes below the bound do not scan the directory and overwrites are not counted twice"""
+    cache = DiskCache("test", directory=tmp_path, max_bytes=100_000)
+    cache.set("a", "x" * 1000)
+    scans = []
+    entries = cache._entries
+    cache._entries = lambda: scans.append(1) or entries()
+    for i in range(20):
+        cache.set(f"k{i % 5}", "x" * 1000)
+    assert scans == []
+    assert cache._total_bytes == cache.stats()["total_bytes"]
+    assert cache.stats()["num_entries"] == 6
+
+def test_clear(tmp_path):
+    """Test that clear removes every entry"""
+    cache = DiskCache("test", directory=tmp_path)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.stats()["num_entries"] == 2
+    assert cache.clear() == 2
+    assert cache.stats()["num_entries"] == 0
@@ -144,6 +144,49 @@ def test_dandiset_assets_command(mock_dandiset_assets):
     assert len(output_data["results"]) == 2
     assert output_data["results"][0]["asset_id"] == "asset1"
 
+@patch('dandi_notebook_gen.tools.iter_dandiset_assets')
+def test_dandiset_assets_all_command(mock_iter_dandiset_assets):
+    """Test the dandiset-assets subcommand with --all"""
+    # Mock the iter_dandiset_assets function
+    mock_iter_dandiset_assets.return_value = iter(SAMPLE_ASSETS["results"])
+
+    runner = CliRunner()
+    result = runner.invoke(cli, ["dandiset-assets", "000001", "--all"])
+
+    # Check that the command executed successfully
+    assert result.exit_code == 0
+
+    # Check that each asset is printed on its own line
+    lines = result.output.strip().splitlines()
+    assert [json.loads(line) for line in lines] == SAMPLE_ASSETS["results"]
+
+@patch('dandi_notebook_gen.tools.dandiset_assets')
+def test_dandiset_assets_compact_command(mock_dandiset_assets):
+    """Test the dandiset-assets subcommand with --format compact and --fields"""
+    mock_dandiset_assets.return_value = SAMPLE_ASSETS
+
+    runner = CliRunner()
+    result = runner.invoke(cli, ["dandiset-assets", "000001", "--format", "compact", "--fields", "path,size"])
+
+    assert result.exit_code == 0
+    assert result.output.splitlines() == [
+        '{"count":2,"fields":["path","size"]}',
+        '["file1.nwb","0.977 KiB"]',
+        '["file2.nwb","1.95 KiB"]',
+    ]
+
+@patch('dandi_notebook_gen.tools.dandiset_info')
+def test_dandiset_info_default_format_from_env(mock_dandiset_info, monkeypatch):
+    """Test that DANDI_NOTEBOOK_GEN_OUTPUT_FORMAT sets the default format"""
+    mock_dandiset_info.return_value = SAMPLE_DANDISET_INFO
+    monkeypatch.setenv("DANDI_NOTEBOOK_GEN_OUTPUT_FORMAT", "tsv")
+
+    runner = CliRunner()
+    result = runner.invoke(cli, ["dandiset-info", "000001", "--fields", "name,version"])
+
+    assert result.exit_code == 0
+    assert result.output == "name\tTest Dandiset\nversion\tdraft\n"
+
 @patch('dandi_notebook_gen.tools.nwb_file_info')
 def test_nwb_file_info_command(mock_nwb_file_info):
     """Test the nwb-file-info subcommand"""
@@ -166,6 +209,45 @@ def test_nwb_file_info_command(mock_nwb_file_info):
     assert output_data["metadata"]["identifier"] == "TEST-NWB-001"
     assert "neurodata_objects" in output_data
 
+@patch('dandi_notebook_gen.tools.nwb_files_info')
+def test_nwb_file_info_multiple_urls_command(mock_nwb_files_info):
+    """Test the nwb-file-info subcommand with several URLs"""
+    urls = [
+        "https://api.dandiarchive.org/api/assets/asset1/download/",
+        "https://api.dandiarchive.org/api/assets/asset2/download/"
+    ]
+    # Mock the nwb_files_info function
+    mock_nwb_files_info.return_value = {urls[0]: "# script 1", urls[1]: "# script 2"}
+
+    runner = CliRunner()
+    result = runner.invoke(cli, ["nwb-file-info", "000001", *urls])
+
+    # Check that the command executed successfully
+    assert result.exit_code == 0
+
+    # Check that each script is printed under its URL
+    assert f"# ===== {urls[0]} =====\n# script 1" in result.output
+    assert f"# ===== {urls[1]} =====\n# script 2" in result.output
+    assert mock_nwb_files_info.call_args.kwargs["nwb_file_urls"] == urls
+
+@patch('dandi_notebook_gen.tools.nwb_file_info')
+def test_nwb_file_info_budget_command(mock_nwb_file_info):
+    """Test that nwb-file-info summarizes long scripts to --max-chars"""
+    lines = ["import pynwb", "nwb = io.read()", "nwb.acquisition # (LabelledDict)"]
+    lines += [f'nwb.acquisition["TimeSeries{i}"].data # (Dataset) shape (100,); dtype float64' for i in range(100)]
+    mock_nwb_file_info.return_value = "\n".join(lines)
+
+    runner = CliRunner()
+    url = "https://api.dandiarchive.org/api/assets/asset1/download/"
+    result = runner.invoke(cli, ["nwb-file-info", "000001", url, "--max-chars", "500"])
+    assert result.exit_code == 0
+    assert len(result.output) <= 501
+    assert "# Summarized to fit 500 characters" in result.output
+
+    result = runner.invoke(cli, ["nwb-file-info", "000001", url, "--expand", 'nwb.acquisition["TimeSeries42"]'])
+    assert result.exit_code == 0
+    assert result.output == 'import pynwb\nnwb = io.read()\nnwb.acquisition["TimeSeries42"].data # (Dataset) shape (100,); dtype float64\n'
+
 def test_main_function():
     """Test that the main function calls the cli function"""
     runner = CliRunner()
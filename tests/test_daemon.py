@@ -0,0 +1,95 @@
+"""
+Tests for the resident tool daemon
+"""
+
+import json
+import pytest
+from click.testing import CliRunner
+from dandi_notebook_gen import daemon
+from dandi_notebook_gen.cli import cli
+
+SAMPLE_DANDISET_INFO = {"name": "Test Dandiset", "id": "DANDI:000001/draft", "version": "draft"}
+
+@pytest.fixture
+def running(tmp_path, monkeypatch, standin):
+    """A daemon on a private socket, talking to the stand-in for the API"""
+    standin.dandiset_info = SAMPLE_DANDISET_INFO
+    socket_path = str(tmp_path / "d.sock")
+    monkeypatch.setenv("DANDI_NOTEBOOK_GEN_DAEMON_SOCKET", socket_path)
+    proc = daemon.start_daemon(socket_path)
+    yield socket_path
+    daemon.stop_daemon(proc, socket_path)
+
+def test_call_without_daemon(tmp_path):
+    """Test that calls fail with DaemonUnavailable when nothing is listening"""
+    with pytest.raises(daemon.DaemonUnavailable):
+        daemon.call("ping", socket_path=str(tmp_path / "missing.sock"))
+    assert not daemon.is_running(str(tmp_path / "missing.sock"))
+
+def test_daemon_serves_and_caches(running, standin):
+    """Test that tool calls are answered by the daemon and repeated ones come from memory"""
+    assert daemon.is_running(running)
+    assert daemon.call("dandiset_info", dandiset_id="000001") == SAMPLE_DANDISET_INFO
+    assert daemon.call("dandiset_info", dandiset_id="000001") == SAMPLE_DANDISET_INFO
+    assert standin.stats["api_requests"] == 1
+    with pytest.raises(RuntimeError, match="Unknown command"):
+        daemon.call("no_such_command")
+
+def test_cli_forwards_to_daemon(running):
+    """Test that the CLI uses the daemon when it is running"""
+    runner = CliRunner()
+    result = runner.invoke(cli, ["dandiset-info", "000001"])
+    assert result.exit_code == 0
+    assert json.loads(result.output) == SAMPLE_DANDISET_INFO
+    stats = daemon.call("stats")
+    assert stats["http"]["requests"] == 1
+
+def test_stop_daemon(running):
+    """Test that the daemon shuts down and removes its socket"""
+    daemon.stop_daemon(socket_path=running)
+    assert not daemon.is_running(running)
+
+def test_client_disconnect_interrupts_notebook(running, tmp_path):
+    """Test that a notebook whose client went away is interrupted and its kernel released"""
+    import socket
+    import time
+    pytest.importorskip("ipykernel")
+    pytest.importorskip("jupytext")
+    path = tmp_path / "nb.py"
+    path.write_text("# %%\nimport time\ntime.sleep(60)\n")
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.connect(running)
+    request = {"command": "execute_notebook", "kwargs": {"notebook_path": str(path), "use_cache": False}}
+    sock.sendall(json.dumps(request).encode("utf-8") + b"\n")
+    time.sleep(3)
+    sock.close()
+
+    path.write_text("# %%\nx = 1\n")
+    start = time.time()
+    result = daemon.call("execute_notebook", timeout=30, arguments={"notebook_path": str(path), "timeout": 30, "use_cache": False})
+    assert result["error"] is None
+    assert time.time() - start < 30
+
+def test_keep_alive_lines_are_skipped(tmp_path):
+    """Test that the client reads past the keep-alive lines sent before the answer"""
+    import socket
+    import threading
+    socket_path = str(tmp_path / "k.sock")
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(socket_path)
+    listener.listen(1)
+
+    def answer():
+        conn, _ = listener.accept()
+        with conn, conn.makefile("rwb") as f:
+            f.readline()
+            f.write(b"\n\n" + json.dumps({"ok": True, "result": 42}).encode("utf-8") + b"\n")
+            f.flush()
+
+    thread = threading.Thread(target=answer, daemon=True)
+    thread.start()
+    try:
+        assert daemon.call("execute_notebook", socket_path=socket_path, timeout=5) == 42
+    finally:
+        thread.join()
+        listener.close()
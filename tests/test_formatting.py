@@ -0,0 +1,89 @@
+"""
+Tests for the output formats of the tools CLI
+"""
+
+import json
+import os
+import pytest
+from dandi_notebook_gen.formatting import (
+    FORMAT_ENV,
+    default_output_format,
+    format_records,
+    format_result,
+    get_default_format,
+    human_size,
+)
+
+LISTING = {
+    "count": 2,
+    "results": [
+        {"asset_id": "a1", "path": "sub-01/sub-01_ecephys.nwb", "size": 1843200512},
+        {"asset_id": "a2", "path": "sub-02/sub-02\tecephys.nwb", "size": 52428800},
+    ],
+}
+
+INFO = {
+    "name": "Test Dandiset",
+    "keywords": ["mouse", "ecephys"],
+    "assetsSummary": {"numberOfBytes": 1099511627776, "numberOfFiles": 2},
+}
+
+def test_human_size():
+    """Test that byte counts are rounded to three significant digits"""
+    assert human_size(0) == "0 B"
+    assert human_size(999) == "999 B"
+    assert human_size(1843200512) == "1.72 GiB"
+    assert human_size(52428800) == "50 MiB"
+    assert human_size(1099511627776) == "1 TiB"
+    assert human_size("n/a") == "n/a"
+
+def test_listing_formats():
+    """Test that every format carries the same assets"""
+    assert json.loads(format_result(LISTING, "json")) == LISTING
+    lines = format_result(LISTING, "ndjson").splitlines()
+    assert [json.loads(line) for line in lines] == [{"count": 2}] + LISTING["results"]
+    lines = format_result(LISTING, "tsv", fields=["path", "size"]).splitlines()
+    assert lines == ["# count: 2", "path\tsize", "sub-01/sub-01_ecephys.nwb\t1843200512", "sub-02/sub-02\\tecephys.nwb\t52428800"]
+    lines = format_result(LISTING, "compact").splitlines()
+    assert json.loads(lines[0]) == {"count": 2, "fields": ["asset_id", "path", "size"]}
+    assert json.loads(lines[1]) == ["a1", "sub-01/sub-01_ecephys.nwb", "1.72 GiB"]
+    assert len(format_result(LISTING, "compact")) < 0.6 * len(format_result(LISTING, "json"))
+
+def test_exact_sizes_in_compact_format():
+    """Test that compact output keeps exact sizes when asked to"""
+    lines = format_result(LISTING, "compact", fields=["size"], human_sizes=False).splitlines()
+    assert lines[1:] == ["[1843200512]", "[52428800]"]
+
+def test_info_fields_and_flattening():
+    """Test dotted field projection and the key/value rows of tsv"""
+    assert json.loads(format_result(INFO, "compact", fields=["name", "assetsSummary.numberOfBytes"])) == {
+        "name": "Test Dandiset",
+        "assetsSummary.numberOfBytes": "1 TiB",
+    }
+    assert format_result(INFO, "tsv").splitlines() == [
+        "name\tTest Dandiset",
+        "keywords\tmouse, ecephys",
+        "assetsSummary.numberOfBytes\t1099511627776",
+        "assetsSummary.numberOfFiles\t2",
+    ]
+
+def test_format_records_streams_lazily():
+    """Test that the header is written before the records are consumed"""
+    def records():
+        yield {"path": "a.nwb", "size": 1}
+        raise RuntimeError("not consumed")
+    lines = format_records(records(), "tsv")
+    assert next(lines) == "path\tsize"
+    assert next(lines) == "a.nwb\t1"
+    assert list(format_records([], "compact", fields=["path"])) == ['{"fields":["path"]}']
+
+def test_default_output_format(monkeypatch):
+    """Test that the default format is set and restored"""
+    monkeypatch.delenv(FORMAT_ENV, raising=False)
+    assert get_default_format() == "json"
+    with default_output_format("compact"):
+        assert get_default_format() == "compact"
+    assert FORMAT_ENV not in os.environ
+    with pytest.raises(ValueError):
+        with default_output_format("yaml"):
+            pass
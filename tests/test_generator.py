@@ -0,0 +1,324 @@
+"""
+Tests for the generator module
+"""
+
+import json
+import os
+from types import SimpleNamespace
+from unittest.mock import patch
+import pytest
+from dandi_notebook_gen import generator
+
+def fake_perform_task(instructions, *, cwd, **kwargs):
+    """Stand-in for minicline.perform_task that creates notebook.ipynb"""
+    with open(os.path.join(cwd, "instructions.txt"), "w") as f:
+        f.write(instructions)
+    with open(os.path.join(cwd, "notebook.ipynb"), "w") as f:
+        json.dump({"cells": []}, f)
+    return SimpleNamespace(
+        total_prompt_tokens=1000,
+        total_completion_tokens=100,
+        total_vision_prompt_tokens=10,
+        total_vision_completion_tokens=1
+    )
+
+@patch.object(generator, "perform_task", fake_perform_task)
+def test_generate_notebook_writes_output_and_metadata(tmp_path):
+    """Test that the notebook is copied to the output path and metadata.json is written"""
+    working_dir = tmp_path / "work"
+    output_path = str(tmp_path / "out.ipynb")
+    assert generator.generate_notebook("000001", output_path, working_dir=str(working_dir)) == output_path
+    assert os.path.exists(output_path)
+    with open(working_dir / "metadata.json") as f:
+        metadata = json.load(f)
+    assert metadata["total_prompt_tokens"] == 1000
+    assert "000001" in (working_dir / "instructions.txt").read_text()
+
+@patch.object(generator, "perform_task", fake_perform_task)
+def test_generate_notebook_with_prefetch(tmp_path):
+    """Test that prefetched results are injected and reported in metadata.json"""
+    report = {
+        "texts": {"dandiset_info.json": "{\"name\": \"Test Dandiset\"}"},
+        "files": ["prefetch/dandiset_info.json"],
+        "nwb_file_url": "https://example.org/file.nwb",
+        "num_assets": 1,
+        "elapsed_seconds": 1.0,
+        "sequential_seconds": 1.5,
+    }
+    working_dir = tmp_path / "work"
+    with patch.object(generator, "prefetch_context", lambda dandiset_id, working_dir: report):
+        generator.generate_notebook("000001", str(tmp_path / "out.ipynb"), working_dir=str(working_dir), prefetch="inline")
+    assert "Test Dandiset" in (working_dir / "instructions.txt").read_text()
+    with open(working_dir / "metadata.json") as f:
+        metadata = json.load(f)
+    assert metadata["prefetch"]["mode"] == "inline"
+    assert metadata["prefetch"]["tool_calls_saved"] == 3
+
+def test_generate_notebook_rejects_unknown_prefetch_mode():
+    """Test that an invalid prefetch mode is rejected up front"""
+    with pytest.raises(ValueError):
+        generator.generate_notebook("000001", "out.ipynb", prefetch="bogus")
+
+def test_generate_notebook_records_phase_breakdown(tmp_path, monkeypatch):
+    """Test that model and tool calls made by the agent end up in metadata.json"""
+    import minicline.core
+
+    monkeypatch.setattr(minicline.core, "run_completion", lambda messages, *, model, **kwargs: ("", messages, 50, 5))
+    monkeypatch.setattr(minicline.core, "execute_tool", lambda tool_name, params, cwd, **kwargs: ("", "Command executed successfully\n", None, True, 0, 0))
+
+    def perform_task(instructions, *, cwd, **kwargs):
+        minicline.core.run_completion([], model="m")
+        minicline.core.execute_tool("execute_command", {"command": "python explore/script.py"}, cwd)
+        return fake_perform_task(instructions, cwd=cwd, **kwargs)
+
+    working_dir = tmp_path / "work"
+    with patch.object(generator, "perform_task", perform_task):
+        generator.generate_notebook("000001", str(tmp_path / "out.ipynb"), working_dir=str(working_dir))
+    with open(working_dir / "metadata.json") as f:
+        metadata = json.load(f)
+    assert metadata["trace_file"] == "trace.jsonl"
+    assert metadata["phases"]["model"]["count"] == 1
+    assert metadata["phases"]["exploratory_scripts"]["count"] == 1
+    assert os.path.exists(working_dir / "trace.jsonl")
+    assert metadata["prompt_cache"]["uncached_prompt_tokens"] == 50
+
+def test_generate_notebook_if_changed(tmp_path):
+    """Test that --if-changed keeps the output until the version or model changes"""
+    calls = []
+
+    def counting_perform_task(instructions, *, cwd, **kwargs):
+        calls.append(cwd)
+        return fake_perform_task(instructions, cwd=cwd, **kwargs)
+
+    output_path = str(tmp_path / "out.ipynb")
+    version = {"value": "0.240101.0000"}
+    with patch.object(generator, "perform_task", counting_perform_task), \
+            patch.object(generator, "resolve_version", lambda dandiset_id: version["value"]):
+        generator.generate_notebook("000001", output_path, if_changed=True)
+        generator.generate_notebook("000001", output_path, if_changed=True)
+        assert len(calls) == 1
+        with open(tmp_path / "dandi-notebook-gen-manifest.json") as f:
+            assert json.load(f)["000001"]["key"]["resolved_version"] == "0.240101.0000"
+
+        generator.generate_notebook("000001", output_path, model="other/model", if_changed=True)
+        assert len(calls) == 2
+
+        version["value"] = "0.240202.0000"
+        generator.generate_notebook("000001", output_path, model="other/model", if_changed=True)
+        assert len(calls) == 3
+
+        # without --if-changed the notebook is always regenerated
+        generator.generate_notebook("000001", output_path, model="other/model")
+        assert len(calls) == 4
+
+        os.remove(output_path)
+        generator.generate_notebook("000001", output_path, model="other/model", if_changed=True)
+        assert len(calls) == 5
+
+def test_generate_notebook_restores_proxied_urls(tmp_path, monkeypatch):
+    """Test that URLs the agent used through the range proxy are restored in the output"""
+    monkeypatch.setenv("DANDI_NOTEBOOK_GEN_CACHE_DIR", str(tmp_path / "cache"))
+
+    def perform_task(instructions, *, cwd, **kwargs):
+        from dandi_notebook_gen.range_proxy import proxied_url
+        url = proxied_url("https://api.dandiarchive.org/api/assets/abc/download/")
+        assert url.startswith("http://127.0.0.1:")
+        result = fake_perform_task(instructions, cwd=cwd, **kwargs)
+        with open(os.path.join(cwd, "notebook.ipynb"), "w") as f:
+            json.dump({"cells": [{"cell_type": "code", "source": f'url = "{url}"'}]}, f)
+        return result
+
+    output_path = str(tmp_path / "out.ipynb")
+    with patch.object(generator, "perform_task", perform_task):
+        generator.generate_notebook("000001", output_path, working_dir=str(tmp_path / "work"), no_container=True)
+    with open(output_path) as f:
+        assert json.load(f)["cells"][0]["source"] == 'url = "https://api.dandiarchive.org/api/assets/abc/download/"'
+    assert "DANDI_NOTEBOOK_GEN_RANGE_PROXY" not in os.environ
+
+def test_generate_notebook_skips_range_proxy_in_container(tmp_path, monkeypatch):
+    """Test that the proxy is not started when the agent's commands run in a Docker container"""
+    monkeypatch.setenv("DANDI_NOTEBOOK_GEN_CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.delenv("MINICLINE_USE_APPTAINER", raising=False)
+    seen = {}
+
+    def perform_task(instructions, *, cwd, **kwargs):
+        seen["proxy"] = os.environ.get("DANDI_NOTEBOOK_GEN_RANGE_PROXY")
+        seen["no_container"] = kwargs["no_container"]
+        return fake_perform_task(instructions, cwd=cwd, **kwargs)
+
+    with patch.object(generator, "perform_task", perform_task):
+        generator.generate_notebook("000001", str(tmp_path / "out.ipynb"), working_dir=str(tmp_path / "work"))
+    assert seen == {"proxy": None, "no_container": False}
+
+def test_container_note_only_when_host_features_are_requested(tmp_path, monkeypatch, capsys):
+    """Test that the note about the container is only printed when a host-only feature was asked for"""
+    monkeypatch.delenv("MINICLINE_USE_APPTAINER", raising=False)
+    with patch.object(generator, "perform_task", fake_perform_task):
+        generator.generate_notebook("000001", str(tmp_path / "out.ipynb"), working_dir=str(tmp_path / "work"))
+        assert "run in a container" not in capsys.readouterr().out
+        generator.generate_notebook("000001", str(tmp_path / "out.ipynb"), working_dir=str(tmp_path / "work"), range_cache=True)
+        assert "run in a container" in capsys.readouterr().out
+
+def test_generate_notebook_sets_compact_tool_output(tmp_path):
+    """Test that the tools the agent runs default to the compact output format"""
+    seen = {}
+
+    def perform_task(instructions, *, cwd, **kwargs):
+        seen["format"] = os.environ.get("DANDI_NOTEBOOK_GEN_OUTPUT_FORMAT")
+        return fake_perform_task(instructions, cwd=cwd, **kwargs)
+
+    with patch.object(generator, "perform_task", perform_task):
+        generator.generate_notebook("000001", str(tmp_path / "out.ipynb"), working_dir=str(tmp_path / "work"), range_cache=False)
+    assert seen["format"] == "compact"
+    assert "DANDI_NOTEBOOK_GEN_OUTPUT_FORMAT" not in os.environ
+
+def test_generate_notebook_resumes_from_checkpoint(tmp_path, monkeypatch):
+    """Test that an interrupted run continues the checkpointed conversation"""
+    import minicline.core
+
+    received = []
+    def run_completion(messages, *, model, **kwargs):
+        received.append(messages)
+        return "reply", list(messages) + [{"role": "assistant", "content": "reply"}], 50, 5
+    monkeypatch.setattr(minicline.core, "run_completion", run_completion)
+
+    def perform_task(instructions, *, cwd, **kwargs):
+        messages = [{"role": "system", "content": "system"}, {"role": "user", "content": [{"type": "text", "text": instructions}]}]
+        for step in range(2):
+            _, messages, _, _ = minicline.core.run_completion(messages, model="m")
+            messages.append({"role": "user", "content": [{"type": "text", "text": f"result {step}"}]})
+            if step == 1 and not os.path.exists(os.path.join(cwd, "partial.txt")):
+                open(os.path.join(cwd, "partial.txt"), "w").close()
+                raise RuntimeError("connection reset")
+        return fake_perform_task(instructions, cwd=cwd, **kwargs)
+
+    working_dir = tmp_path / "work"
+    with patch.object(generator, "perform_task", perform_task):
+        with pytest.raises(RuntimeError):
+            generator.generate_notebook("000001", str(tmp_path / "out.ipynb"), working_dir=str(working_dir))
+        assert (working_dir / "checkpoint.json").exists()
+        received.clear()
+        generator.generate_notebook("000001", str(tmp_path / "out.ipynb"), working_dir=str(working_dir), resume=True)
+    # the first call continued the interrupted conversation, which ended with the first tool result
+    texts = [block["text"] for block in received[0][-1]["content"]]
+    assert texts[0] == "result 0" and "resumed" in texts[-1]
+    assert not (working_dir / "checkpoint.json").exists()
+    with open(working_dir / "metadata.json") as f:
+        metadata = json.load(f)
+    assert metadata["resumed_from_checkpoint"]["num_completions"] == 1
+    assert metadata["total_prompt_tokens"] == 1000 + 50
+
+def test_resume_requires_working_dir():
+    """Test that a temporary working directory cannot be resumed"""
+    with pytest.raises(ValueError):
+        generator.generate_notebook("000001", "out.ipynb", resume=True)
+
+def test_generate_notebook_ends_run_at_budget(tmp_path, monkeypatch):
+    """Test that reaching max_prompt_tokens keeps the partial notebook and marks it"""
+    import minicline.core
+
+    monkeypatch.setattr(minicline.core, "run_completion", lambda messages, *, model, **kwargs: ("", list(messages), 50, 5))
+
+    def perform_task(instructions, *, cwd, **kwargs):
+        messages = [{"role": "system", "content": "system"}, {"role": "user", "content": instructions}]
+        with open(os.path.join(cwd, "notebook.py"), "w") as f:
+            f.write("# %% [markdown]\n# # Partial\n\n# %%\nx = 1\n")
+        while True:
+            _, messages, _, _ = minicline.core.run_completion_with_retries(messages, model="m", num_retries=5)
+
+    working_dir = tmp_path / "work"
+    output_path = str(tmp_path / "out.ipynb")
+    with patch.object(generator, "perform_task", perform_task):
+        generator.generate_notebook("000001", output_path, working_dir=str(working_dir), max_prompt_tokens=120)
+    with open(output_path) as f:
+        assert json.load(f)["cells"][0]["cell_type"] == "markdown"
+    with open(working_dir / "metadata.json") as f:
+        metadata = json.load(f)
+    assert metadata["partial"] and metadata["budget_exceeded"] == "max_prompt_tokens"
+    assert metadata["total_prompt_tokens"] == 150
+    assert (working_dir / "checkpoint.json").exists()
+
+def test_partial_notebook_is_regenerated_if_changed(tmp_path, monkeypatch):
+    """Test that a run ended by the budget is not recorded as up to date for --if-changed"""
+    import minicline.core
+
+    monkeypatch.setattr(minicline.core, "run_completion", lambda messages, *, model, **kwargs: ("", list(messages), 50, 5))
+    calls = []
+
+    def perform_task(instructions, *, cwd, **kwargs):
+        calls.append(cwd)
+        messages = [{"role": "system", "content": "system"}, {"role": "user", "content": instructions}]
+        with open(os.path.join(cwd, "notebook.py"), "w") as f:
+            f.write("# %%\nx = 1\n")
+        while True:
+            _, messages, _, _ = minicline.core.run_completion_with_retries(messages, model="m", num_retries=5)
+
+    output_path = str(tmp_path / "out.ipynb")
+    with patch.object(generator, "perform_task", perform_task), \
+            patch.object(generator, "resolve_version", lambda dandiset_id: "0.240101.0000"):
+        generator.generate_notebook("000001", output_path, if_changed=True, max_prompt_tokens=120)
+        assert os.path.exists(output_path)
+        assert not os.path.exists(tmp_path / "dandi-notebook-gen-manifest.json")
+        generator.generate_notebook("000001", output_path, if_changed=True, max_prompt_tokens=120)
+    assert len(calls) == 2
+
+def test_generate_notebook_reports_vision_savings(tmp_path, monkeypatch):
+    """Test that a repeated image is described once and the saved vision tokens are recorded"""
+    import minicline.core
+    from minicline.tools import read_image as read_image_module
+    from tests.test_vision import plot_png
+
+    monkeypatch.setenv("DANDI_NOTEBOOK_GEN_CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setattr(read_image_module, "_get_ai_description", lambda data_url, **kwargs: ("a plot", 700, 30))
+
+    def perform_task(instructions, *, cwd, vision_model, **kwargs):
+        with open(os.path.join(cwd, "plot.png"), "wb") as f:
+            f.write(plot_png(2400, 1800))
+        for _ in range(2):
+            result = minicline.core.execute_tool("read_image", {"path": "plot.png"}, cwd, True, False, vision_model, True)
+            assert "a plot" in result[1]
+        return fake_perform_task(instructions, cwd=cwd)
+
+    working_dir = tmp_path / "work"
+    with patch.object(generator, "perform_task", perform_task):
+        generator.generate_notebook("000001", str(tmp_path / "out.ipynb"), working_dir=str(working_dir), range_cache=False)
+    with open(working_dir / "metadata.json") as f:
+        vision = json.load(f)["vision"]
+    assert vision["max_image_size"] == 1024
+    assert vision["num_images"] == 2 and vision["num_downsampled"] == 2 and vision["num_cache_hits"] == 1
+    assert vision["saved_vision_prompt_tokens"] == 700 and vision["saved_vision_completion_tokens"] == 30
+    assert vision["bytes_out"] < vision["bytes_in"]
+
+def test_generate_notebook_keeps_kernels_warm_on_host(tmp_path, monkeypatch):
+    """Test that a daemon is started by default for commands on the host, and only then are fast re-runs promised"""
+    from contextlib import contextmanager
+    monkeypatch.delenv("DANDI_NOTEBOOK_GEN_DAEMON_SOCKET", raising=False)
+    monkeypatch.delenv("MINICLINE_USE_APPTAINER", raising=False)
+    started = []
+
+    @contextmanager
+    def running_daemon():
+        started.append(True)
+        yield "daemon.sock"
+    monkeypatch.setattr(generator, "running_daemon", running_daemon)
+
+    with patch.object(generator, "perform_task", fake_perform_task):
+        generator.generate_notebook("000001", str(tmp_path / "out.ipynb"), working_dir=str(tmp_path / "host"),
+                                    no_container=True, range_cache=False)
+        generator.generate_notebook("000001", str(tmp_path / "out.ipynb"), working_dir=str(tmp_path / "container"))
+    assert started == [True]
+    assert generator.WARM_KERNEL_NOTE in (tmp_path / "host" / "instructions.txt").read_text()
+    container_instructions = (tmp_path / "container" / "instructions.txt").read_text()
+    assert generator.WARM_KERNEL_NOTE not in container_instructions
+    assert "{{" not in container_instructions.replace("{{ ASSET_ID }}", "")
+
+@pytest.mark.parametrize("experimental_mode", [True, False])
+def test_instructions_describe_the_selected_asset_format(experimental_mode):
+    """Test that the description of the asset listing follows the tool output format"""
+    compact = generator.read_instructions(experimental_mode, tool_output_format="compact")
+    assert generator.ASSETS_FORMAT_NOTES["compact"] in compact
+    tsv = generator.read_instructions(experimental_mode, tool_output_format="tsv")
+    assert "tab-separated" in tsv and "compactly" not in tsv
+    default = generator.read_instructions(experimental_mode)
+    assert "compactly" not in default and "{{ ASSETS_FORMAT_NOTE }}" not in default
+    assert "Use `--page 2`" in default
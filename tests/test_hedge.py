@@ -0,0 +1,90 @@
+"""
+Tests for hedged notebook generation
+"""
+
+import json
+import os
+import time
+from unittest.mock import patch
+import pytest
+from dandi_notebook_gen import generator
+from dandi_notebook_gen.hedge import executed_cleanly, race_candidates
+
+def write_notebook(path, outputs):
+    with open(path, "w") as f:
+        json.dump({"cells": [
+            {"cell_type": "markdown", "source": "# Title"},
+            {"cell_type": "code", "execution_count": 1, "outputs": outputs, "source": "x = 1"},
+        ]}, f)
+
+def fake_generate_notebook(dandiset_id, output_path=None, *, model, working_dir=None, **kwargs):
+    """Stand-in for generate_notebook whose behavior depends on the model"""
+    if model == "slow":
+        time.sleep(60)
+    if model == "failing":
+        raise RuntimeError("notebook.ipynb was not created")
+    if model == "good":
+        time.sleep(0.5)
+    with open(os.path.join(working_dir, "metadata.json"), "w") as f:
+        json.dump({"total_prompt_tokens": 100, "total_completion_tokens": 10}, f)
+    write_notebook(output_path, [{"output_type": "error", "ename": "KeyError"}] if model == "broken" else [])
+    return output_path
+
+def test_executed_cleanly(tmp_path):
+    """Test that unexecuted cells and error outputs are detected"""
+    path = str(tmp_path / "nb.ipynb")
+    write_notebook(path, [{"output_type": "stream", "text": "ok"}])
+    assert executed_cleanly(path)
+    write_notebook(path, [{"output_type": "error", "ename": "KeyError"}])
+    assert not executed_cleanly(path)
+    assert not executed_cleanly(str(tmp_path / "missing.ipynb"))
+
+@patch.object(generator, "generate_notebook", fake_generate_notebook)
+def test_race_keeps_first_clean_notebook(tmp_path):
+    """Test that a broken notebook does not win and slow candidates are cancelled"""
+    output_path = str(tmp_path / "out.ipynb")
+    start = time.time()
+    metadata = race_candidates("000001", output_path, str(tmp_path), num_candidates=4,
+                               models=["broken", "good", "slow", "failing"], options={})
+    assert time.time() - start < 30
+    assert metadata["winner"] == 2 and metadata["winner_model"] == "good"
+    statuses = [c["status"] for c in metadata["candidates"]]
+    assert statuses == ["finished_with_errors", "won", "cancelled", "failed"]
+    assert executed_cleanly(output_path)
+    assert metadata["total_prompt_tokens"] == 200
+    with open(tmp_path / "metadata.json") as f:
+        assert json.load(f)["winner"] == 2
+
+@patch.object(generator, "generate_notebook", fake_generate_notebook)
+def test_race_falls_back_to_unclean_notebook(tmp_path):
+    """Test that a notebook with errors is used if no candidate executes cleanly"""
+    output_path = str(tmp_path / "out.ipynb")
+    metadata = race_candidates("000001", output_path, str(tmp_path), num_candidates=2,
+                               models=["failing", "broken"], options={})
+    assert metadata["winner"] == 2 and not metadata["winner_executed_cleanly"]
+    assert os.path.exists(output_path)
+
+@patch.object(generator, "generate_notebook", fake_generate_notebook)
+def test_race_without_notebook_raises(tmp_path):
+    """Test that the race fails if no candidate produced a notebook"""
+    with pytest.raises(RuntimeError):
+        race_candidates("000001", str(tmp_path / "out.ipynb"), str(tmp_path), num_candidates=2,
+                        models=["failing"], options={})
+
+def test_candidates_require_auto_mode():
+    """Test that candidates cannot be raced interactively"""
+    with pytest.raises(ValueError):
+        generator.generate_notebook("000001", "out.ipynb", candidates=2)
+
+def test_budget_is_split_between_candidates():
+    """Test that the token and cost limits bound the whole race"""
+    received = {}
+    def fake_race(dandiset_id, output_path, working_dir, *, num_candidates, models, options):
+        received.update(options)
+        return {"winner_partial": False}
+    with patch("dandi_notebook_gen.hedge.race_candidates", fake_race):
+        generator.generate_notebook("000001", "out.ipynb", auto=True, candidates=4, use_daemon=False,
+                                    max_seconds=600, max_prompt_tokens=1_000_000, max_cost=2.0)
+    assert received["max_prompt_tokens"] == 250_000
+    assert received["max_cost"] == 0.5
+    assert received["max_seconds"] == 600
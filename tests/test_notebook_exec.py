@@ -0,0 +1,120 @@
+"""
+Tests for incremental notebook execution
+"""
+
+import json
+import pytest
+from click.testing import CliRunner
+from dandi_notebook_gen.cli import cli
+from dandi_notebook_gen.notebook_exec import cell_hashes, execute_notebook, shutdown_kernels
+
+pytest.importorskip("ipykernel")
+pytest.importorskip("nbclient")
+pytest.importorskip("jupytext")
+
+NOTEBOOK = """# %% [markdown]
+# # Test notebook
+
+# %%
+x = 41
+
+# %%
+print(x + 1)
+
+# %%
+y = {last}
+"""
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv("DANDI_NOTEBOOK_GEN_CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setenv("DANDI_NOTEBOOK_GEN_NO_DAEMON", "1")
+    yield
+    shutdown_kernels()
+
+def write_notebook(tmp_path, last="x"):
+    path = tmp_path / "nb.py"
+    path.write_text(NOTEBOOK.format(last=last))
+    return str(path)
+
+def test_cell_hashes_chain():
+    """Test that changing a cell changes its hash and the hashes of all later cells"""
+    a = cell_hashes(["a", "b", "c"], kernel_name="python3", cwd="/tmp")
+    b = cell_hashes(["a", "B", "c"], kernel_name="python3", cwd="/tmp")
+    assert a[0] == b[0]
+    assert a[1] != b[1] and a[2] != b[2]
+
+def test_unchanged_notebook_is_served_from_cache(tmp_path):
+    """Test that a second run of an unchanged notebook executes nothing"""
+    path = write_notebook(tmp_path)
+    first = execute_notebook(path)
+    assert first["error"] is None
+    assert first["num_executed"] == 3
+    second = execute_notebook(path)
+    assert second["num_executed"] == 0
+    assert second["num_cached"] == 3
+    assert second["kernel"] == "none"
+    with open(tmp_path / "nb.ipynb") as f:
+        nb = json.load(f)
+    code_cells = [c for c in nb["cells"] if c["cell_type"] == "code"]
+    assert [c["execution_count"] for c in code_cells] == [1, 2, 3]
+    assert "42" in "".join(code_cells[1]["outputs"][0]["text"])
+
+def test_cache_survives_a_new_proxy_port(tmp_path, monkeypatch):
+    """Test that cells with proxied URLs are served from the cache after the proxy moves"""
+    path = tmp_path / "nb.py"
+    source = '# %%\nurl = "{proxy}/https/api.dandiarchive.org/api/assets/abc/download/"\n'
+    monkeypatch.setenv("DANDI_NOTEBOOK_GEN_RANGE_PROXY", "http://127.0.0.1:40001")
+    path.write_text(source.format(proxy="http://127.0.0.1:40001"))
+    assert execute_notebook(str(path))["num_executed"] == 1
+    monkeypatch.setenv("DANDI_NOTEBOOK_GEN_RANGE_PROXY", "http://127.0.0.1:40002")
+    path.write_text(source.format(proxy="http://127.0.0.1:40002"))
+    assert execute_notebook(str(path))["num_cached"] == 1
+
+def test_warm_kernel_continues_from_the_first_new_cell(tmp_path):
+    """Test that after adding a cell only that cell runs in the warm kernel"""
+    path = write_notebook(tmp_path)
+    assert execute_notebook(path, keep_kernel=True)["error"] is None
+
+    (tmp_path / "nb.py").write_text(NOTEBOOK.format(last="x") + "\n# %%\nprint(y)\n")
+    result = execute_notebook(path, keep_kernel=True)
+    assert result["error"] is None
+    assert result["kernel"] == "warm"
+    assert result["num_executed"] == 1
+    assert result["num_cached"] == 3
+
+def test_failing_cell_discards_the_warm_kernel(tmp_path):
+    """Test that the state a failing cell left behind does not leak into the fixed run"""
+    path = tmp_path / "nb.py"
+    path.write_text("# %%\nx = 41\n\n# %%\nx += 1\nundefined_name\n\n# %%\nprint(x)\n")
+    result = execute_notebook(str(path), keep_kernel=True)
+    assert result["error"]["ename"] == "NameError"
+    assert result["error"]["cell_index"] == 1
+
+    path.write_text("# %%\nx = 41\n\n# %%\nx += 1\n\n# %%\nprint(x)\n")
+    result = execute_notebook(str(path), keep_kernel=True)
+    assert result["error"] is None
+    assert result["kernel"] == "new"
+    assert result["num_executed"] == 3
+    with open(tmp_path / "nb.ipynb") as f:
+        assert "42" in "".join(json.load(f)["cells"][2]["outputs"][0]["text"])
+
+def test_changed_earlier_cell_starts_a_new_kernel(tmp_path):
+    """Test that a kernel that ran a different version of the notebook is not reused"""
+    path = write_notebook(tmp_path)
+    execute_notebook(path, keep_kernel=True)
+    (tmp_path / "nb.py").write_text(NOTEBOOK.format(last="x").replace("x = 41", "x = 1"))
+    result = execute_notebook(path, keep_kernel=True)
+    assert result["kernel"] == "new"
+    assert result["num_executed"] == 3
+
+def test_execute_notebook_command_exit_status(tmp_path):
+    """Test that the command reports the failing cell and exits with status 1"""
+    path = write_notebook(tmp_path, last="undefined_name")
+    result = CliRunner().invoke(cli, ["execute-notebook", path])
+    assert result.exit_code == 1
+    assert (tmp_path / "nb.ipynb").exists()
+    path = write_notebook(tmp_path, last="x")
+    result = CliRunner().invoke(cli, ["execute-notebook", path])
+    assert result.exit_code == 0
+    assert "Executed 3 of 3 code cells" in result.output
@@ -0,0 +1,99 @@
+"""
+Tests for the token-budgeted summaries of NWB usage scripts
+"""
+
+import pytest
+from dandi_notebook_gen.nwb_summary import summarize_usage_script
+
+HEADER = """# This script shows how to load the NWB file at https://api.dandiarchive.org/api/assets/abc/download/ in Python using PyNWB
+
+import pynwb
+import h5py
+import remfile
+
+url = "https://api.dandiarchive.org/api/assets/abc/download/"
+h5_file = h5py.File(remfile.File(url))
+io = pynwb.NWBHDF5IO(file=h5_file)
+nwb = io.read()
+"""
+
+def make_script(num_series=30):
+    lines = [
+        "nwb # (NWBFile)",
+        "nwb.session_description # (str) " + "A long description of the session. " * 5,
+        "nwb.acquisition # (LabelledDict)",
+        "acquisition = nwb.acquisition",
+    ]
+    for i in range(num_series):
+        lines += [
+            f'ElectricalSeries{i} = acquisition["ElectricalSeries{i}"]',
+            f"ElectricalSeries{i} # (ElectricalSeries)",
+            f"ElectricalSeries{i}.rate # (float64) 30000.0",
+            f"ElectricalSeries{i}.data # (Dataset) shape (1000000, 64); dtype float32 first values: 0.1, 0.2, 0.3",
+        ]
+    lines += [
+        "nwb.units # (Units)",
+        "nwb.units.spike_times # (VectorData) " + ", ".join(str(t / 10) for t in range(50)),
+    ]
+    return HEADER + "\n".join(lines) + "\n"
+
+def test_short_scripts_are_unchanged():
+    """Test that a script within the budget is returned as is"""
+    script = make_script(2)
+    assert summarize_usage_script(script) == script
+    assert summarize_usage_script(script, max_chars=len(script)) == script
+
+@pytest.mark.parametrize("max_chars", [3000, 1500, 900, 600, 300])
+def test_summaries_fit_the_budget(max_chars):
+    """Test that every budget is met, the header is kept and the result is deterministic"""
+    script = make_script()
+    summary = summarize_usage_script(script, max_chars=max_chars)
+    assert len(summary) <= max_chars
+    assert summary == summarize_usage_script(script, max_chars=max_chars)
+    assert summary.splitlines()[-1].startswith(f"# Summarized to fit {max_chars} characters")
+    if max_chars >= 900:
+        assert "nwb = io.read()" in summary
+
+def test_repeated_objects_are_collapsed():
+    """Test that siblings with the same structure are listed instead of repeated"""
+    summary = summarize_usage_script(make_script(), max_chars=3000)
+    assert "ElectricalSeries0.data" in summary
+    assert "ElectricalSeries1.data" not in summary
+    assert '# ... and 29 more with the same structure as nwb.acquisition["ElectricalSeries0"]' in summary
+    assert "first values" in summary
+    # with less room, values are replaced by shapes and dtypes
+    summary = summarize_usage_script(make_script(), max_chars=1500)
+    assert "ElectricalSeries0.data # (Dataset) shape (1000000, 64); dtype float32\n" in summary
+    assert "first values" not in summary
+
+def test_outline_and_expand():
+    """Test that a tight budget keeps an outline and that objects can be expanded"""
+    script = make_script()
+    summary = summarize_usage_script(script, max_chars=900)
+    assert "nwb.acquisition # (LabelledDict) [+" in summary
+    assert "ElectricalSeries0.rate" not in summary
+    expanded = summarize_usage_script(script, expand='ElectricalSeries7')
+    assert expanded.startswith(HEADER.rstrip("\n"))
+    assert "acquisition = nwb.acquisition" in expanded
+    assert "ElectricalSeries7.data # (Dataset) shape (1000000, 64)" in expanded
+    assert "ElectricalSeries8" not in expanded
+    assert summarize_usage_script(script, expand="nwb.acquisition['ElectricalSeries7']") == expanded
+    with pytest.raises(ValueError, match="No object nwb.processing"):
+        summarize_usage_script(script, expand="nwb.processing")
+
+@pytest.mark.parametrize("script", [
+    HEADER * 10,
+    make_script().replace("nwb = io.read()", "file = io.read()").replace("nwb", "file"),
+])
+def test_scripts_without_object_lines_are_truncated(script):
+    """Test that header-only scripts and scripts not rooted at nwb are cut to the budget"""
+    summary = summarize_usage_script(script, max_chars=500)
+    assert len(summary) <= 500
+    assert summary.startswith(script[:100])
+    assert summary.splitlines()[-1].startswith("# Summarized to fit 500 characters (truncated)")
+
+def test_long_header_does_not_exceed_the_budget():
+    """Test that a header longer than the budget is truncated too"""
+    script = HEADER.replace("import h5py", "import h5py\n" + "# comment\n" * 100) + "nwb # (NWBFile)\nnwb.units # (Units)\n"
+    for max_chars in (500, 80, 20):
+        assert len(summarize_usage_script(script, max_chars=max_chars)) <= max_chars
@@ -0,0 +1,44 @@
+"""
+Tests for the prefetch stage
+"""
+
+import os
+from unittest.mock import patch
+from dandi_notebook_gen import prefetch, tools
+
+ASSETS = [
+    {"asset_id": "a0", "path": "sub-01/tiny.nwb", "size": 10},
+    {"asset_id": "a1", "path": "sub-01/small.nwb", "size": 1000},
+    {"asset_id": "a2", "path": "sub-02/medium.nwb", "size": 5000},
+    {"asset_id": "a3", "path": "sub-02/large.nwb", "size": 90000},
+    {"asset_id": "a4", "path": "sub-03/huge.nwb", "size": 900000},
+    {"asset_id": "a5", "path": "README.txt", "size": 1},
+]
+
+def test_choose_representative_nwb_file():
+    """Test that a small, but not the smallest, NWB file is chosen"""
+    assert prefetch.choose_representative_nwb_file(ASSETS)["asset_id"] == "a1"
+    assert prefetch.choose_representative_nwb_file(ASSETS[:1])["asset_id"] == "a0"
+    assert prefetch.choose_representative_nwb_file(ASSETS[5:]) is None
+
+@patch.object(tools, "nwb_file_info", lambda dandiset_id, url: f"# usage script for {url}")
+@patch.object(tools, "iter_dandiset_assets", lambda dandiset_id, version="draft": iter(ASSETS))
+@patch.object(tools, "dandiset_info", lambda dandiset_id, version="draft": {"name": "Test Dandiset"})
+def test_prefetch_context(tmp_path):
+    """Test that the three tool results are fetched and written to the working directory"""
+    report = prefetch.prefetch_context("000001", str(tmp_path))
+    assert report["nwb_file_url"] == tools.asset_download_url("a1")
+    assert report["num_assets"] == len(ASSETS)
+    for f in report["files"]:
+        assert os.path.exists(tmp_path / f)
+    assert "Test Dandiset" in report["texts"]["dandiset_info.json"]
+
+    inline = prefetch.render_prefetch_section("000001", report, "inline")
+    assert "# usage script for" in inline
+    files = prefetch.render_prefetch_section("000001", report, "files")
+    assert "prefetch/nwb_file_info.py" in files
+    assert "# usage script for" not in files
+
+    savings = prefetch.estimate_savings("x" * 4000, report)
+    assert savings["tool_calls_saved"] == 3
+    assert savings["estimated_prompt_tokens_saved"] >= 3000
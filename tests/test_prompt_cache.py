@@ -0,0 +1,79 @@
+"""
+Tests for prompt caching of the agent's model calls
+"""
+
+import copy
+from types import SimpleNamespace
+import minicline.core
+from dandi_notebook_gen import prompt_cache, trace
+from dandi_notebook_gen.generator import build_instructions
+from dandi_notebook_gen.minicline_hooks import instrument_minicline
+
+CWD = "/tmp/work-123"
+PREFIX = "# Notebook Generation Instructions\n\nExplore Dandiset <DANDISET_ID>."
+
+def make_messages():
+    return [
+        {"role": "system", "content": f"Commands run in {CWD}. You are stuck operating from '{CWD}'."},
+        {"role": "user", "content": [
+            {"type": "text", "text": f"<task>\n{PREFIX}\n\n## The Dandiset\n\n000001\n</task>\n\nCurrent Working Directory: {CWD}"},
+            {"type": "text", "text": f"Current Working Directory: {CWD}"},
+        ]},
+        {"role": "assistant", "content": "<execute_command>ls</execute_command>"},
+        {"role": "user", "content": [{"type": "text", "text": "Command executed successfully"}]},
+    ]
+
+def test_build_instructions_prefix_is_dandiset_independent():
+    """Test that only the suffix depends on the Dandiset"""
+    prefix1, suffix1 = build_instructions("000001", experimental_mode=True)
+    prefix2, suffix2 = build_instructions("000002", experimental_mode=True)
+    assert prefix1 == prefix2
+    assert "000001" not in prefix1 and "{{ DANDISET_ID }}" not in prefix1
+    assert "000001" in suffix1 and len(suffix1) < 200
+
+def test_add_cache_hints_for_anthropic_models():
+    """Test the breakpoints and the stable system prompt, without modifying the input"""
+    messages = make_messages()
+    original = copy.deepcopy(messages)
+    hinted = prompt_cache.add_cache_hints(messages, model="anthropic/claude-3.7-sonnet", stable_prefix=PREFIX, cwd=CWD)
+    assert messages == original
+    system = hinted[0]["content"][0]
+    assert CWD not in system["text"] and system["cache_control"] == {"type": "ephemeral"}
+    first_user = hinted[1]["content"]
+    assert first_user[0]["text"] == "<task>\n" + PREFIX and "cache_control" in first_user[0]
+    assert "cache_control" not in first_user[1]
+    assert hinted[-1]["content"][-1]["cache_control"] == {"type": "ephemeral"}
+    num_breakpoints = sum(1 for m in hinted if isinstance(m["content"], list) for b in m["content"] if "cache_control" in b)
+    assert num_breakpoints == 3
+
+def test_add_cache_hints_for_other_models():
+    """Test that models that cache automatically get no breakpoints"""
+    hinted = prompt_cache.add_cache_hints(make_messages(), model="openai/gpt-4o", stable_prefix=PREFIX, cwd=CWD)
+    assert hinted[0]["content"] == "Commands run in .. You are stuck operating from '.'."
+    assert hinted[1:] == make_messages()[1:]
+
+def test_instrumented_completion_counts_cached_tokens(tmp_path, monkeypatch):
+    """Test that minicline's completion is replaced and cached tokens are recorded"""
+    payloads = []
+
+    def fake_post_json(url, payload, **kwargs):
+        # minicline retries the completion itself
+        assert kwargs["max_retries"] == 0
+        payloads.append(payload)
+        usage = {"prompt_tokens": 1000, "completion_tokens": 50, "cost": 0.01,
+                 "prompt_tokens_details": {"cached_tokens": 800, "cache_write_tokens": 100}}
+        return SimpleNamespace(status_code=200, json=lambda: {"usage": usage, "choices": [{"message": {"content": "done"}}]})
+
+    monkeypatch.setenv("OPENROUTER_API_KEY", "test")
+    monkeypatch.setattr("dandi_notebook_gen.transport.post_json", fake_post_json)
+    path = str(tmp_path / "trace.jsonl")
+    stock = minicline.core.run_completion
+    messages = make_messages()
+    with instrument_minicline(trace_path=path, prompt_caching=True, stable_prefix=PREFIX, cwd=CWD) as stats:
+        content, conversation, prompt_tokens, _ = minicline.core.run_completion(messages, model="anthropic/claude-3.7-sonnet")
+    assert minicline.core.run_completion is stock
+    assert content == "done" and prompt_tokens == 1000
+    assert conversation == messages + [{"role": "assistant", "content": "done"}]
+    assert payloads[0]["usage"] == {"include": True}
+    assert stats["cached_prompt_tokens"] == 800 and stats["cache_write_tokens"] == 100
+    assert trace.read_trace(path)[0]["cached_prompt_tokens"] == 800
@@ -0,0 +1,86 @@
+"""
+Tests for the byte-range caching proxy
+"""
+
+import json
+import threading
+import pytest
+import requests
+from dandi_notebook_gen.cache import BlockCache
+from dandi_notebook_gen.range_proxy import RangeProxy, proxied_url, restore_urls, rewrite_urls
+
+FILE = bytes(range(256)) * 40  # 10240 bytes
+
+@pytest.fixture
+def upstream(tmp_path, standin):
+    """The stand-in, serving FILE and a small LINDI JSON file that refers to it"""
+    files = tmp_path / "files"
+    files.mkdir()
+    (files / "file.nwb").write_bytes(FILE)
+    refs = {"refs": {"0/0": [standin.file_url("file.nwb"), 0, 10]}}
+    (files / "nwb.lindi.json").write_text(json.dumps(refs))
+    standin.files.update({name: str(files / name) for name in ("file.nwb", "nwb.lindi.json")})
+    return standin
+
+def make_cache(tmp_path, **kwargs):
+    return BlockCache(directory=tmp_path / "cache", block_size=1024, **kwargs)
+
+def test_rewrite_and_restore_urls():
+    """Test that quoted URLs are routed through the proxy and restored exactly"""
+    text = 'url = "https://api.dandiarchive.org/api/assets/abc/download/"\n# see https://example.org\n'
+    rewritten = rewrite_urls(text, "http://127.0.0.1:1234")
+    assert '"http://127.0.0.1:1234/https/api.dandiarchive.org/api/assets/abc/download/"' in rewritten
+    assert "# see https://example.org" in rewritten
+    assert restore_urls(rewritten, "http://127.0.0.1:1234") == text
+    assert proxied_url("https://a.org/x", "http://127.0.0.1:1234") == "http://127.0.0.1:1234/https/a.org/x"
+
+def test_range_reads_are_cached_across_proxies(tmp_path, upstream):
+    """Test that repeated reads, also from a new proxy (a new run), are served from disk"""
+    with RangeProxy(make_cache(tmp_path)) as proxy:
+        url = proxied_url(upstream.file_url("file.nwb"), proxy.url)
+        response = requests.get(url, headers={"Range": "bytes=1000-3999"})
+        assert response.status_code == 206
+        assert response.content == FILE[1000:4000]
+        assert response.headers["Content-Range"] == f"bytes 1000-3999/{len(FILE)}"
+        num_upstream = upstream.stats["range_requests"]
+        assert requests.get(url, headers={"Range": "bytes=1500-2500"}).content == FILE[1500:2501]
+        assert upstream.stats["range_requests"] == num_upstream
+        assert requests.get(url).content == FILE
+    with RangeProxy(make_cache(tmp_path)) as proxy:
+        url = proxied_url(upstream.file_url("file.nwb"), proxy.url)
+        num_upstream = upstream.stats["range_requests"]
+        assert requests.get(url, headers={"Range": "bytes=0-99"}).content == FILE[:100]
+        assert requests.head(url).headers["Content-Length"] == str(len(FILE))
+        assert upstream.stats["range_requests"] == num_upstream
+        assert proxy.stats["blocks_fetched"] == 0
+
+def test_lindi_json_references_are_rewritten(tmp_path, upstream):
+    """Test that the chunk URLs in a LINDI file are routed through the proxy"""
+    with RangeProxy(make_cache(tmp_path)) as proxy:
+        response = requests.get(proxied_url(upstream.file_url("nwb.lindi.json"), proxy.url))
+        ref_url = response.json()["refs"]["0/0"][0]
+        assert ref_url == proxied_url(upstream.file_url("file.nwb"), proxy.url)
+
+def test_block_cache_evicts_least_recently_used(tmp_path):
+    """Test that the total size of the blocks stays within max_bytes"""
+    cache = make_cache(tmp_path, max_bytes=3000)
+    for index in range(5):
+        cache.set_block("https://a.org/x", index, b"x" * 1024)
+    assert cache.stats()["total_bytes"] <= 3000
+    assert cache.get_block("https://a.org/x", 4) is not None
+    assert cache.get_block("https://a.org/x", 0) is None
+    cache.set_size("https://a.org/x", 5120)
+    assert cache.get_size("https://a.org/x") == 5120
+
+def test_block_cache_total_ignores_overwrites(tmp_path):
+    """Test that rewriting a block, also from several threads, does not inflate the running total"""
+    cache = make_cache(tmp_path, max_bytes=3000)
+    cache.set_block("https://a.org/x", 0, b"x" * 1024)
+    cache.set_block("https://a.org/x", 1, b"x" * 1024)
+    threads = [threading.Thread(target=cache.set_block, args=("https://a.org/x", 1, b"y" * 1024)) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert cache._total_bytes == cache.stats()["total_bytes"] == 2048
+    assert cache.get_block("https://a.org/x", 0) is not None
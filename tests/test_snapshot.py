@@ -0,0 +1,60 @@
+"""
+Tests for offline snapshot bundles
+"""
+
+from unittest.mock import patch
+import pytest
+from click.testing import CliRunner
+from dandi_notebook_gen import tools
+from dandi_notebook_gen.cli import cli
+from dandi_notebook_gen.snapshot import SNAPSHOT_ENV, create_snapshot
+
+INFO = {"name": "Test Dandiset", "version": "0.230101.0000"}
+ASSETS = [
+    {"asset_id": f"asset{i}", "path": f"sub-{i % 2}/sub-{i % 2}_ses-{i}.nwb", "size": 1000 * (i + 1)}
+    for i in range(8)
+]
+
+def fake_nwb_file_info(dandiset_id, nwb_file_url, use_cache=True):
+    return f'url = "{nwb_file_url}"'
+
+@pytest.fixture
+def bundle(tmp_path, monkeypatch):
+    monkeypatch.delenv(SNAPSHOT_ENV, raising=False)
+    path = str(tmp_path / "bundle.json.gz")
+    with patch.object(tools, "dandiset_info", lambda dandiset_id, version="draft", use_cache=True: INFO), \
+            patch.object(tools, "all_dandiset_assets", lambda dandiset_id, version="draft", use_cache=True: ASSETS), \
+            patch.object(tools, "nwb_file_info", fake_nwb_file_info):
+        report = create_snapshot("000001", path, version="0.230101.0000", glob="sub-1/*", max_files=2)
+    assert report["num_assets"] == 8
+    assert report["nwb_files"] == [tools.asset_download_url("asset1"), tools.asset_download_url("asset3")]
+    return path
+
+def test_tools_serve_from_snapshot(bundle, monkeypatch):
+    """Test that the tools answer from the bundle without network access"""
+    monkeypatch.setenv(SNAPSHOT_ENV, bundle)
+    with patch.object(tools, "post_json", side_effect=AssertionError("network access")):
+        assert tools.dandiset_info("000001") == INFO
+        listing = tools.dandiset_assets("000001", page=2, page_size=3)
+        assert listing["count"] == 8 and [a["asset_id"] for a in listing["results"]] == ["asset3", "asset4", "asset5"]
+        assert len(list(tools.iter_dandiset_assets("000001", page_size=3))) == 8
+        assert tools.dandiset_assets("000001", glob="sub-0/*")["count"] == 4
+        url = tools.asset_download_url("asset3")
+        assert tools.nwb_file_info("000001", url) == f'url = "{url}"'
+        with pytest.raises(RuntimeError, match="not in the snapshot"):
+            tools.nwb_file_info("000001", tools.asset_download_url("asset0"))
+        with pytest.raises(RuntimeError, match="not in the snapshot"):
+            tools.dandiset_info("000002")
+
+def test_snapshot_command(tmp_path, monkeypatch):
+    """Test the snapshot command with the default choice of NWB file"""
+    monkeypatch.delenv(SNAPSHOT_ENV, raising=False)
+    output = str(tmp_path / "bundle.json.gz")
+    with patch.object(tools, "dandiset_info", lambda dandiset_id, version="draft", use_cache=True: INFO), \
+            patch.object(tools, "all_dandiset_assets", lambda dandiset_id, version="draft", use_cache=True: ASSETS), \
+            patch.object(tools, "nwb_file_info", fake_nwb_file_info):
+        result = CliRunner().invoke(cli, ["snapshot", "000001", "-o", output])
+    assert result.exit_code == 0, result.output
+    assert "8 assets, 1 NWB files" in result.output
+    monkeypatch.setenv(SNAPSHOT_ENV, output)
+    assert tools.dandiset_info("000001") == INFO
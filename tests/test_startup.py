@@ -0,0 +1,73 @@
+"""
+Cold-start benchmarks for the dandi-notebook-gen-tools CLI
+
+The agent launches the tools CLI as a fresh process for every tool call, so
+its startup time is paid many times per run. The ceiling can be adjusted
+with DANDI_NOTEBOOK_GEN_STARTUP_CEILING (seconds) on slow machines.
+"""
+
+import json
+import os
+import subprocess
+import sys
+import time
+import pytest
+
+STARTUP_CEILING_SECONDS = float(os.environ.get("DANDI_NOTEBOOK_GEN_STARTUP_CEILING", "1.5"))
+
+# modules that only the generator or nwb-file-info should ever load
+HEAVY_MODULES = ["minicline", "get_nwbfile_info", "pynwb", "h5py", "lindi", "numpy"]
+
+SAMPLE_ASSETS = {
+    "count": 1,
+    "results": [{"asset_id": "asset1", "path": "file1.nwb", "size": 1000}]
+}
+
+@pytest.fixture
+def api_url(standin):
+    standin.assets = SAMPLE_ASSETS["results"]
+    return standin.api_url
+
+def run_cli(args, env=None):
+    """Run the tools CLI in a fresh interpreter and return (elapsed, completed process)"""
+    full_env = dict(os.environ, DANDI_NOTEBOOK_GEN_NO_CACHE="1", **(env or {}))
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-m", "dandi_notebook_gen.cli", *args],
+        capture_output=True, text=True, env=full_env
+    )
+    return time.perf_counter() - start, proc
+
+def best_of(n, args, env=None):
+    timings = []
+    for _ in range(n):
+        elapsed, proc = run_cli(args, env=env)
+        assert proc.returncode == 0, proc.stderr
+        timings.append(elapsed)
+    return min(timings), proc
+
+def test_dandiset_info_help_cold_start():
+    """Test that `dandiset-info --help` starts within the ceiling"""
+    elapsed, proc = best_of(3, ["dandiset-info", "--help"])
+    assert "DANDISET_ID" in proc.stdout
+    assert elapsed < STARTUP_CEILING_SECONDS, f"cold start took {elapsed:.2f}s"
+
+def test_dandiset_assets_cold_start(api_url):
+    """Test that a full `dandiset-assets` call starts and finishes within the ceiling"""
+    elapsed, proc = best_of(3, ["dandiset-assets", "000001"], env={"DANDI_NOTEBOOK_GEN_API_URL": api_url})
+    assert json.loads(proc.stdout) == SAMPLE_ASSETS
+    assert elapsed < STARTUP_CEILING_SECONDS, f"cold start took {elapsed:.2f}s"
+
+def test_metadata_commands_do_not_import_heavy_modules(api_url):
+    """Test that dandiset-info and dandiset-assets never import the generator or NWB stack"""
+    script = (
+        "import sys, json\n"
+        "from dandi_notebook_gen.cli import cli\n"
+        "cli(['dandiset-assets', '000001'], standalone_mode=False)\n"
+        "cli(['dandiset-info', '--help'], standalone_mode=False)\n"
+        f"print(json.dumps([m for m in {HEAVY_MODULES!r} if m in sys.modules]))\n"
+    )
+    env = dict(os.environ, DANDI_NOTEBOOK_GEN_NO_CACHE="1", DANDI_NOTEBOOK_GEN_API_URL=api_url)
+    proc = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, env=env)
+    assert proc.returncode == 0, proc.stderr
+    assert json.loads(proc.stdout.strip().splitlines()[-1]) == []
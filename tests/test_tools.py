@@ -0,0 +1,145 @@
+"""
+Tests for the tools module
+"""
+
+from unittest.mock import patch
+from dandi_notebook_gen import tools
+
+def make_listing(count):
+    return [{"asset_id": f"asset{i}", "path": f"sub-{i % 3}/file{i}.nwb", "size": 1000 + i} for i in range(count)]
+
+def fake_dandiset_assets_factory(listing, calls):
+    def fake_dandiset_assets(dandiset_id, version="draft", page=1, page_size=20, glob=None, use_cache=True):
+        calls.append(page)
+        start = (page - 1) * page_size
+        return {"count": len(listing), "results": listing[start:start + page_size]}
+    return fake_dandiset_assets
+
+def test_iter_dandiset_assets_streams_every_page():
+    """Test that every asset is yielded exactly once, in order"""
+    listing = make_listing(1234)
+    calls = []
+    with patch.object(tools, "dandiset_assets", fake_dandiset_assets_factory(listing, calls)):
+        result = list(tools.iter_dandiset_assets("000001", page_size=100, max_workers=4))
+    assert result == listing
+    assert sorted(calls) == list(range(1, 14))
+
+def test_iter_dandiset_assets_single_page():
+    """Test that a listing that fits in one page makes one request"""
+    listing = make_listing(5)
+    calls = []
+    with patch.object(tools, "dandiset_assets", fake_dandiset_assets_factory(listing, calls)):
+        result = list(tools.iter_dandiset_assets("000001"))
+    assert result == listing
+    assert calls == [1]
+
+def test_nwb_file_info_is_cached(tmp_path, monkeypatch):
+    """Test that usage scripts are generated once per URL and then served from the cache"""
+    import sys
+    import types
+    monkeypatch.setenv("DANDI_NOTEBOOK_GEN_CACHE_DIR", str(tmp_path))
+    monkeypatch.delenv("DANDI_NOTEBOOK_GEN_NO_CACHE", raising=False)
+    calls = []
+    fake_module = types.ModuleType("get_nwbfile_info")
+    def get_nwbfile_usage_script(url):
+        calls.append(url)
+        return f"# usage script for {url}"
+    fake_module.get_nwbfile_usage_script = get_nwbfile_usage_script
+    monkeypatch.setitem(sys.modules, "get_nwbfile_info", fake_module)
+
+    url = "https://api.dandiarchive.org/api/assets/asset1/download/"
+    assert tools.nwb_file_info("000001", url) == f"# usage script for {url}"
+    assert tools.nwb_file_info("000001", url) == f"# usage script for {url}"
+    assert calls == [url]
+    tools.nwb_file_info("000001", url, use_cache=False)
+    assert calls == [url, url]
+
+def make_usage_script(url, description):
+    return (
+        "import pynwb\n"
+        "import remfile\n"
+        f'url = "{url}"\n'
+        "nwb = pynwb.NWBHDF5IO(file=remfile.File(url)).read()\n"
+        f"nwb.session_description # (str) {description}\n"
+    )
+
+def test_nwb_files_info_concurrent_with_dedup_and_errors():
+    """Test that results are keyed by URL, same-layout files are de-duplicated and errors are reported"""
+    urls = [f"https://api.dandiarchive.org/api/assets/asset{i}/download/" for i in range(3)]
+    def fake_nwb_file_info(dandiset_id, nwb_file_url, use_cache=True):
+        if nwb_file_url == urls[2]:
+            raise RuntimeError("cannot open file")
+        return make_usage_script(nwb_file_url, f"session for {nwb_file_url}")
+    with patch.object(tools, "nwb_file_info", fake_nwb_file_info):
+        result = tools.nwb_files_info("000001", urls, max_workers=2)
+    assert list(result) == urls
+    assert result[urls[0]] == make_usage_script(urls[0], f"session for {urls[0]}")
+    assert result[urls[1]].startswith(f"# Same NWB object layout as {urls[0]}")
+    assert result[urls[2]] == "# ERROR: RuntimeError: cannot open file"
+
+    with patch.object(tools, "nwb_file_info", fake_nwb_file_info):
+        result = tools.nwb_files_info("000001", urls[:2], deduplicate=False)
+    assert result[urls[1]] == make_usage_script(urls[1], f"session for {urls[1]}")
+
+def test_nwb_files_info_timeout():
+    """Test that a slow file times out without holding up the others"""
+    import time
+    urls = ["https://example.org/slow.nwb", "https://example.org/fast.nwb"]
+    def fake_nwb_file_info(dandiset_id, nwb_file_url, use_cache=True):
+        if "slow" in nwb_file_url:
+            time.sleep(5)
+        return f"# script for {nwb_file_url}"
+    start = time.monotonic()
+    with patch.object(tools, "nwb_file_info", fake_nwb_file_info):
+        result = tools.nwb_files_info("000001", urls, max_workers=1, timeout=0.3)
+    assert time.monotonic() - start < 3
+    assert result[urls[0]].startswith("# ERROR: Timed out")
+    assert result[urls[1]] == f"# script for {urls[1]}"
+
+def test_nwb_files_info_glob():
+    """Test that --glob matches are turned into download URLs"""
+    listing = make_listing(30)
+    calls = []
+    with patch.object(tools, "dandiset_assets", fake_dandiset_assets_factory(listing, calls)), \
+            patch.object(tools, "nwb_file_info", lambda d, url, use_cache=True: f"# {url}"):
+        result = tools.nwb_files_info("000001", glob="*.nwb", max_files=3, deduplicate=False)
+    assert list(result) == [tools.asset_download_url(f"asset{i}") for i in range(3)]
+
+def test_filtered_listings_share_one_full_listing(tmp_path, monkeypatch):
+    """Test that different filters are applied locally to one cached full listing"""
+    monkeypatch.setenv("DANDI_NOTEBOOK_GEN_CACHE_DIR", str(tmp_path))
+    monkeypatch.delenv("DANDI_NOTEBOOK_GEN_NO_CACHE", raising=False)
+    listing = make_listing(250)
+    calls = []
+    with patch.object(tools, "dandiset_assets", fake_dandiset_assets_factory(listing, calls)):
+        tools.all_dandiset_assets("000001")
+    assert sorted(calls) == [1, 2, 3]
+    # the pages are not cached next to the full listing
+    assert tools.get_response_cache().stats()["num_entries"] == 1
+
+    with patch.object(tools, "iter_dandiset_assets", side_effect=AssertionError("listing fetched again")):
+        result = tools.dandiset_assets("000001", glob=["sub-1/*", "sub-2/*"], max_size=1100, sort="-size", page_size=5)
+        assert result["count"] == 67
+        assert [a["size"] for a in result["results"]] == [1100, 1098, 1097, 1095, 1094]
+        result = tools.dandiset_assets("000001", regex=r"file1\d\.nwb$")
+        assert result["count"] == 10
+        summary = tools.dandiset_assets_summary("000001")
+        assert summary["count"] == 250 and summary["by_subject"]["0"]["count"] == 84
+
+def test_dandiset_asset_table_streams_pages():
+    """Test that the pages end up in the table, in listing order"""
+    listing = make_listing(250)
+    calls = []
+    with patch.object(tools, "dandiset_assets", fake_dandiset_assets_factory(listing, calls)):
+        table = tools.dandiset_asset_table("000001")
+    assert list(table.records()) == listing
+
+def test_dandiset_asset_table_filters_pages_on_the_way():
+    """Test that a glob is applied to the streamed pages instead of a full listing"""
+    listing = make_listing(250)
+    calls = []
+    with patch.object(tools, "dandiset_assets", fake_dandiset_assets_factory(listing, calls)), \
+            patch.object(tools, "all_dandiset_assets", side_effect=AssertionError("full listing built")):
+        table = tools.dandiset_asset_table("000001", glob="sub-1/*")
+    assert list(table.records()) == [a for a in listing if a["path"].startswith("sub-1/")]
+    assert sorted(calls) == [1, 2, 3]
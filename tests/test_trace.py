@@ -0,0 +1,93 @@
+"""
+Tests for the trace module and the minicline instrumentation
+"""
+
+import json
+import minicline.core
+from click.testing import CliRunner
+from dandi_notebook_gen import trace
+from dandi_notebook_gen.cli import cli
+from dandi_notebook_gen.minicline_hooks import instrument_minicline
+
+def test_command_phase():
+    """Test the classification of agent shell commands"""
+    assert trace.command_phase("dandi-notebook-gen-tools dandiset-info 000001") == "dandi_tools"
+    assert trace.command_phase("python explore/script1.py") == "exploratory_scripts"
+    assert trace.command_phase("jupytext --to notebook notebook.py && jupyter execute notebook.ipynb") == "notebook_execution"
+    assert trace.command_phase("ls -la") == "other_commands"
+
+def test_span_records_status_and_fields(tmp_path):
+    """Test that spans are appended with their status and extra fields"""
+    path = str(tmp_path / "trace.jsonl")
+    with trace.span("stage", "ok-stage", path=path, phase="prefetch") as extra:
+        extra["bytes_out"] = 12
+    try:
+        with trace.span("stage", "failing-stage", path=path, phase="prefetch"):
+            raise RuntimeError("boom")
+    except RuntimeError:
+        pass
+    spans = trace.read_trace(path)
+    assert [s["status"] for s in spans] == ["ok", "error"]
+    assert spans[0]["bytes_out"] == 12
+    assert "boom" in spans[1]["error"]
+    summary = trace.summarize_spans(spans)
+    assert summary["phases"]["prefetch"]["count"] == 2
+    assert summary["phases"]["prefetch"]["errors"] == 1
+
+def test_tracing_to_sets_and_restores_env(tmp_path, monkeypatch):
+    """Test that the trace file is exported only for the enclosed block"""
+    monkeypatch.delenv(trace.TRACE_ENV, raising=False)
+    path = str(tmp_path / "trace.jsonl")
+    with trace.tracing_to(path):
+        assert trace.get_trace_path() == path
+        trace.record_span("tool", "x", 0.0, 1.0)
+    assert trace.get_trace_path() is None
+    assert len(trace.read_trace(path)) == 1
+
+def test_instrument_minicline_records_model_and_tool_spans(tmp_path, monkeypatch):
+    """Test that model calls and tool calls made through minicline.core are traced"""
+    def fake_run_completion(messages, *, model, **kwargs):
+        return "<execute_command>...</execute_command>", messages, 100, 20
+
+    def fake_execute_tool(tool_name, params, cwd, **kwargs):
+        if params.get("command") == "false":
+            return "tool", "Command failed with exit code 1:\n", None, True, 0, 0
+        return "tool", "Command executed successfully\nhello\n", None, True, 0, 0
+
+    monkeypatch.setattr(minicline.core, "run_completion", fake_run_completion)
+    monkeypatch.setattr(minicline.core, "execute_tool", fake_execute_tool)
+    path = str(tmp_path / "trace.jsonl")
+    with instrument_minicline(trace_path=path):
+        minicline.core.run_completion([], model="m")
+        minicline.core.execute_tool("execute_command", {"command": "dandi-notebook-gen-tools dandiset-info 000001"}, ".")
+        minicline.core.execute_tool("execute_command", {"command": "false"}, ".")
+    # the originals are restored afterwards
+    assert minicline.core.run_completion is fake_run_completion
+    assert minicline.core.execute_tool is fake_execute_tool
+
+    spans = trace.read_trace(path)
+    assert spans[0]["kind"] == "model" and spans[0]["prompt_tokens"] == 100
+    assert spans[1]["phase"] == "dandi_tools" and spans[1]["exit_code"] == 0
+    assert spans[2]["status"] == "error" and spans[2]["exit_code"] == 1
+
+def test_cli_spans_are_reported_separately(tmp_path):
+    """Test that nested CLI spans do not count towards the phase totals"""
+    path = str(tmp_path / "trace.jsonl")
+    trace.record_span("tool", "execute_command", 0.0, 2.0, path=path, phase="dandi_tools", status="ok")
+    trace.record_span("cli", "dandiset-info", 0.5, 1.5, path=path, status="ok", bytes_out=100)
+    summary = trace.summarize_spans(trace.read_trace(path))
+    assert summary["phases"] == {"dandi_tools": {"count": 1, "total_seconds": 2.0, "bytes_out": 0, "errors": 0}}
+    assert summary["cli"]["dandiset-info"]["bytes_out"] == 100
+
+def test_trace_report_command(tmp_path):
+    """Test aggregating the traces of several runs"""
+    for i, seconds in enumerate([1.0, 3.0]):
+        run_dir = tmp_path / f"run{i}"
+        run_dir.mkdir()
+        trace.record_span("model", "m", 0.0, seconds, path=str(run_dir / "trace.jsonl"), phase="model", status="ok")
+    result = CliRunner().invoke(cli, ["trace-report", str(tmp_path)])
+    assert result.exit_code == 0
+    report = json.loads(result.output)
+    assert report["num_runs"] == 2
+    assert report["phases"]["model"]["total_seconds"] == 4.0
+    assert report["phases"]["model"]["max_seconds"] == 3.0
@@ -0,0 +1,46 @@
+"""
+Tests for the shared HTTP transport
+"""
+
+import pytest
+from dandi_notebook_gen import transport
+
+@pytest.fixture
+def server(monkeypatch, standin):
+    """The URL of the stand-in's dandiset_info endpoint"""
+    monkeypatch.setenv("DANDI_NOTEBOOK_GEN_BACKOFF_BASE", "0")
+    transport.reset_stats()
+    return f"{standin.api_url}/dandiset_info"
+
+def test_retries_transient_errors(server, standin):
+    """Test that 5xx responses are retried until success"""
+    standin.failures = 2
+    response = transport.post_json(server, {"a": 1})
+    assert response.status_code == 200
+    assert response.json()["id"] == "DANDI:000001/draft"
+    stats = transport.get_stats()
+    assert stats["requests"] == 3
+    assert stats["retries"] == 2
+    assert stats["failures"] == 0
+    assert stats["bytes_received"] > 0
+
+def test_gives_up_after_max_retries(server, standin, monkeypatch):
+    """Test that the last error response is returned once retries are exhausted"""
+    monkeypatch.setenv("DANDI_NOTEBOOK_GEN_MAX_RETRIES", "1")
+    standin.failures = 10
+    response = transport.post_json(server, {"a": 1})
+    assert response.status_code == 503
+    stats = transport.get_stats()
+    assert stats["requests"] == 2
+    assert stats["failures"] == 1
+
+def test_no_retries_when_disabled(server, standin):
+    """Test that max_retries=0 sends the request once"""
+    standin.failures = 10
+    response = transport.post_json(server, {"a": 1}, max_retries=0)
+    assert response.status_code == 503
+    assert transport.get_stats()["requests"] == 1
+
+def test_session_is_shared():
+    """Test that all callers share one pooled session"""
+    assert transport.get_session() is transport.get_session()
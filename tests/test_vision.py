@@ -0,0 +1,102 @@
+"""
+Tests for the pre-processing and de-duplication of images
+"""
+
+import base64
+import io
+import pytest
+from PIL import Image, ImageDraw
+from dandi_notebook_gen.cache import DiskCache
+from dandi_notebook_gen.vision import new_vision_stats, perceptual_hash, prepare_image, preprocessed_read_image
+
+def plot_png(width, height, offset=0):
+    """A plot-like PNG: a white RGBA canvas with a few colored lines"""
+    image = Image.new("RGBA", (width, height), (255, 255, 255, 255))
+    draw = ImageDraw.Draw(image)
+    for i, color in enumerate([(31, 119, 180), (255, 127, 14), (44, 160, 44)]):
+        draw.line([(0, height * (i + 1) // 4 + offset), (width, height // 2)], fill=color, width=max(1, width // 100))
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+def test_prepare_image_downsamples():
+    """Test that large images are shrunk to the maximum size and small ones are not enlarged"""
+    data = plot_png(3000, 1500)
+    output, info = prepare_image(data, 1000)
+    assert info["downsampled"] and info["original_size"] == (3000, 1500)
+    assert Image.open(io.BytesIO(output)).size == (1000, 500)
+    assert len(output) < len(data)
+
+    small = plot_png(200, 100)
+    output, info = prepare_image(small, 1000)
+    assert not info["downsampled"]
+    assert Image.open(io.BytesIO(output)).size == (200, 100)
+    assert len(output) <= len(small)
+
+def test_perceptual_hash_matches_rerenderings():
+    """Test that the same plot at another resolution has the same hash, and a different plot does not"""
+    big = Image.open(io.BytesIO(plot_png(1600, 1200)))
+    small = Image.open(io.BytesIO(plot_png(800, 600)))
+    assert perceptual_hash(big) == perceptual_hash(small)
+    other = Image.new("RGB", (800, 600), (255, 255, 255))
+    ImageDraw.Draw(other).rectangle([0, 0, 400, 600], fill=(0, 0, 0))
+    assert perceptual_hash(other) != perceptual_hash(small)
+
+def test_read_image_reuses_descriptions(tmp_path, monkeypatch):
+    """Test that re-renderings of an image are described once, also across runs, and labeled as reused"""
+    from minicline.tools import read_image as read_image_module
+    calls = []
+    def describe(data_url, *, vision_model, instructions):
+        calls.append(data_url)
+        return "three lines", 800, 20
+    monkeypatch.setattr(read_image_module, "_get_ai_description", describe)
+    (tmp_path / "a.png").write_bytes(plot_png(1600, 1200))
+    (tmp_path / "b.png").write_bytes(plot_png(800, 600))
+    cache = DiskCache("vision", directory=tmp_path / "cache")
+
+    stats = new_vision_stats()
+    read_image = preprocessed_read_image(read_image_module.read_image, max_image_size=512, cache=cache, stats=stats)
+    _, text, data_url, prompt_tokens, _ = read_image("a.png", instructions=None, cwd=str(tmp_path), vision_model="v")
+    assert "three lines" in text and prompt_tokens == 800
+    assert max(Image.open(io.BytesIO(base64.b64decode(data_url.split(",", 1)[1]))).size) == 512
+    assert "reused" not in text
+    _, text, _, prompt_tokens, _ = read_image("b.png", instructions=None, cwd=str(tmp_path), vision_model="v")
+    assert "three lines" in text and prompt_tokens == 0
+    assert "reused" in text
+    # other instructions are another question
+    read_image("b.png", instructions="What is on the x axis?", cwd=str(tmp_path), vision_model="v")
+    assert len(calls) == 2
+    assert stats["num_images"] == 3 and stats["num_downsampled"] == 3 and stats["num_cache_hits"] == 1
+    assert stats["saved_vision_prompt_tokens"] == 800 and stats["saved_vision_completion_tokens"] == 20
+
+    # a new run finds the description in the disk cache
+    stats = new_vision_stats()
+    read_image = preprocessed_read_image(read_image_module.read_image, max_image_size=512, cache=cache, stats=stats)
+    read_image("a.png", instructions=None, cwd=str(tmp_path), vision_model="v")
+    assert len(calls) == 2 and stats["num_cache_hits"] == 1
+
+def test_near_duplicates_are_described_again(tmp_path, monkeypatch):
+    """Test that a slightly changed plot (a few hash bits apart) gets its own description"""
+    from minicline.tools import read_image as read_image_module
+    descriptions = iter(["broken plot", "fixed plot"])
+    monkeypatch.setattr(read_image_module, "_get_ai_description", lambda data_url, **kwargs: (next(descriptions), 800, 20))
+    (tmp_path / "a.png").write_bytes(plot_png(1600, 1200))
+    (tmp_path / "b.png").write_bytes(plot_png(1600, 1200, offset=16))
+    stats = new_vision_stats()
+    read_image = preprocessed_read_image(read_image_module.read_image, max_image_size=512, cache=None, stats=stats)
+    read_image("a.png", instructions=None, cwd=str(tmp_path), vision_model="v")
+    _, text, _, _, _ = read_image("b.png", instructions=None, cwd=str(tmp_path), vision_model="v")
+    assert "fixed plot" in text and "reused" not in text
+    assert stats["num_cache_hits"] == 0
+
+def test_read_image_leaves_errors_to_minicline(tmp_path):
+    """Test that files that are not images or are outside the working directory are handled as before"""
+    from minicline.tools import read_image as read_image_module
+    (tmp_path / "notes.txt").write_text("not an image")
+    stats = new_vision_stats()
+    read_image = preprocessed_read_image(read_image_module.read_image, max_image_size=512, cache=None, stats=stats)
+    with pytest.raises(ValueError):
+        read_image("../outside.png", instructions=None, cwd=str(tmp_path), vision_model=None)
+    _, text, data_url, _, _ = read_image("missing.png", instructions=None, cwd=str(tmp_path), vision_model=None)
+    assert text.startswith("ERROR READING FILE") and data_url is None
+    assert stats["num_images"] == 0